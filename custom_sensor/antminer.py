@@ -28,7 +28,7 @@ This script is a custom PRTG Python sensor, designed to monitor an Antiminer
 miner.
 """
 
-from json import loads, dump
+from json import loads
 from paesslerag_prtg_sensor_api.sensor.units import ValueUnit
 # Local library imports
 from custom_sensor_lib.create_channel import CreateChannels
@@ -38,6 +38,23 @@ class AntminerChannels(CreateChannels):
     SERVER_PORT = 4028
     COMMANDS = ['summary', 'pools', 'stats']
     MSG_FORMAT = '{"command": "%s", "parameter": "0"}'
+    # The cgminer API ends each response with a NUL character
+    MSG_TERMINATOR = '\x00'
+    # The cgminer API accepts joined commands as summary+pools+stats
+    BATCH_SEPARATOR = '+'
+    DISCOVERY_COMMAND = 'stats'
+    CHANNEL_GROUPS = {
+        'summary': ['summary'],
+        'uptime': ['stats'],
+        'fans': ['stats'],
+        'temps': ['stats'],
+        'chains': ['stats'],
+        'pools': ['pools']
+    }
+    FAN_LIMIT_MIN_WARNING = 2000
+    FAN_LIMIT_MIN_ERROR = 1000
+    FAN_LIMIT_MAX_WARNING = 5800
+    FAN_LIMIT_MAX_ERROR = 6000
 
     def _pools_channels(self, data: dict):
         for pool in data:
@@ -73,23 +90,29 @@ class AntminerChannels(CreateChannels):
             )
 
 
-    def _stats_channels(self, data: dict):
+    def _uptime_channels(self, data: dict):
         self.result.add_channel(name='Uptime',
             value=data['Elapsed'],
             unit=ValueUnit.TIMESECONDS,
             speed_time='Hour'
         )
+
+
+    def _fan_channels(self, data: dict):
         for num in range(1, data['fan_num'] + 1):
             self.result.add_channel(
                 name='Fan %s' %num,
                 value=data['fan%s' %num],
                 unit='trs/m',
                 is_limit_mode=True,
-                limit_min_warning=2000,
-                limit_min_error=1000,
-                limit_max_warning=5800,
-                limit_max_error=6000
+                limit_min_warning=self.FAN_LIMIT_MIN_WARNING,
+                limit_min_error=self.FAN_LIMIT_MIN_ERROR,
+                limit_max_warning=self.FAN_LIMIT_MAX_WARNING,
+                limit_max_error=self.FAN_LIMIT_MAX_ERROR
             )
+
+
+    def _temperature_channels(self, data: dict):
         for num in [1, 2, 3]:
             self.result.add_channel(
                 name='Temperature_In Chip %s' %num,
@@ -107,6 +130,10 @@ class AntminerChannels(CreateChannels):
                 limit_max_warning=75,
                 limit_max_error=80
             )
+
+
+    def _chain_channels(self, data: dict):
+        for num in [1, 2, 3]:
             _rate = data["CHAIN AVG HASHRATE%s" %num]
             self.result.add_channel(
                 name='Chain %s - Average hashrate' %num,
@@ -116,6 +143,13 @@ class AntminerChannels(CreateChannels):
             )
 
 
+    def _stats_channels(self, data: dict):
+        self._uptime_channels(data)
+        self._fan_channels(data)
+        self._temperature_channels(data)
+        self._chain_channels(data)
+
+
     def _summary_channels(self, data: dict):
         rate = data["RT HASHRATE"]
         max_rate = float(data["THEORY HASHRATE"][:-5])
@@ -155,9 +189,46 @@ class AntminerChannels(CreateChannels):
 
 
     def channels(self):
-        self._summary_channels(self.data['summary'][0])
-        self._stats_channels(self.data['stats'][1])
-        self._pools_channels(self.data['pools'])
+        if self.selected('summary'): 
+            self._summary_channels(self.data['summary'][0])
+        for group, create_channels in [('uptime', self._uptime_channels), 
+                                       ('fans', self._fan_channels), 
+                                       ('temps', self._temperature_channels),
+                                       ('chains', self._chain_channels)]:
+            if self.selected(group): create_channels(self.data['stats'][1])
+        if self.selected('pools'): self._pools_channels(self.data['pools'])
+
+
+    def counters(self) -> dict:
+        _summary = self.data['summary'][0]
+        return {name: _summary[name] 
+                for name in ['Accepted', 'Rejected', 'Hardware Errors']}
+
+
+    def uptime(self) -> float:
+        return self.data['stats'][1]['Elapsed']
+
+
+    def history_record(self) -> dict:
+        _summary = self.data['summary'][0]
+        _stats = self.data['stats'][1]
+        return {
+            'hashrate': float(_summary['RT HASHRATE'][:-5]),
+            'temp_in': max(float(_stats['temp_in_chip_%s' %num]) 
+                           for num in [1, 2, 3]),
+            'temp_out': max(float(_stats['temp_out_chip_%s' %num]) 
+                            for num in [1, 2, 3]),
+            'fans': [_stats['fan%s' %num] 
+                     for num in range(1, _stats['fan_num'] + 1)],
+            'accepted': _summary['Accepted'],
+            'rejected': _summary['Rejected']
+        }
+
+
+    def fingerprint(self, msg: str) -> dict:
+        _stats = loads(msg[:-1])['STATS'][0]
+        return {'model': _stats.get('Type'), 
+                'firmware': _stats.get('CompileTime')}
 
 
     def to_dict(self, data: list) -> dict:
@@ -169,13 +240,9 @@ class AntminerChannels(CreateChannels):
                     _response_dict[cmd] = _response[cmd.upper()]
                     break
         # Remove sensitive informations
-        for pool in _response_dict['pools']:
+        for pool in _response_dict.get('pools', []):
             pool['URL'] = "---"
             pool['User'] = "---"
-
-        # Save the data in the json file
-        with open(self.json_file, 'w') as json_file:
-            dump(_response_dict, json_file)
         return _response_dict
 
 
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+This module computes fleet-wide health statistics from the metric histories 
+of the miners. The histories are loaded in NumPy arrays of shape 
+(miners, time steps) so the statistics of the whole fleet are computed in 
+batch.
+"""
+
+import numpy
+from glob import glob
+from os import path
+from paesslerag_prtg_sensor_api.sensor.result import CustomSensorResult
+# Local library imports
+from custom_sensor_lib.history import MetricHistory
+
+
+# Robust z-score from which a miner is an outlier of its peers
+OUTLIER_SCORE = 3.5
+
+
+def _history_address(file: str) -> tuple:
+    # Miner address of a history file named miner_<ip>_<port>.history
+    _name = path.basename(file)[len('miner_'):-len('.history')]
+    _ip, _port = _name.rsplit('_', 1)
+    return (_ip, int(_port))
+
+
+def load_fleet(history_dir: str, start: float, end: float, 
+               step: float=60) -> dict:
+    """
+    This function loads the metric histories of a directory on a common 
+    time grid. It returns {'addresses': [(ip, port), ...], 'time': ..., 
+    'hashrate': ..., 'temp_in': ..., 'temp_out': ..., 'fan_min': ...} 
+    where time is the array of the time steps and the metrics are arrays 
+    of shape (miners, time steps), NaN where a miner has no record. 
+    The lowest running fan speed of a miner is fan_min.
+
+    Parameters:
+    history_dir (str)       : The directory of the history files.
+    start (float)           : The start timestamp of the time window.
+    end (float)             : The end timestamp of the time window.
+    step (float)            : The duration of a time step in seconds, 
+    the latest record of a miner in a time step is kept.
+    """
+
+    _files = sorted(glob(path.join(history_dir, 'miner_*.history')))
+    _steps = int((end - start) // step) + 1
+    fleet = {'addresses': [], 'time': start + step * numpy.arange(_steps)}
+    for metric in ['hashrate', 'temp_in', 'temp_out', 'fan_min']:
+        fleet[metric] = numpy.full((len(_files), _steps), numpy.nan)
+    for row, file in enumerate(_files):
+        fleet['addresses'].append(_history_address(file))
+        with MetricHistory(file) as history: 
+            _records = history.query(start, end)
+        # Records are ordered by time, so the latest of a step is assigned 
+        # last
+        _step = ((_records['time'] - start) // step).astype(int)
+        for metric in ['hashrate', 'temp_in', 'temp_out']:
+            fleet[metric][row, _step] = _records[metric]
+        # Stopped or missing fans have a null speed
+        _fans = numpy.where(_records['fans'] > 0, _records['fans'], 
+                            numpy.inf).min(axis=1)
+        fleet['fan_min'][row, _step] = numpy.where(
+            numpy.isinf(_fans), numpy.nan, _fans)
+    return fleet
+
+
+def rolling_mean(values, window: int):
+    """
+    This function returns the mean of the last window time steps of each 
+    time step, ignoring NaN values.
+
+    Parameters:
+    values (numpy.ndarray)  : The metric array (miners, time steps).
+    window (int)            : The number of time steps of the mean.
+    """
+
+    _valid = ~numpy.isnan(values)
+    _zeros = numpy.zeros(values.shape[:-1] + (1,))
+    _sums = numpy.concatenate(
+        (_zeros, numpy.cumsum(numpy.where(_valid, values, 0), axis=-1)), 
+        axis=-1)
+    _counts = numpy.concatenate(
+        (_zeros, numpy.cumsum(_valid, axis=-1)), axis=-1)
+    _end = numpy.arange(1, values.shape[-1] + 1)
+    _start = numpy.maximum(_end - window, 0)
+    _counts = _counts[..., _end] - _counts[..., _start]
+    return numpy.divide(_sums[..., _end] - _sums[..., _start], _counts, 
+                        out=numpy.full(values.shape, numpy.nan), 
+                        where=_counts > 0)
+
+
+def latest(values):
+    """
+    This function returns the latest value of each miner that is not NaN,
+    or NaN.
+
+    Parameter:
+    values (numpy.ndarray)  : The metric array (miners, time steps).
+    """
+
+    _last = values.shape[1] - 1 - \
+        numpy.argmax(~numpy.isnan(values[:, ::-1]), axis=1)
+    return values[numpy.arange(values.shape[0]), _last]
+
+
+def trend(time, values):
+    """
+    This function returns the least squares slope per second of each miner 
+    metric, ignoring NaN values, or NaN for less than two values.
+
+    Parameters:
+    time (numpy.ndarray)    : The time steps.
+    values (numpy.ndarray)  : The metric array (miners, time steps).
+    """
+
+    _valid = ~numpy.isnan(values)
+    _counts = _valid.sum(axis=1)
+    _time = numpy.where(_valid, time, 0)
+    _values = numpy.where(_valid, values, 0)
+    _nan = numpy.full(len(values), numpy.nan)
+    _time_mean = numpy.divide(_time.sum(axis=1), _counts, out=_nan.copy(), 
+                              where=_counts > 0)
+    _values_mean = numpy.divide(_values.sum(axis=1), _counts, 
+                                out=_nan.copy(), where=_counts > 0)
+    _dtime = numpy.where(_valid, time - _time_mean[:, None], 0)
+    _dvalues = numpy.where(_valid, values - _values_mean[:, None], 0)
+    _variance = (_dtime * _dtime).sum(axis=1)
+    return numpy.divide((_dtime * _dvalues).sum(axis=1), _variance, 
+                        out=_nan, where=_variance > 0)
+
+
+def peer_scores(values, groups):
+    """
+    This function returns the robust z-score of each miner value among the 
+    miners of its group, based on the median and the median absolute 
+    deviation. Groups of less than 3 miners have NaN scores.
+
+    Parameters:
+    values (numpy.ndarray)  : The value of each miner.
+    groups (list)           : The peer group of each miner (model, rack).
+    """
+
+    _groups = numpy.asarray(groups)
+    scores = numpy.full(len(values), numpy.nan)
+    for group in numpy.unique(_groups):
+        _peers = (_groups == group) & ~numpy.isnan(values)
+        if _peers.sum() < 3: continue
+        _values = values[_peers]
+        _deviations = numpy.abs(_values - numpy.median(_values))
+        # Fall back to the mean absolute deviation if most peers are equal
+        _scale = 1.4826 * numpy.median(_deviations) or \
+            1.2533 * _deviations.mean()
+        scores[_peers] = \
+            (_values - numpy.median(_values)) / _scale if _scale else 0
+    return scores
+
+
+def fleet_summary(fleet: dict, miners: dict=None, window: int=5, 
+                  horizon: float=86400) -> dict:
+    """
+    This function returns the health summary of a fleet: 
+    {'miners': ..., 'reporting': ..., 
+     'models': {model: {'miners': ..., 'hashrate_p10': ..., 
+                        'hashrate_p50': ..., 'hashrate_p90': ...}},
+     'hot': [...], 'low_hashrate': [...], 'fans_near_limit': [...]}
+    where hot and low_hashrate list the outliers of their peer group as 
+    {'ip': ..., 'port': ..., 'value': ..., 'score': ...} and 
+    fans_near_limit lists the miners whose lowest fan speed is under, or 
+    trends to reach within the horizon, their fan warning limit as 
+    {'ip': ..., 'port': ..., 'value': ..., 'hours_to_limit': ...}.
+
+    Parameters:
+    fleet (dict)            : The fleet arrays returned by load_fleet.
+    miners (dict)           : The miners {(ip, port): {'model': ..., 
+    'group': ..., 'fan_limit': ...}}. The peer group defaults to the model 
+    and unknown miners have no fan limit.
+    window (int)            : The number of time steps of the rolling mean 
+    of the metrics.
+    horizon (float)         : The time in seconds within which a fan 
+    trending to its limit is reported.
+    """
+
+    _miners = [(miners or {}).get(address, {}) 
+               for address in fleet['addresses']]
+    _models = numpy.array([miner.get('model') or 'Unknown' 
+                           for miner in _miners])
+    _groups = [miner.get('group') or model 
+               for miner, model in zip(_miners, _models)]
+    _fan_limits = numpy.array([miner.get('fan_limit') or numpy.nan 
+                               for miner in _miners], float)
+    _hashrate = latest(rolling_mean(fleet['hashrate'], window))
+    _temperature = latest(rolling_mean(
+        numpy.fmax(fleet['temp_in'], fleet['temp_out']), window))
+    _fan = latest(fleet['fan_min'])
+    _slope = trend(fleet['time'], fleet['fan_min'])
+
+    summary = {
+        'miners': len(fleet['addresses']),
+        'reporting': int((~numpy.isnan(
+            fleet['hashrate'][:, -window:])).any(axis=1).sum()),
+        'models': {}
+    }
+    for model in numpy.unique(_models):
+        _values = _hashrate[(_models == model) & ~numpy.isnan(_hashrate)]
+        if not len(_values): continue
+        _percentiles = numpy.percentile(_values, [10, 50, 90])
+        summary['models'][str(model)] = {'miners': len(_values)}
+        for name, value in zip(['p10', 'p50', 'p90'], _percentiles):
+            summary['models'][str(model)]['hashrate_' + name] = \
+                round(float(value), 2)
+
+    _outliers = lambda selected, values, scores: [
+        {'ip': fleet['addresses'][row][0], 
+         'port': fleet['addresses'][row][1],
+         'value': round(float(values[row]), 2), 
+         'score': round(float(scores[row]), 2)} 
+        for row in numpy.flatnonzero(selected)]
+    _scores = peer_scores(_temperature, _groups)
+    summary['hot'] = _outliers(_scores > OUTLIER_SCORE, _temperature, 
+                               _scores)
+    _scores = peer_scores(_hashrate, _groups)
+    summary['low_hashrate'] = _outliers(_scores < -OUTLIER_SCORE, 
+                                        _hashrate, _scores)
+
+    # Time for a decreasing fan speed to reach its limit
+    _falling = (_slope < 0) & (_fan > _fan_limits)
+    _time_to_limit = numpy.divide(_fan_limits - _fan, _slope, 
+                                  out=numpy.full(len(_fan), numpy.inf), 
+                                  where=_falling)
+    _time_to_limit[_fan <= _fan_limits] = 0
+    summary['fans_near_limit'] = [
+        {'ip': fleet['addresses'][row][0], 
+         'port': fleet['addresses'][row][1],
+         'value': round(float(_fan[row])), 
+         'hours_to_limit': round(float(_time_to_limit[row]) / 3600, 1)}
+        for row in numpy.flatnonzero(_time_to_limit <= horizon)]
+    return summary
+
+
+def summary_result(summary: dict) -> str:
+    """
+    This function returns the fleet summary as the PRTG json result of an 
+    aggregate sensor.
+    """
+
+    _result = CustomSensorResult(
+        text='%s/%s miners reporting' 
+        %(summary['reporting'], summary['miners']))
+    _result.add_primary_channel(
+        name='Miners reporting',
+        value=summary['reporting'],
+        unit='miners'
+    )
+    _result.add_channel(
+        name='Miners not reporting',
+        value=summary['miners'] - summary['reporting'],
+        unit='miners',
+        is_limit_mode=True,
+        limit_max_warning=0
+    )
+    for name, key in [('Hot miners', 'hot'), 
+                      ('Low hashrate miners', 'low_hashrate'), 
+                      ('Fans near limit', 'fans_near_limit')]:
+        _result.add_channel(
+            name=name,
+            value=len(summary[key]),
+            unit='miners',
+            is_limit_mode=True,
+            limit_max_warning=0
+        )
+    for model, stats in summary['models'].items():
+        for name in ['p10', 'p50', 'p90']:
+            _result.add_channel(
+                name='%s hashrate %s' %(model, name),
+                value=stats['hashrate_' + name],
+                unit=' ',
+                is_float=True
+            )
+    return _result.json_result
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+class CircuitBreaker():
+    """
+    This class stops requesting a miner after consecutive failures. 
+
+    Once open, the miner is only probed again after an interval doubling 
+    at each failed probe (half-open state); a successful request closes 
+    the circuit. Its state is a json serializable dictionary saved between 
+    the sensor runs.
+    """
+
+    MAX_INTERVAL = 3600
+
+    def __init__(self, state: dict, max_failures: int=3, 
+                 interval: float=60):
+        """
+        Constructor for the CircuitBreaker class.
+
+        Parameters:
+        state (dict)            : The state saved by a previous run.
+        max_failures (int)      : The consecutive failures opening the 
+        circuit. If 0, the circuit is never opened.
+        interval (float)        : The first time interval in seconds 
+        before probing an unreachable miner.
+        """
+
+        self.failures = state.get('failures', 0)
+        self.interval = state.get('interval', interval)
+        self.next_probe = state.get('next_probe', 0)
+        self._max_failures = max_failures
+        self._first_interval = interval
+
+
+    @property
+    def is_open(self) -> bool:
+        return bool(self._max_failures) and \
+            self.failures >= self._max_failures
+
+
+    def allow(self, now: float) -> bool:
+        """
+        This function returns True if the miner may be requested: the 
+        circuit is closed or it is time to probe the miner.
+        """
+
+        return not self.is_open or now >= self.next_probe
+
+
+    def record_failure(self, now: float):
+        if self.is_open: 
+            # A failed probe, wait longer before the next one
+            self.interval = min(self.interval * 2, self.MAX_INTERVAL)
+        self.failures += 1
+        if self.is_open: self.next_probe = now + self.interval
+
+
+    def record_success(self):
+        self.failures = 0
+        self.interval = self._first_interval
+        self.next_probe = 0
+
+
+    def to_dict(self) -> dict:
+        return {'failures': self.failures, 'interval': self.interval, 
+                'next_probe': self.next_probe}
@@ -22,7 +22,27 @@
 # SOFTWARE.
 
 import socket
-from time import sleep
+from time import sleep, monotonic
+# Local library imports
+from custom_sensor_lib.retry_policy import RetryPolicy
+from custom_sensor_lib.timings import LatencyStats, Timings
+
+
+class MinerUnreachable(Exception):
+    """This exception is raised when the miner does not answer in time."""
+
+
+def can_connect(server_ip: str, server_port: int, timeout: float) -> bool:
+    """
+    This function returns True if a connection to the miner succeeds 
+    within the timeout, a cheap check that the miner is back.
+    """
+
+    try:
+        with socket.create_connection((server_ip, server_port), timeout): 
+            return True
+    except OSError: return False
+
 
 
 class ClientSocket():
@@ -34,10 +54,19 @@ class ClientSocket():
     _CONNECTION_TYPE = (socket.AF_INET, socket.SOCK_STREAM)
     _ENCODING = 'utf-8'
     _BUFFER_SIZE = 4096
+    _MAX_BUFFER_SIZE = 2 ** 20
+    # Longest adaptive waiting time, as a multiple of the waiting time
+    _MAX_WAIT_FACTOR = 10
+    # Receive buffer size fitted to the observed responses of each miner 
+    # request format, for the sockets without persisted sizes
+    _buffer_sizes = {}
 
     def __init__(self, server_ip: str, server_port: int, 
                  miner_cmds: list, miner_msg_format: str, 
-                 wait_time: float=100):
+                 wait_time: float=100, msg_terminator: str=None,
+                 timeout: float=None, timings: Timings=None, 
+                 buffer_size: int=None, latency: LatencyStats=None,
+                 retry_policy: RetryPolicy=None, buffer_sizes: dict=None):
         """
         Constructor for the ClientSocket class.
 
@@ -48,6 +77,26 @@ class ClientSocket():
         miner_msg_format (str)  : Miner specific request message format. 
         wait_time (float)       : The waiting time for the socket 
         in milliseconds (> 100ms).
+        msg_terminator (str)    : Miner specific end of response delimiter.
+        If None, a response ends when the miner closes the connection or 
+        the waiting time expires.
+        timeout (float)         : The time budget in seconds to fetch the 
+        data, shared by the connection, the requests and the responses. 
+        If None, only the waiting time bounds the responses.
+        timings (Timings)       : The timings recording the durations of 
+        the connections, requests and responses and the retries of each 
+        command. If None, new timings are created.
+        buffer_size (int)       : Miner specific initial size of the 
+        receive buffer in bytes. It grows to fit the observed responses.
+        latency (LatencyStats)  : The latency statistics of the miner, 
+        updated by the responses. If set, the time to wait for a response 
+        is derived from them, between the waiting time and 10 times the 
+        waiting time, else it is 3 times the waiting time.
+        retry_policy (RetryPolicy)  : The policy retrying a command without 
+        response. If None, 3 attempts with a backoff from the waiting time.
+        buffer_sizes (dict)     : The receive buffer sizes of the miner 
+        request formats, updated as the buffer grows. If None, the sizes 
+        of the process.
         """
 
         self._data = []
@@ -55,43 +104,148 @@ class ClientSocket():
         self._wait_time = wait_time / 1000 if wait_time > 100 else 0.1
         self._commands = miner_cmds
         self._msg_format = miner_msg_format
+        self._msg_terminator = \
+            (msg_terminator or '').encode(self._ENCODING)
+        self._closed = True
+        if buffer_sizes is not None: self._buffer_sizes = buffer_sizes
+        self._buffer = bytearray(self._buffer_sizes.setdefault(
+            miner_msg_format, buffer_size or self._BUFFER_SIZE))
+        self._timeout = timeout
+        self._deadline = None
+        self.timings = Timings() if timings is None else timings
+        self.latency = latency
+        self.retry_policy = retry_policy or RetryPolicy(
+            3, self._wait_time, self._wait_time * self._MAX_WAIT_FACTOR)
         
     
+    def _remaining(self, limit: float=None) -> float:
+        # Time left of the budget, bounded by the phase limit
+        if self._deadline is None: return limit
+        _remaining = self._deadline - monotonic()
+        if _remaining <= 0: 
+            raise MinerUnreachable('No response within %s s' %self._timeout)
+        return _remaining if limit is None else min(limit, _remaining)
+
+    
+    def _response_timeout(self) -> float:
+        # Time to wait for a response, adapted to the miner latency
+        if self.latency is None: return self._wait_time * 3
+        return self.latency.timeout(
+            self._wait_time, self._wait_time * self._MAX_WAIT_FACTOR)
+
+
+    def _add_latency(self, latency: float):
+        # Only the responses of a known length are measured
+        if self.latency is not None and self._msg_terminator: 
+            self.latency.add(latency)
+
+
+    def _close(self):
+        self._socket.close()
+        self._closed = True
+
+
     def _connect(self):
-        # Create a socket and connect to the miner
+        # Create a socket and connect to the miner, the connection 
+        # may use up to half of the remaining budget
+        _timeout = self._remaining()
         try:
             self._socket = socket.socket(*self._CONNECTION_TYPE)
-            self._socket.connect(self._server_addr)
+            self._socket.settimeout(
+                None if _timeout is None else _timeout / 2)
+            with self.timings.phase('connect'):
+                self._socket.connect(self._server_addr)
+            self._closed = False
+        except OSError as e:
+            self._socket.close()
+            raise MinerUnreachable('Connection to %s:%s failed (%s)' 
+                                   %(*self._server_addr, 
+                                     e.strerror or type(e).__name__))
         except Exception as e:
             raise Exception(e)
 
 
-    def _recv_msg(self):
+    def _is_complete(self, msg: bytearray) -> bool:
+        # A framed response is complete once its terminator is received
+        return bool(self._msg_terminator) and \
+            msg.endswith(self._msg_terminator)
+
+
+    def _fit_buffer(self, msg_size: int):
+        # Grow the receive buffer to the next power of two of the response 
+        # size, so a response is received in a few calls
+        _size = len(self._buffer)
+        while _size < min(msg_size, self._MAX_BUFFER_SIZE): _size *= 2
+        if _size > len(self._buffer):
+            self._buffer = bytearray(_size)
+            self._buffer_sizes[self._msg_format] = _size
+
+
+    def _recv_msg(self) -> bool:
+            # Receive a response, it returns True if a partial framed 
+            # response was discarded
+            _msg = bytearray()
+            _buffer = memoryview(self._buffer)
+            _timeout = self._response_timeout()
+            _start = monotonic()
             try:
-                self._data.append("")
                 while 1:
                     # Set a timeout to listen to a response
-                    self._socket.settimeout(self._wait_time * 3)
-                    _msg = str(self._socket.recv(self._BUFFER_SIZE), 
-                               self._ENCODING)
-                    if _msg: self._data[-1] += _msg
-                    else: break
-            except socket.timeout: pass
+                    self._socket.settimeout(self._remaining(_timeout))
+                    _size = self._socket.recv_into(_buffer)
+                    if _size: 
+                        _msg += _buffer[:_size]
+                        # Return as soon as the whole response is received
+                        if self._is_complete(_msg): 
+                            self._add_latency(monotonic() - _start)
+                            break
+                    else: 
+                        # The miner closed the connection
+                        self._close()
+                        break
+            except socket.timeout: 
+                # A late response, wait longer the next times
+                self._add_latency(2 * _timeout)
+            except MinerUnreachable: 
+                self._close()
+                raise
             except (ConnectionAbortedError, OSError) as e: 
-                self._socket.close()
+                self._close()
             except Exception as e:
-                self._socket.close()
+                self._close()
                 raise Exception(e)
+            finally: _buffer.release()
+            self._fit_buffer(len(_msg))
+            self.timings.add_bytes(len(_msg))
+            # A framed response cut off by a timeout or the miner closing 
+            # the connection is discarded, its end could still arrive on 
+            # the connection
+            _partial = bool(self._msg_terminator) and bool(_msg) and \
+                not self._is_complete(_msg)
+            if _partial:
+                if not self._closed: self._close()
+                _msg = bytearray()
+            # Decode the whole response at once, so multi-byte characters
+            # split between two chunks are decoded correctly
+            self._data.append(str(_msg, self._ENCODING))
+            return _partial
 
 
     def _send_msg(self, _msg: str):
+        # Some miners close the connection after each response
+        if _msg and self._closed: self._connect()
         try:
             if _msg:
+                self._socket.settimeout(
+                    self._remaining(self._response_timeout()))
                 self._socket.send(_msg.encode(self._ENCODING))
+        except MinerUnreachable: 
+            self._close()
+            raise
         except OSError:
-            self._socket.close()
+            self._close()
         except Exception as e: 
-            self._socket.close()
+            self._close()
             raise Exception(e)
 
 
@@ -100,21 +254,40 @@ class ClientSocket():
         This method is used to fetch data from the miner.
 
         It sends a request with a command in a specific format and then  
-        listen for the response using a receaving thread function.
+        listen for the response using a receaving thread function. 
+        If a message terminator is set, a response is returned as soon 
+        as its terminator is received instead of waiting for a timeout.
+        If the time budget runs out, MinerUnreachable is raised.
         """
 
+        if self._timeout: self._deadline = monotonic() + self._timeout
         self._connect()
         for _cmd in self._commands:
-            for _ in range(3):
-                self._send_msg(self._msg_format %_cmd)
+            _attempt = 0
+            while 1:
+                _reused = not self._closed
+                with self.timings.phase('send %s' %_cmd):
+                    self._send_msg(self._msg_format %_cmd)
                 # Try to receive the response
-                self._recv_msg()
+                with self.timings.phase('recv %s' %_cmd):
+                    _partial = self._recv_msg()
                 if self._data[-1]: break
                 else: 
                     # Resend the command
                     self._data.pop()
+                    # The miner closed the previous connection without
+                    # answering, resend at once on a new connection
+                    if _reused and self._closed and not _partial: continue
+                    _delay = self.retry_policy.retry_delay(_attempt)
+                    if _delay is None: break
+                    _attempt += 1
+                    self.timings.add_retry(_cmd)
                     self._connect()
-                    sleep(self._wait_time * 3)
-        self._socket.close()
+                    with self.timings.phase('retry wait'):
+                        sleep(self._remaining(_delay))
+        self._close()
+        if not self._data: 
+            raise MinerUnreachable('No response from %s:%s' 
+                                   %self._server_addr)
         return self._data
 
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import asyncio
+from time import monotonic
+from json import loads
+from paesslerag_prtg_sensor_api.sensor.result import CustomSensorResult
+# Local library imports
+from custom_sensor_lib.fleet_poller import poll_fleet
+from custom_sensor_lib.history import MetricHistory
+
+
+_ENCODING = 'utf-8'
+
+
+class Collector():
+    """
+    This class is a long-running collector that polls a fleet of miners on 
+    its own schedule and keeps the latest PRTG channels of each miner in 
+    memory. The sensor scripts fetch them over a local Unix socket.
+    """
+
+    def __init__(self, miners: list, socket_path: str, interval: float=60,
+                 concurrency: int=100, deadline: float=10, 
+                 wait_time: float=100, miner_classes: list=None,
+                 history_dir: str=None, history_size: int=None, 
+                 retry_policy=None):
+        """
+        Constructor for the Collector class.
+
+        Parameters:
+        miners (list)           : A list of (channels_class, ip) or 
+        (channels_class, ip, port) tuples.
+        socket_path (str)       : The path of the Unix socket to listen on.
+        interval (float)        : The polling interval in seconds.
+        concurrency (int)       : The maximum number of miners polled 
+        at the same time.
+        deadline (float)        : The time limit in seconds to poll one miner.
+        wait_time (float)       : The waiting time for a response 
+        in milliseconds (> 100ms).
+        miner_classes (list)    : The CreateChannels subclasses of the 
+        miners the sensors can add to the polled miners.
+        history_dir (str)       : The directory of the metric histories of 
+        the miners. If None, no history is saved.
+        history_size (int)      : The number of records kept in each 
+        metric history.
+        retry_policy (RetryPolicy)  : The policy retrying a failed poll. 
+        If None, each miner is polled once per interval.
+        """
+
+        self.miners = {}
+        self._miner_types = {cls.__name__: cls for cls in miner_classes or 
+                             [miner[0] for miner in miners]}
+        for miner in miners: self.add_miner(*miner)
+        self.snapshots = {}
+        self._socket_path = socket_path
+        self._interval = interval
+        self._concurrency = concurrency
+        self._deadline = deadline
+        self._wait_time = wait_time
+        self._history_dir = history_dir
+        self.retry_policy = retry_policy
+        self._history_size = history_size or MetricHistory.CAPACITY
+        # Snapshots older than two intervals are not served
+        self.max_age = 2 * interval
+
+
+    def add_miner(self, channels_class, server_ip: str, 
+                  server_port: int=None):
+        self.miners[(server_ip, server_port or channels_class.SERVER_PORT)] \
+            = channels_class
+
+
+    def _build_result(self, channels_class, data, address: tuple, 
+                      channel_groups: list=None) -> str:
+        # Create the PRTG json result of a polled miner
+        if isinstance(data, Exception):
+            _result = CustomSensorResult(text="Miner unreachable")
+            _result.error = "ERROR: Miner unreachable (%s)" \
+                %(str(data) or type(data).__name__)
+            return _result.json_result
+        _channels = channels_class()
+        _channels.data = data
+        _channels.channel_groups = channel_groups
+        try: 
+            _json = _channels.build_result()
+            # The metrics are saved once per poll, with the full result
+            if self._history_dir and channel_groups is None:
+                _channels.append_history(self._history_dir, *address, 
+                                         self._history_size)
+        except Exception as e: 
+            return self._build_result(channels_class, e, address)
+        return _json
+
+
+    def get_snapshot(self, server_ip: str, server_port: int, 
+                     channels: list=None) -> str:
+        """
+        This function returns the latest PRTG json result of a miner, 
+        or None if it is unknown or outdated. 
+
+        Parameters:
+        server_ip (str)         : The IP address of the miner.
+        server_port (int)       : The port for the miner monitoring interface.
+        channels (list)         : The groups of channels of the result, all 
+        the channels if None. None is returned for an unknown group.
+        """
+
+        _address = (server_ip, server_port)
+        _snapshot = self.snapshots.get(_address)
+        if not _snapshot or monotonic() - _snapshot[0] > self.max_age: 
+            return None
+        if not channels: return _snapshot[1]
+        _class = self.miners[_address]
+        if set(channels) - set(_class.CHANNEL_GROUPS): return None
+        # The results of a selection are built once per poll
+        _key = tuple(channels)
+        if _key not in _snapshot[3]:
+            _snapshot[3][_key] = self._build_result(_class, _snapshot[2], 
+                                                    _address, list(channels))
+        return _snapshot[3][_key]
+
+
+    async def poll(self):
+        """This function polls all the miners once."""
+
+        _miners = [(cls, *address) for address, cls in self.miners.items()]
+        _results = await poll_fleet(_miners, self._concurrency, 
+                                    self._deadline, self._wait_time, 
+                                    self.retry_policy)
+        for address, data in _results.items():
+            _json = self._build_result(self.miners[address], data, address)
+            # The data is kept for the sensors selecting groups of channels
+            self.snapshots[address] = (monotonic(), _json, data, {})
+
+
+    async def handle_client(self, reader: asyncio.StreamReader, 
+                            writer: asyncio.StreamWriter):
+        """
+        This function answers a sensor request {"ip": ..., "port": ..., 
+        "type": ..., "channels": [...]} with the miner PRTG json result of
+        the channel groups, or an empty line if no result is available. 
+        An unknown miner is added to the polled miners if its type is 
+        known.
+        """
+
+        _json = ''
+        try:
+            _request = loads(await reader.readline())
+            _address = (_request['ip'], int(_request['port']))
+            if _address in self.miners: 
+                _json = self.get_snapshot(*_address, 
+                                          _request.get('channels')) or ''
+            elif _request.get('type') in self._miner_types:
+                self.add_miner(self._miner_types[_request['type']], 
+                               *_address)
+            writer.write((_json + '\n').encode(_ENCODING))
+            await writer.drain()
+        except (ValueError, KeyError, TypeError, ConnectionError): pass
+        finally: writer.close()
+
+
+    async def run(self):
+        """This function serves the sensors and polls the miners forever."""
+
+        _server = await asyncio.start_unix_server(self.handle_client, 
+                                                  self._socket_path)
+        async with _server:
+            while True:
+                _start = monotonic()
+                await self.poll()
+                await asyncio.sleep(
+                    max(0, self._interval - (monotonic() - _start)))
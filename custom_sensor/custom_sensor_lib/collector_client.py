@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import socket
+from json import loads, dumps
+
+
+_ENCODING = 'utf-8'
+
+
+def collector_request(prtg_args: list, server_port: int) -> tuple:
+    """
+    This function reads the collector socket path, the miner IP address, 
+    port and channel groups from the PRTG sensor arguments, without 
+    parsing and checking the other parameters. It returns (socket_path, 
+    ip, port, channels), or None if the collector parameter is not set or 
+    the arguments are invalid. The rates and timings channels are specific 
+    to each sensor run, the sensors using them are not served by the 
+    collector.
+
+    Parameters:
+    prtg_args (list)        : PRTG sensor arguments.
+    server_port (int)       : The default port of the miner.
+    """
+
+    try:
+        _prtg_args = loads(prtg_args[1])
+        _params = {}
+        for param in _prtg_args['params'].split('--'):
+            _param = param.strip().split(None, 1)
+            if _param: _params[_param[0]] = (_param[1:] or [''])[0].strip()
+        if not _params.get('collector'): return None
+        if _params.get('rates', '').lower() == 'true' or \
+                _params.get('timings', '').lower() == 'true':
+            return None
+        _port = _params.get('port', '')
+        _channels = [item.strip().lower() for item in 
+                     _params.get('channels', '').split(',') if item.strip()]
+        return (_params['collector'], _prtg_args['host'], 
+                int(_port) if _port.isdigit() else server_port, 
+                _channels or None)
+    except (IndexError, KeyError, TypeError, ValueError, AttributeError): 
+        return None
+
+
+def query_collector(socket_path: str, server_ip: str, server_port: int,
+                    miner_type: str, channels: list=None, 
+                    timeout: float=1) -> str:
+    """
+    This function requests the PRTG json result of a miner from a 
+    collector daemon. It returns None if the daemon is absent or has no 
+    result for the miner.
+
+    Parameters:
+    socket_path (str)       : The path of the collector Unix socket.
+    server_ip (str)         : The IP address of the miner.
+    server_port (int)       : The port for the miner monitoring interface.
+    miner_type (str)        : The name of the miner CreateChannels subclass.
+    channels (list)         : The groups of channels of the result, all the
+    channels if None.
+    timeout (float)         : The time limit in seconds for the request.
+    """
+
+    # Unix sockets are not available on every system 
+    if not hasattr(socket, 'AF_UNIX'): return None
+    _request = dumps({'ip': server_ip, 'port': server_port, 
+                      'type': miner_type, 'channels': channels}) + '\n'
+    _response = b''
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as _socket:
+            _socket.settimeout(timeout)
+            _socket.connect(socket_path)
+            _socket.sendall(_request.encode(_ENCODING))
+            while not _response.endswith(b'\n'):
+                _msg = _socket.recv(4096)
+                if not _msg: break
+                _response += _msg
+    except OSError: return None
+    return _response.decode(_ENCODING).strip() or None
@@ -21,19 +21,39 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from sys import argv
+from sys import argv, exc_info
+from time import time, monotonic
+from json import loads, dump, dumps
 from traceback import format_exc
+from os import path
 from paesslerag_prtg_sensor_api.sensor.result import CustomSensorResult
+from paesslerag_prtg_sensor_api.sensor.units import ValueUnit
 # Local library imports
+from custom_sensor_lib.circuit_breaker import CircuitBreaker
+from custom_sensor_lib.client_socket import MinerUnreachable, can_connect
+from custom_sensor_lib.collector_client import (
+        collector_request,
+        query_collector
+    )
+from custom_sensor_lib.log_retention import prune_logs
+from custom_sensor_lib.sensor_state import load_state, save_state
 from custom_sensor_lib.sensor_util import (
         assign_sensor_files,
+        buffer_sizes,
         get_data, 
         get_logger,
+        miner_latency,
         parse_sensor_params, 
+        run_deadline,
+        run_timings,
         script_params
     )
 
 
+# Time limit in seconds of the connection attempt probing a failing miner
+_PROBE_TIMEOUT = 2
+
+
 class CreateChannels():
     """
     This class fetches monitoring data from the miner and integrates it into 
@@ -48,19 +68,68 @@ class CreateChannels():
 
     * The SERVER_PORT: a integer for the service port of the miner.
 
+    * The MSG_TERMINATOR variable (optional): a string marking the end of 
+    a miner response, so it is returned as soon as it is received.
+
+    * The BATCH_SEPARATOR variable (optional): a string joining the COMMANDS 
+    in a single request if the miner API accepts batched commands.
+
+    * The counters and uptime methods (optional): the cumulative counters 
+    of the miner and its uptime, for the per minute rate channels.
+
+    * The CHANNEL_GROUPS variable (optional): the commands {group: [...]} 
+    each group of channels depends on. Only the commands of the groups 
+    selected by the --channels parameter are requested, the channels method 
+    creates the groups for which selected returns True.
+
+    * The REFRESH_CYCLES variable (optional): the slow changing commands 
+    {command: N} requested every N runs only, their data is reused between 
+    two refreshes. The command_key method returns the key of the data of a 
+    command in the to_dict result.
+
+    * The history_record method (optional): the metrics of the miner saved 
+    in its metric history.
+
+    * The FAN_LIMIT_MIN_WARNING variable (optional): the fan speed under 
+    which a fan channel is in warning, also used by the fleet analytics.
+
+    * The DISCOVERY_COMMAND variable and the fingerprint method (optional): 
+    the command identifying the miner model and firmware for the discovery 
+    of the miners of a network.
+
     * Implement to_dict and channels methods. 
     """
 
     MSG_FORMAT: str 
     COMMANDS: list
     SERVER_PORT: int
+    MSG_TERMINATOR: str = None
+    BATCH_SEPARATOR: str = None
+    CHANNEL_GROUPS: dict = {}
+    REFRESH_CYCLES: dict = {}
+    DISCOVERY_COMMAND: str = None
+    FAN_LIMIT_MIN_WARNING: int = None
+    json_file: str = None
+    snapshot_age: float = None
+    # Time of the data of a snapshot, the time of the run if None
+    data_time: float = None
+    # Groups of channels created, the channels parameter if None
+    channel_groups: list = None
+    # Start time of the current run
+    _start: float = None
+    # Deadline of the budget of the current run, from its start
+    deadline: float = None
+    # Commands requested in the current run, all the COMMANDS if None
+    commands: list = None
 
     def __init__(self):
         """
         The following parameters are defined in the PRTG sensor parameters:
         --port      : The port for the miner monitoring interface (API).
-        --waitTime  : The time interval (in milliseconds) the script should   
-                        wait for a response. The default value is 100.
+        --waitTime  : The shortest time interval (in milliseconds) the 
+                        script waits for a response, the waiting time adapts
+                        to the latency of the miner up to 10 times this 
+                        interval. The default value is 100.
         --jsonFile  : The path of the json file where the requested data   
                         will be saved. If not specified, a file will be 
                         automatically created.
@@ -69,14 +138,109 @@ class CreateChannels():
                         This file should accept the following parameters:   
                         --ip, --port, --file, --wait, --mode. The data should
                         be saved as a json file.
+        --exeTimeout: The maximum time (in seconds) the executable file may
+                        run, within the time left before the timeout. The 
+                        default value is 25.
         --forceExe  : If set to True, the script will only request 
                         monitoring data using the Windows executable file.
+        --breakerFailures: The number of consecutive failed requests after 
+                        which the miner is reported unreachable without 
+                        being requested, then probed by a connection 
+                        attempt at growing intervals. The default value is
+                        3, 0 to always request the miner.
+        --breakerInterval: The first time interval (in seconds) before 
+                        probing a failing miner. The default value is 60.
+        --retryAttempts: The number of requests of a command without 
+                        response, 1 for no retry. The default value is 3.
+        --retryDelay: The longest delay (in milliseconds) before the first
+                        retry of a command, doubled at each retry. The 
+                        default value is 0 (the waiting time).
+        --timeout   : The PRTG sensor timeout in seconds. The miner request 
+                        is given up before, with a miner unreachable 
+                        result. The default value is 60.
+        --cacheTtl  : The time (in seconds) a snapshot of the miner data is
+                        shared with the sensors requesting the same miner 
+                        commands. The default value is 0 (disabled).
+        --cacheDir  : The directory of the snapshots. If not specified,
+                        the parent directory of the sensor directory.
+        --timings   : If set to True, the durations of the execution phases
+                        and the retries are logged and the "Fetch latency 
+                        ms" and "Retries" channels are added.
+        --rates     : If set to True, the per minute rates of the miner 
+                        cumulative counters since the previous run are 
+                        added as channels.
+        --channels  : The comma separated groups of channels created by the 
+                        sensor (fans,temps). Only the miner commands of 
+                        these groups are requested. If not specified, all 
+                        the channels.
+        --refreshCycles: The number of runs between two requests of the 
+                        slow changing commands of the miner. If not 
+                        specified, the miner default; 1 requests all the 
+                        commands at each run.
+        --history   : If set to True, the metrics of each run are appended 
+                        to the metric history file of the miner in the 
+                        directory of the snapshots.
+        --historySize: The number of records kept in a new metric history,
+                        an existing history keeps its size. The default 
+                        value is 10080 (a week of 1 minute runs).
+        --logBuffer : If set to True, the log records of a run are kept in 
+                        memory and only written to the log file if the run
+                        fails, the other runs only write a one-line summary.
+        --logSampling: The records of one successful run out of logSampling
+                        are written with the logBuffer parameter. The 
+                        default value is 0 (never).
+        --logRetention: The number of days the log files are kept, the
+                        log files of the past days are compressed. The 
+                        default value is 30, 0 to keep all the log files.
+        --logMaxSize: The largest total size (in MB) of the log files of 
+                        the past days. The default value is 10.
+        --runRecords: If set to True, a json line record of each run (the
+                        miner, the durations of the phases, the bytes 
+                        received, the retries, the error) is appended to 
+                        the daily run record file of the sensor directory.
+        --collector : The Unix socket path of a running collector daemon. 
+                        If set, the channels polled by the collector are 
+                        used instead of requesting the miner, except with 
+                        the rates or timings parameters.
         
         The script utilizes the IP address that is specifically designated 
         within the settings of the PRTG device.
         """
 
     
+    def build_result(self) -> str:
+        """
+        This function creates the channels of the data and returns them
+        in the PRTG json format.
+        """
+
+        # Create an instance of the PRTG custom sensor api to create   
+        # a PRTG json format for the sensor 
+        self.result = CustomSensorResult()
+        # Create channels for a specific miner
+        self.channels()
+        if script_params['rates']: self._rate_channels()
+        if script_params['timings']:
+            self.result.add_channel(
+                name='Fetch latency ms',
+                value=run_timings.duration_ms('fetch'),
+                unit='ms',
+                is_float=True
+            )
+            self.result.add_channel(
+                name='Retries',
+                value=run_timings.total_retries(),
+                unit=' '
+            )
+        if self.snapshot_age is not None:
+            self.result.add_channel(
+                name='Snapshot age',
+                value=int(self.snapshot_age),
+                unit=ValueUnit.TIMESECONDS
+            )
+        return self.result.json_result
+
+
     def channels(self): 
         """
         This function calls the functions responsible for the creation of 
@@ -86,17 +250,196 @@ class CreateChannels():
         raise NotImplementedError
     
 
+    def counters(self) -> dict:
+        """
+        This function returns the cumulative counters {name: value} of the 
+        miner data.
+        """
+
+        return {}
+
+
+    def uptime(self) -> float:
+        """This function returns the miner uptime in seconds."""
+
+        return 0
+
+
+    def _rate_channels(self):
+        # Add the per minute rates of the counters since the previous run
+        # The rates are optional, only import the module if used
+        from custom_sensor_lib.rates import compute_rates, counters_snapshot
+
+        # The counters of a snapshot are sampled at the snapshot time
+        _current = counters_snapshot(self.data_time or time(), 
+                                     self.uptime(), self.counters())
+        _previous = load_state('counters')
+        save_state('counters', _current)
+        try: _rates = compute_rates(_previous, _current)
+        except (KeyError, TypeError): return
+        for name, rate in _rates.items():
+            self.result.add_channel(
+                name='%s per minute' %name,
+                value=rate,
+                unit='/min',
+                is_float=True
+            )
+
+
+    def history_record(self) -> dict:
+        """
+        This function returns the metrics of the miner data saved in the 
+        metric history as {'hashrate': ..., 'temp_in': ..., 'temp_out': ...,
+        'fans': [...], 'accepted': ..., 'rejected': ...}, or None.
+        """
+
+        return None
+
+
+    def append_history(self, history_dir: str, server_ip: str, 
+                       server_port: int, capacity: int=None):
+        """
+        This function appends the metrics of the miner data to its 
+        metric history.
+
+        Parameters:
+        history_dir (str)       : The directory of the history files.
+        server_ip (str)         : The IP address of the miner.
+        server_port (int)       : The port for the miner monitoring interface.
+        capacity (int)          : The number of records kept in the history.
+        """
+
+        _record = self.history_record()
+        if _record is None: return
+        # The history is optional, only import the module if used
+        from custom_sensor_lib.history import MetricHistory, history_file
+
+        with MetricHistory(history_file(history_dir, server_ip, server_port),
+                           capacity) as history:
+            history.append(time(), **_record)
+
+
+    def selected(self, group: str) -> bool:
+        """
+        This function returns True if the channels of a group are created.
+        """
+
+        _groups = script_params['channels'] if self.channel_groups is None \
+            else self.channel_groups
+        return not _groups or group in _groups
+
+
+    def required_commands(self) -> list:
+        """
+        This function returns the commands of the selected groups of 
+        channels, in the order of COMMANDS. The rates and the history 
+        need the data of all the commands.
+        """
+
+        if not script_params['channels'] or script_params['rates'] or \
+                script_params['history']: 
+            return self.COMMANDS
+        _unknown = set(script_params['channels']) - set(self.CHANNEL_GROUPS)
+        if _unknown: 
+            raise Exception('Unknown channel group(s) %s, available: %s' 
+                            %(', '.join(sorted(_unknown)), 
+                              ', '.join(self.CHANNEL_GROUPS)))
+        _commands = set()
+        for group in script_params['channels']: 
+            _commands.update(self.CHANNEL_GROUPS[group])
+        return [cmd for cmd in self.COMMANDS if cmd in _commands]
+
+
+    def command_key(self, cmd: str) -> str:
+        """
+        This function returns the key of the data of a command in the 
+        to_dict result.
+        """
+
+        return cmd
+
+
+    def fingerprint(self, msg: str) -> dict:
+        """
+        This function returns the model and firmware of the miner as 
+        {'model': ..., 'firmware': ...} from its response to the 
+        DISCOVERY_COMMAND.
+        """
+
+        raise NotImplementedError
+
+
     def handle_exception(self):
         if not script_params['logFile']: assign_sensor_files()
         _logger = get_logger()
         _logger.error('An error has occurred: %s \n\n' %format_exc(limit=2))
-        # Show the log file location in PRTG sensor
-        result = CustomSensorResult(text="Python Script execution error")
-        result.error = \
-            "ERROR: Go to \"%s\" for more details" %script_params['logFile']
+        _error = exc_info()[1]
+        _logger.info(self.run_summary(_error), extra={'summary': True})
+        self._write_run_record(_error)
+        if isinstance(_error, MinerUnreachable):
+            # A down miner is not a script error
+            result = CustomSensorResult(text="Miner unreachable")
+            result.error = "ERROR: Miner unreachable (%s)" %_error
+        else:
+            # Show the log file location in PRTG sensor
+            result = CustomSensorResult(text="Python Script execution error")
+            result.error = "ERROR: Go to \"%s\" for more details" \
+                %script_params['logFile']
         print(result.json_result)
 
 
+    def run_summary(self, error: Exception=None) -> str:
+        """
+        This function returns the one-line summary of the run: its status, 
+        the miner, its duration and the retries of the miner commands.
+        """
+
+        _status = 'failed (%s)' %type(error).__name__ if error else 'ok'
+        _duration = monotonic() - self._start if self._start else 0
+        return 'Run %s %s:%s %s in %.3f s, %d retries' \
+            %(_status, script_params['ip'], script_params['port'], 
+              type(self).__name__, _duration, run_timings.total_retries())
+
+
+    def run_record(self, error: Exception=None) -> dict:
+        """
+        This function returns the json serializable record of the run 
+        written with the runRecords parameter.
+        """
+
+        _duration = monotonic() - self._start if self._start else 0
+        return {
+            'time': round(time(), 3),
+            'sensorid': script_params['sensorid'],
+            'ip': script_params['ip'],
+            'port': script_params['port'],
+            'miner': type(self).__name__,
+            'duration_ms': round(_duration * 1000, 3),
+            'durations_ms': {name: run_timings.duration_ms(name) 
+                             for name in run_timings.durations},
+            'bytes': run_timings.bytes_received,
+            'retries': run_timings.total_retries(),
+            'retry_delay_ms': round(run_timings.retry_delay * 1000, 3),
+            'given_up': run_timings.given_up,
+            'exe': 'exe' in run_timings.durations,
+            'snapshot': bool(self.snapshot_age),
+            'error': type(error).__name__ if error else None
+        }
+
+
+    def _write_run_record(self, error: Exception=None):
+        if not script_params['runRecords'] or not script_params['logFile']:
+            return
+        # The run records are optional, only import the module if used
+        from custom_sensor_lib.run_records import records_file, write_record
+
+        try:
+            write_record(records_file(path.dirname(script_params['logFile'])),
+                         self.run_record(error))
+        except OSError as e:
+            get_logger().warning('Run record not written: %s' %e)
+
+
     def load_args(self):
         script_params['port'] = self.SERVER_PORT
         parse_sensor_params(argv)
@@ -106,27 +449,218 @@ class CreateChannels():
     def main(self):
         """Main function for the creation of the miner channels."""
 
+        self._start = monotonic()
+        # Use the channels built by the collector daemon if it is running,
+        # before parsing the parameters and opening the log file
+        _request = collector_request(argv, self.SERVER_PORT)
+        if _request:
+            _socket_path, _ip, _port, _channels = _request
+            _result = query_collector(_socket_path, _ip, _port, 
+                                      type(self).__name__, _channels)
+            if _result: 
+                print(_result)
+                return
         try:
+            run_timings.clear()
             # Load the script parameters from the PRTG sensor arguments
-            self.load_args()
-            # Request the monitoring data 
-            self.data = self.to_dict(get_data(self.COMMANDS, 
-                                              self.MSG_FORMAT))     
+            with run_timings.phase('parse'): self.load_args()
+            # The budget includes the parsing and the collector query
+            self.deadline = run_deadline(self._start)
             self.logger = get_logger()
+            # Request the monitoring data 
+            self.data = self.load_data()     
             self.logger.info('Starting the creation of channels')
-
-            # Create an instance of the PRTG custom sensor api to create   
-            # a PRTG json format for the sensor 
-            self.result = CustomSensorResult()
-            # Create channels for a specific miner
-            self.channels()
+            with run_timings.phase('channels'): _json = self.build_result()
             # Integrate the channels into PRTG sensor 
-            print(self.result.json_result)
+            with run_timings.phase('print'): print(_json)
+            # The data of a shared snapshot is already in the history
+            if script_params['history'] and not self.snapshot_age:
+                with run_timings.phase('history'):
+                    self.append_history(self._cache_dir(), 
+                                        script_params['ip'], 
+                                        script_params['port'],
+                                        script_params['historySize'])
 
             self.logger.info('Channels created')
+            if script_params['timings']: 
+                self.logger.info('Timings %s' %dumps(run_timings.to_dict()))
             self.logger.info('The script was successfully executed \n\n\n\n')
+            self.logger.info(self.run_summary(), extra={'summary': True})
+            self._write_run_record()
         except:
             self.handle_exception()            
+        finally:
+            # The result is already printed
+            self._apply_log_retention()
+
+
+    def _apply_log_retention(self):
+        # At most one pruning pass per day of the sensor directory
+        if not script_params['logRetention'] or not script_params['logFile']:
+            return
+        try:
+            prune_logs(path.dirname(script_params['logFile']), 
+                       script_params['logRetention'], 
+                       script_params['logMaxSize'] * 2 ** 20)
+        except OSError as e:
+            get_logger().warning('Log files retention failed: %s' %e)
+
+
+    def _fetch_dict(self) -> dict:
+        # Slow changing commands are only requested when they are due
+        _refresh = {cmd: script_params['refreshCycles'] or cycles 
+                    for cmd, cycles in self.REFRESH_CYCLES.items()}
+        _state = load_state('commands') if _refresh else {}
+        _cycle, _cached = _state.get('cycle', 0), _state.get('data', {})
+        self.commands = [cmd for cmd in self.required_commands() 
+                         if cmd not in _refresh or cmd not in _cached or 
+                         _cycle % _refresh[cmd] == 0]
+        _data = self._request_miner()
+        with run_timings.phase('decode'): _data = self.to_dict(_data)
+        if _refresh:
+            # Merge the data of the slow changing commands reused from 
+            # the cache
+            for cmd in _refresh:
+                _key = self.command_key(cmd)
+                if _key in _data: _cached[cmd] = _data[_key]
+                elif cmd in _cached: _data[_key] = _cached[cmd]
+            save_state('commands', {'cycle': _cycle + 1, 'data': _cached})
+        # The json file has the data of all the commands
+        self.save_json(_data)
+        return _data
+
+
+    def _request_miner(self) -> list:
+        # Do not request a miner that keeps failing, only probe it from time 
+        # to time with a connection attempt
+        _breaker = CircuitBreaker(load_state('breaker'), 
+                                  script_params['breakerFailures'],
+                                  script_params['breakerInterval'])
+        if _breaker.is_open:
+            if not _breaker.allow(time()):
+                raise MinerUnreachable(
+                    '%s consecutive failures, next attempt in %d s' 
+                    %(_breaker.failures, _breaker.next_probe - time()))
+            # The probe only uses the time left in the run budget
+            _timeout = _PROBE_TIMEOUT if self.deadline is None else \
+                min(_PROBE_TIMEOUT, self.deadline - monotonic())
+            if _timeout <= 0:
+                raise MinerUnreachable('No time left to probe %s:%s' 
+                                       %(script_params['ip'], 
+                                         script_params['port']))
+            if not can_connect(script_params['ip'], script_params['port'], 
+                               _timeout):
+                _breaker.record_failure(time())
+                save_state('breaker', _breaker.to_dict())
+                raise MinerUnreachable('Connection to %s:%s failed' 
+                                       %(script_params['ip'], 
+                                         script_params['port']))
+        # The waiting time for the responses adapts to the miner latency and
+        # the receive buffer to the size of its responses
+        miner_latency.load(load_state('latency'))
+        buffer_sizes.update(load_state('buffers'))
+        _sizes = dict(buffer_sizes)
+        try:
+            with run_timings.phase('fetch'): _data = self.request_data()
+        except Exception:
+            _breaker.record_failure(time())
+            save_state('breaker', _breaker.to_dict())
+            raise
+        finally: 
+            save_state('latency', miner_latency.to_dict())
+            if buffer_sizes != _sizes: save_state('buffers', buffer_sizes)
+        if _breaker.failures:
+            _breaker.record_success()
+            save_state('breaker', _breaker.to_dict())
+        return _data
+
+
+    def _cache_dir(self) -> str:
+        # Directory of the snapshots and histories, shared by the sensors
+        return script_params['cacheDir'] or \
+            path.dirname(path.dirname(script_params['logFile']))
+
+
+    def load_data(self) -> dict:
+        """
+        This function returns the monitoring data as a dictionary. 
+        
+        If the cacheTtl parameter is set, a fresh snapshot of the same miner 
+        and commands is used instead of requesting the miner, and saved in 
+        the json file, otherwise the requested data is saved as the new 
+        snapshot.
+        """
+
+        if not script_params['cacheTtl']: return self._fetch_dict()
+        # The snapshots are optional, only import the module if used
+        from custom_sensor_lib.snapshot_cache import (
+                read_snapshot, 
+                snapshot_file,
+                write_snapshot
+            )
+
+        _file = snapshot_file(self._cache_dir(), script_params['ip'], 
+                              script_params['port'], 
+                              self.required_commands())
+        _snapshot = read_snapshot(_file, script_params['cacheTtl'])
+        if _snapshot:
+            self.snapshot_age = _snapshot['age']
+            self.data_time = _snapshot['timestamp']
+            # The json file of each sensor is kept up to date
+            self.save_json(_snapshot['data'])
+            self.logger.info('Using the snapshot %s (%d s old)' 
+                             %(_file, self.snapshot_age))
+            return _snapshot['data']
+        _data = self._fetch_dict()
+        # The snapshot only spares the requests of the other sensors, the 
+        # data of the run is used even if it is not saved
+        try: write_snapshot(_file, _data)
+        except OSError as e: 
+            self.logger.warning('Snapshot not written: %s' %e)
+        self.snapshot_age = 0
+        return _data
+
+
+    def request_data(self) -> list:
+        """
+        This function requests the monitoring data of the miner commands. 
+        
+        If BATCH_SEPARATOR is set, the commands are sent in a single request 
+        and the combined response is split back into one response per 
+        command. If the miner rejects the batch, the commands are sent 
+        one at a time.
+        """
+
+        _commands = self.commands or self.COMMANDS
+        # A single command is answered in the unbatched format
+        if self.BATCH_SEPARATOR and len(_commands) > 1:
+            _data = get_data([self.BATCH_SEPARATOR.join(_commands)],
+                             self.MSG_FORMAT, self.MSG_TERMINATOR, 
+                             self.deadline)
+            # Data from the preexistent Windows executable is not batched
+            if not isinstance(_data[0], str): return _data
+            try: return self.split_batch(_data[0])
+            except (KeyError, IndexError, TypeError, ValueError): pass
+        return get_data(_commands, self.MSG_FORMAT, self.MSG_TERMINATOR, 
+                        self.deadline)
+
+
+    def split_batch(self, msg: str) -> list:
+        """
+        This function splits a batched response in the cgminer API format 
+        {"cmd1": [{...}], "cmd2": [{...}], ... } into a list of responses 
+        as if each command were sent alone.
+
+        Parameter:
+        msg (str)           : The batched response.
+        """
+
+        _terminator = self.MSG_TERMINATOR or ''
+        if _terminator and msg.endswith(_terminator): 
+            msg = msg[:-len(_terminator)]
+        _response = loads(msg)
+        return [dumps(_response[cmd][0]) + _terminator 
+                for cmd in self.commands or self.COMMANDS]
 
 
     def to_dict(self, data: list) -> dict: 
@@ -136,3 +670,13 @@ class CreateChannels():
 
         raise NotImplementedError
 
+
+    def save_json(self, data: dict):
+        """
+        This function saves the monitoring data in the json file, if set.
+        """
+
+        if self.json_file:
+            with open(self.json_file, 'w') as json_file:
+                dump(data, json_file)
+
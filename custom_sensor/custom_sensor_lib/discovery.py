@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import asyncio
+from json import dump
+from ipaddress import ip_network
+from time import monotonic
+# Local library imports
+from custom_sensor_lib.fleet_poller import send_commands
+
+
+class _RateLimiter():
+    # Space the connection attempts to a maximum rate per second
+    def __init__(self, rate: float):
+        self._interval = 1 / rate
+        self._next_time = monotonic()
+
+
+    async def wait(self):
+        _now = monotonic()
+        _time = max(self._next_time, _now)
+        self._next_time = _time + self._interval
+        if _time > _now: await asyncio.sleep(_time - _now)
+
+
+async def probe(channels_class, server_ip: str, server_port: int=None, 
+                timeout: float=1) -> dict:
+    """
+    This function sends the DISCOVERY_COMMAND of a miner type to a host 
+    and returns the model and firmware of the miner, or None if the host 
+    is not a miner of this type.
+
+    Parameters:
+    channels_class (type)   : The miner specific CreateChannels subclass.
+    server_ip (str)         : The IP address of the host.
+    server_port (int)       : The port for the miner monitoring interface. 
+    If None, the SERVER_PORT of the miner is used.
+    timeout (float)         : The waiting time in seconds for the 
+    connection and the response.
+    """
+
+    _channels = channels_class()
+    _address = (server_ip, server_port or _channels.SERVER_PORT)
+    try:
+        _data = await asyncio.wait_for(
+            send_commands(_channels, _address, 
+                          [_channels.DISCOVERY_COMMAND], timeout), 
+            timeout * 2)
+        return _channels.fingerprint(_data[0])
+    except (OSError, asyncio.TimeoutError, ValueError, 
+            KeyError, IndexError, TypeError): 
+        return None
+
+
+async def discover(network: str, probes: list, concurrency: int=256, 
+                   rate: float=1000, timeout: float=1) -> list:
+    """
+    This function sweeps the hosts of a network and returns the miners 
+    found as a list of {'ip': ..., 'port': ..., 'type': ..., 'model': ..., 
+    'firmware': ...} dictionaries, the inventory format of the collector.
+
+    Parameters:
+    network (str)           : The network in CIDR notation (10.0.0.0/22).
+    probes (list)           : A list of (type, channels_class) or 
+    (type, channels_class, port) tuples, type being the miner type name 
+    in the inventory.
+    concurrency (int)       : The maximum number of probes at the same time.
+    rate (float)            : The maximum number of connection attempts 
+    per second.
+    timeout (float)         : The waiting time in seconds for the 
+    connection and the response of a probe.
+    """
+
+    _semaphore = asyncio.Semaphore(concurrency)
+    _limiter = _RateLimiter(rate)
+
+    async def _probe(server_ip, miner_type, channels_class, server_port=None):
+        async with _semaphore:
+            await _limiter.wait()
+            _miner = await probe(channels_class, server_ip, 
+                                 server_port, timeout)
+        if _miner: 
+            return {'ip': server_ip, 
+                    'port': server_port or channels_class.SERVER_PORT,
+                    'type': miner_type, **_miner}
+
+    _network = ip_network(network, strict=False)
+    _hosts = list(_network.hosts()) or [_network.network_address]
+    _results = await asyncio.gather(*[_probe(str(host), *miner_probe) 
+                                      for host in _hosts
+                                      for miner_probe in probes])
+    return [miner for miner in _results if miner]
+
+
+def write_inventory(miners: list, inventory_file: str):
+    """This function saves the discovered miners in an inventory file."""
+
+    with open(inventory_file, 'w') as file:
+        dump(miners, file, indent=2)
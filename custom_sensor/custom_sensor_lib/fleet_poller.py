@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import asyncio
+# Local library imports
+from custom_sensor_lib.retry_policy import RetryPolicy
+
+
+_ENCODING = 'utf-8'
+# Maximum size of a miner response
+_STREAM_LIMIT = 2 ** 22
+
+
+async def _read_msg(reader: asyncio.StreamReader, 
+                    terminator: bytes, wait_time: float) -> bytes:
+    # Read a framed response, or the whole stream if the miner 
+    # does not delimit its responses
+    try:
+        if terminator:
+            return await asyncio.wait_for(reader.readuntil(terminator), 
+                                          wait_time)
+        return await asyncio.wait_for(reader.read(), wait_time)
+    except asyncio.IncompleteReadError as e:
+        # The miner closed the connection
+        return e.partial
+
+
+async def send_commands(channels, address: tuple, commands: list, 
+                        wait_time: float) -> list:
+    """
+    This function sends commands in the request format of a miner and 
+    returns the list of responses.
+
+    Parameters:
+    channels (CreateChannels)   : The miner specific channels instance, 
+    providing MSG_FORMAT and MSG_TERMINATOR.
+    address (tuple)         : The IP address and port of the miner.
+    commands (list)         : The commands to send.
+    wait_time (float)       : The waiting time in seconds for the 
+    connection and each response.
+    """
+
+    _terminator = (channels.MSG_TERMINATOR or '').encode(_ENCODING)
+    _data = []
+    reader, writer = None, None
+    try:
+        for _cmd in commands:
+            for _ in range(2):
+                _reused = writer is not None
+                if not _reused:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(*address, 
+                                                limit=_STREAM_LIMIT), 
+                        wait_time)
+                try:
+                    writer.write((channels.MSG_FORMAT 
+                                  %_cmd).encode(_ENCODING))
+                    await writer.drain()
+                    _msg = await _read_msg(reader, _terminator, wait_time)
+                except ConnectionError:
+                    if not _reused: raise
+                    _msg = b''
+                if _msg and (not _terminator or _msg.endswith(_terminator)):
+                    break
+                # The miner closed the connection, resend the command 
+                # on a new connection if the previous one was reused 
+                writer.close()
+                writer = None
+                if not _reused: 
+                    raise ConnectionError('No response for the command %s' 
+                                          %_cmd)
+            _data.append(_msg.decode(_ENCODING))
+            if reader.at_eof():
+                writer.close()
+                writer = None
+    finally:
+        if writer: writer.close()
+    return _data
+
+
+async def fetch_miner(channels, server_ip: str, server_port: int=None, 
+                      wait_time: float=100) -> list:
+    """
+    This function is the asyncio equivalent of ClientSocket.fetch_data. 
+    It sends the commands of a CreateChannels subclass to a miner and 
+    returns the list of responses.
+
+    Parameters:
+    channels (CreateChannels)   : The miner specific channels instance, 
+    providing COMMANDS, MSG_FORMAT, MSG_TERMINATOR and BATCH_SEPARATOR.
+    server_ip (str)         : The IP address of the miner.
+    server_port (int)       : The port for the miner monitoring interface. 
+    If None, the SERVER_PORT of the miner is used.
+    wait_time (float)       : The waiting time for a response 
+    in milliseconds (> 100ms).
+    """
+
+    _address = (server_ip, server_port or channels.SERVER_PORT)
+    _wait_time = (wait_time / 1000 if wait_time > 100 else 0.1) * 3
+    _commands = channels.COMMANDS
+    if channels.BATCH_SEPARATOR: 
+        _commands = [channels.BATCH_SEPARATOR.join(channels.COMMANDS)]
+    _data = await send_commands(channels, _address, _commands, _wait_time)
+    if channels.BATCH_SEPARATOR: return channels.split_batch(_data[0])
+    return _data
+
+
+def default_retry_policy(max_attempts: int=2) -> RetryPolicy:
+    """
+    This function returns a retry policy of the poller, retrying the 
+    connection errors and the timeouts.
+    """
+
+    return RetryPolicy(max_attempts, 0.5, 5, 
+                       (OSError, asyncio.TimeoutError))
+
+
+async def poll_miner(channels_class, server_ip: str, server_port: int=None, 
+                     wait_time: float=100, 
+                     retry_policy: RetryPolicy=None) -> dict:
+    """
+    This function fetches the monitoring data of a miner and returns 
+    the dictionary created by the to_dict method of its channels class.
+
+    Parameters:
+    channels_class (type)   : The miner specific CreateChannels subclass.
+    server_ip (str)         : The IP address of the miner.
+    server_port (int)       : The port for the miner monitoring interface.
+    wait_time (float)       : The waiting time for a response 
+    in milliseconds (> 100ms).
+    retry_policy (RetryPolicy)  : The policy retrying a failed poll. 
+    If None, the miner is polled once.
+    """
+
+    _channels = channels_class()
+    _attempt = 0
+    while 1:
+        try:
+            _data = await fetch_miner(_channels, server_ip, server_port, 
+                                      wait_time)
+            return _channels.to_dict(_data)
+        except Exception as e:
+            _delay = retry_policy.retry_delay(_attempt, e) \
+                if retry_policy else None
+            if _delay is None: raise
+            _attempt += 1
+            await asyncio.sleep(_delay)
+
+
+async def poll_fleet(miners: list, concurrency: int=100, 
+                     deadline: float=10, wait_time: float=100, 
+                     retry_policy: RetryPolicy=None) -> dict:
+    """
+    This function polls a fleet of miners concurrently.
+    
+    It returns a dictionary {(ip, port): data, ... } where data is the 
+    dictionary returned by to_dict, or the raised exception if the miner 
+    could not be polled.
+
+    Parameters:
+    miners (list)           : A list of (channels_class, ip) or 
+    (channels_class, ip, port) tuples.
+    concurrency (int)       : The maximum number of miners polled 
+    at the same time.
+    deadline (float)        : The time limit in seconds to poll one miner, 
+    retries included.
+    wait_time (float)       : The waiting time for a response 
+    in milliseconds (> 100ms).
+    retry_policy (RetryPolicy)  : The policy retrying a failed poll, 
+    shared by the miners. If None, each miner is polled once.
+    """
+
+    _semaphore = asyncio.Semaphore(concurrency)
+
+    async def _poll(channels_class, server_ip, server_port=None):
+        async with _semaphore:
+            return await asyncio.wait_for(
+                poll_miner(channels_class, server_ip, 
+                           server_port, wait_time, retry_policy), 
+                deadline)
+
+    _keys = [(miner[1], miner[2] if len(miner) > 2 else miner[0].SERVER_PORT) 
+             for miner in miners]
+    _results = await asyncio.gather(*[_poll(*miner) for miner in miners], 
+                                    return_exceptions=True)
+    return dict(zip(_keys, _results))
+
+
+def run_fleet(miners: list, concurrency: int=100, 
+              deadline: float=10, wait_time: float=100,
+              retry_policy: RetryPolicy=None) -> dict:
+    """
+    This function runs poll_fleet in a new event loop and returns its 
+    result. See poll_fleet for the parameters.
+    """
+
+    return asyncio.run(poll_fleet(miners, concurrency, deadline, wait_time,
+                                  retry_policy))
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from mmap import mmap
+from struct import Struct
+from os import path
+from contextlib import contextmanager
+try: 
+    from fcntl import flock, LOCK_EX, LOCK_UN
+except ImportError: 
+    # Windows systems
+    from msvcrt import locking, LK_LOCK, LK_UNLCK
+    flock = None
+
+
+# Header: magic, record size, capacity and number of appended records
+_HEADER = Struct('<4sIIQ')
+_HEADER_SIZE = 64
+_MAGIC = b'MHST'
+
+
+@contextmanager
+def _locked(file):
+    # Exclusive lock of a file shared by the sensors and the collector
+    if flock: 
+        flock(file.fileno(), LOCK_EX)
+    else: 
+        file.seek(0)
+        locking(file.fileno(), LK_LOCK, 1)
+    try: yield
+    finally:
+        if flock: 
+            flock(file.fileno(), LOCK_UN)
+        else: 
+            file.seek(0)
+            locking(file.fileno(), LK_UNLCK, 1)
+
+
+def history_file(history_dir: str, server_ip: str, 
+                 server_port: int) -> str:
+    """
+    This function returns the path of the metric history file of a miner.
+
+    Parameters:
+    history_dir (str)       : The directory of the history files.
+    server_ip (str)         : The IP address of the miner.
+    server_port (int)       : The port for the miner monitoring interface.
+    """
+
+    return path.join(history_dir, 'miner_{}_{}.history'.format(
+        server_ip.replace(':', '_'), server_port))
+
+
+class MetricHistory():
+    """
+    This class is an append-only ring of fixed-width metric records of a 
+    miner in a memory-mapped file. Once the capacity is reached, the oldest 
+    records are overwritten, so the file size is bounded. 
+
+    A record holds the timestamp, the hashrate, the highest input and 
+    output temperatures, up to 4 fan speeds and the accepted and rejected 
+    shares of the miner.
+
+    The file is locked while it is read or written, so the sensors and the 
+    collector can share the history of a miner.
+    """
+
+    RECORD = Struct('<dd2f4fqq')
+    FANS = 4
+    # Default capacity: a week of records at one record per minute
+    CAPACITY = 7 * 24 * 60
+
+    def __init__(self, file: str, capacity: int=None):
+        """
+        Constructor for the MetricHistory class.
+
+        Parameters:
+        file (str)              : The history file, created if it does 
+        not exist. A file of another format is reset.
+        capacity (int)          : The maximum number of records of a new 
+        file, CAPACITY if None. An existing file keeps its capacity.
+        """
+
+        # The file is created but not truncated before it is locked
+        self._file = open(file, 'a+b')
+        try:
+            with _locked(self._file):
+                self.capacity = self._file_capacity() or capacity or \
+                    self.CAPACITY
+                _size = _HEADER_SIZE + self.capacity * self.RECORD.size
+                if self._file.seek(0, 2) != _size: 
+                    self._file.truncate(_size)
+                self._mmap = mmap(self._file.fileno(), _size)
+                _magic, _record_size, _capacity, _ = \
+                    _HEADER.unpack_from(self._mmap)
+                if (_magic, _record_size, _capacity) != \
+                        (_MAGIC, self.RECORD.size, self.capacity):
+                    self._write_header(0)
+        except Exception: 
+            self._file.close()
+            raise
+
+
+    def __enter__(self): return self
+
+
+    def __exit__(self, *args): self.close()
+
+
+    def __len__(self) -> int:
+        return min(self._count(), self.capacity)
+
+
+    def _count(self) -> int:
+        # Number of records appended by all the processes
+        return _HEADER.unpack_from(self._mmap)[3]
+
+
+    def _file_capacity(self) -> int:
+        # Capacity of an existing history file, or None
+        self._file.seek(0)
+        _header = self._file.read(_HEADER.size)
+        if len(_header) < _HEADER.size: return None
+        _magic, _record_size, _capacity, _ = _HEADER.unpack(_header)
+        if (_magic, _record_size) == (_MAGIC, self.RECORD.size): 
+            return _capacity
+
+
+    def _write_header(self, count: int):
+        _HEADER.pack_into(self._mmap, 0, _MAGIC, self.RECORD.size, 
+                          self.capacity, count)
+
+
+    def _offset(self, index: int) -> int:
+        # Offset of the record of an index in the ring
+        return _HEADER_SIZE + (index % self.capacity) * self.RECORD.size
+
+
+    def append(self, timestamp: float, hashrate: float, temp_in: float,
+               temp_out: float, fans: list, accepted: int, 
+               rejected: int) -> bool:
+        """
+        This function appends a record, overwriting the oldest one if the 
+        history is full. Fans beyond the fourth are ignored. 
+        
+        The records are ordered by time: a record not newer than the latest 
+        one, as a sample already appended by another sensor, is skipped and 
+        False is returned.
+        """
+
+        _fans = (list(fans[:self.FANS]) + [0] * self.FANS)[:self.FANS]
+        with _locked(self._file):
+            _count = self._count()
+            if _count and timestamp <= \
+                    self.RECORD.unpack_from(self._mmap, 
+                                            self._offset(_count - 1))[0]:
+                return False
+            self.RECORD.pack_into(
+                self._mmap, self._offset(_count),
+                timestamp, hashrate, temp_in, temp_out, *_fans, 
+                accepted, rejected)
+            # The record is counted once it is written
+            self._write_header(_count + 1)
+        return True
+
+
+    def query(self, start: float=None, end: float=None):
+        """
+        This function returns the records of the time window as a NumPy 
+        structured array ordered by time, with the fields time, hashrate, 
+        temp_in, temp_out, fans, accepted and rejected.
+
+        Parameters:
+        start (float)           : The start timestamp, included. 
+        If None, from the oldest record.
+        end (float)             : The end timestamp, included.
+        If None, up to the latest record.
+        """
+
+        # NumPy is only needed to query the history
+        import numpy
+
+        _dtype = numpy.dtype([
+            ('time', '<f8'), ('hashrate', '<f8'), ('temp_in', '<f4'), 
+            ('temp_out', '<f4'), ('fans', '<f4', (self.FANS,)), 
+            ('accepted', '<i8'), ('rejected', '<i8')
+        ])
+        with _locked(self._file):
+            _count = self._count()
+            _records = numpy.frombuffer(self._mmap, _dtype, 
+                                        min(_count, self.capacity), 
+                                        _HEADER_SIZE).copy()
+        if _count > self.capacity:
+            _oldest = _count % self.capacity
+            _records = numpy.concatenate(
+                (_records[_oldest:], _records[:_oldest]))
+        _selected = numpy.ones(len(_records), bool)
+        if start is not None: _selected &= _records['time'] >= start
+        if end is not None: _selected &= _records['time'] <= end
+        return _records[_selected]
+
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import logging
+from random import randrange
+from collections import deque
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    This class is a logging handler keeping the last records of a run in 
+    memory instead of appending each of them to the log file. 
+    
+    The records are written to the log file at once when a record of the 
+    flush level (an error) is emitted, or with the summary record of a 
+    sampled run. The summary record of the other runs, a record logged 
+    with extra={'summary': True}, is written alone.
+    """
+
+    def __init__(self, file: str, capacity: int=200, sampling: int=0,
+                 flush_level: int=logging.ERROR):
+        """
+        Constructor for the RingBufferHandler class.
+
+        Parameters:
+        file (str)              : The path of the log file.
+        capacity (int)          : The number of last records kept.
+        sampling (int)          : The records of one run out of sampling 
+        are written with its summary. If 0, only on errors.
+        flush_level (int)       : The lowest level of the records writing 
+        the kept records.
+        """
+
+        super().__init__()
+        self.file = file
+        self.records = deque(maxlen=capacity)
+        self.sampling = sampling
+        self.flush_level = flush_level
+
+
+    def _sampled(self) -> bool:
+        return bool(self.sampling) and randrange(self.sampling) == 0
+
+
+    def emit(self, record: logging.LogRecord):
+        _summary = getattr(record, 'summary', False)
+        if _summary and not self._sampled(): 
+            self.write_records([record])
+            return
+        self.records.append(record)
+        if _summary or record.levelno >= self.flush_level: 
+            self.write_records(self.records)
+            self.records.clear()
+
+
+    def flush(self):
+        # The records are only written on failure, not at the exit
+        pass
+
+
+    def write_records(self, records: list):
+        """This function appends the records to the log file in one write."""
+
+        try:
+            with open(self.file, 'a', encoding='utf-8') as log_file:
+                log_file.write(''.join('%s\n' %self.format(record) 
+                                       for record in records))
+        except Exception:
+            self.handleError(records[-1])
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+from re import compile
+from datetime import date, datetime
+from os import path, scandir, remove, replace, utime
+
+
+# Daily log files sensor_id_0000_2024_01_31.log, run record files 
+# sensor_id_0000_runs_2024_01_31.jsonl and their compressed version
+_LOG_FILE = compile(r'_(\d{4})_(\d{2})_(\d{2})\.(?:log|jsonl)(\.gz)?$')
+# Marker file of the last pruning pass of a sensor directory
+_MARKER = '.log_pruned'
+
+
+def _compress(file: str):
+    # Replace the log file by its gzip version, never leaving a partial file
+    # The compression modules are only loaded once a day
+    import gzip
+    from shutil import copyfileobj
+
+    with open(file, 'rb') as log_file, \
+            gzip.open(file + '.gz.tmp', 'wb') as gz_file:
+        copyfileobj(log_file, gz_file)
+    replace(file + '.gz.tmp', file + '.gz')
+    remove(file)
+
+
+def _pruned_today(marker: str, today: date) -> bool:
+    try: return datetime.fromtimestamp(path.getmtime(marker)).date() == today
+    except OSError: return False
+
+
+def prune_logs(log_dir: str, retention_days: int=30, max_size: int=None, 
+               today: date=None) -> bool:
+    """
+    This function applies the retention of the daily log and run record 
+    files of a sensor directory, at most once per day: the log files of 
+    the past days are compressed with gzip, the files older than 
+    retention_days are deleted, then the oldest files until their total 
+    size is under max_size. The log file of the day is never changed. 
+    It returns True if the directory was pruned.
+
+    Parameters:
+    log_dir (str)           : The sensor directory of the log files.
+    retention_days (int)    : The number of days the log files are kept.
+    max_size (int)          : The largest total size in bytes of the log 
+    files. If None, only the age of the files is limited.
+    today (date)            : The current date, today if None.
+    """
+
+    today = today or date.today()
+    _marker = path.join(log_dir, _MARKER)
+    # A single stat call for the runs of the same day
+    if _pruned_today(_marker, today): return False
+    _files = []
+    # List the directory before compressing or deleting any of its files
+    with scandir(log_dir) as entries: _entries = list(entries)
+    for entry in _entries:
+        _match = _LOG_FILE.search(entry.name)
+        if not _match or not entry.is_file(): continue
+        # A file name with an impossible date is not a log file
+        try: _date = date(*map(int, _match.groups()[:3]))
+        except ValueError: continue
+        if _date >= today: continue
+        _file = entry.path
+        if (today - _date).days > retention_days: 
+            remove(_file)
+            continue
+        if not _match.group(4): 
+            _compress(_file)
+            _file += '.gz'
+        _files.append((_date, _file, path.getsize(_file)))
+    if max_size is not None:
+        # Delete the oldest files first
+        _files.sort()
+        _total = sum(size for _, _, size in _files)
+        for _, _file, _size in _files:
+            if _total <= max_size: break
+            remove(_file)
+            _total -= _size
+    # Mark the directory as pruned for the day
+    with open(_marker, 'a'): utime(_marker)
+    return True
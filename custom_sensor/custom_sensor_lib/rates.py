@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+def counters_snapshot(timestamp: float, uptime: float, counters: dict) -> dict:
+    """
+    This function returns the compact snapshot of the cumulative counters
+    saved between the sensor runs.
+
+    Parameters:
+    timestamp (float)       : The time of the snapshot in seconds.
+    uptime (float)          : The miner uptime in seconds.
+    counters (dict)         : The cumulative counters {name: value}.
+    """
+
+    return {'time': timestamp, 'uptime': uptime, 'counters': counters}
+
+
+def compute_rates(previous: dict, current: dict) -> dict:
+    """
+    This function returns the per minute rates {name: rate} of the counters 
+    between two snapshots. 
+
+    If the uptime went backwards, the miner rebooted and its counters 
+    restarted from zero during the uptime. If only a counter went 
+    backwards, it restarted from zero during the interval. Counters 
+    missing from the previous snapshot have no rate.
+
+    Parameters:
+    previous (dict)         : The snapshot of the previous run.
+    current (dict)          : The snapshot of the current run.
+    """
+
+    _interval = current['time'] - previous['time']
+    if _interval <= 0: return {}
+    _rebooted = current['uptime'] < previous['uptime']
+    if _rebooted: _interval = min(_interval, current['uptime']) or _interval
+    _rates = {}
+    for name, value in current['counters'].items():
+        if name not in previous['counters']: continue
+        _delta = value - previous['counters'][name]
+        if _rebooted or _delta < 0: _delta = value
+        _rates[name] = round(_delta * 60 / _interval, 3)
+    return _rates
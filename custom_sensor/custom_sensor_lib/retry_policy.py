@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from random import uniform
+
+
+class RetryPolicy():
+    """
+    This class decides whether a failed miner request is retried and how 
+    long to wait before: an exponential backoff with full jitter, so the 
+    sensors failing together do not retry in lockstep. It counts the 
+    retries, the time waited and the requests given up.
+    """
+
+    def __init__(self, max_attempts: int=3, base_delay: float=0.1, 
+                 max_delay: float=3, retryable: tuple=(OSError,)):
+        """
+        Constructor for the RetryPolicy class.
+
+        Parameters:
+        max_attempts (int)      : The maximum number of attempts of a 
+        request, 1 for no retry.
+        base_delay (float)      : The longest delay in seconds before the 
+        first retry, doubled at each retry.
+        max_delay (float)       : The upper bound in seconds of a delay.
+        retryable (tuple)       : The exception classes of the failures 
+        worth a retry.
+        """
+
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+        self.metrics = {}
+        self.clear_metrics()
+
+
+    def clear_metrics(self):
+        self.metrics.update({'retries': 0, 'delay': 0.0, 'given_up': 0})
+
+
+    def retry_delay(self, attempt: int, error: Exception=None) -> float:
+        """
+        This function returns the delay in seconds before retrying a 
+        failed attempt, or None if the request is given up.
+
+        Parameters:
+        attempt (int)           : The number of the failed attempt, 
+        starting from 0.
+        error (Exception)       : The failure, None for a missing response.
+        """
+
+        if attempt + 1 >= self.max_attempts or \
+                (error is not None and not isinstance(error, self.retryable)):
+            self.metrics['given_up'] += 1
+            return None
+        _delay = uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        self.metrics['retries'] += 1
+        self.metrics['delay'] += _delay
+        return _delay
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+"""
+This module writes a json line record of each run of a sensor in its 
+sensor directory, and streams over the record files to aggregate the 
+latencies of the miners without loading the records in memory.
+"""
+
+from glob import glob
+from os import path
+from datetime import date
+from json import dumps, loads
+
+
+def records_file(sensor_dir: str, day: date=None) -> str:
+    """
+    This function returns the path of the daily record file of a sensor 
+    directory, as sensor_id_0000_runs_2024_01_31.jsonl.
+
+    Parameters:
+    sensor_dir (str)        : The sensor directory.
+    day (date)              : The day of the records, today if None.
+    """
+
+    _day = str(day or date.today()).replace('-', '_')
+    return path.join(sensor_dir, '{}_runs_{}.jsonl'.format(
+        path.basename(sensor_dir), _day))
+
+
+def write_record(file: str, record: dict):
+    # A single append of a line per run
+    with open(file, 'a', encoding='utf-8') as records:
+        records.write(dumps(record, separators=(',', ':')) + '\n')
+
+
+def records_files(directory: str) -> list:
+    """
+    This function returns the record files, compressed or not, of the 
+    sensor directories of a directory.
+    """
+
+    return sorted(file for pattern in ['*.jsonl', '*.jsonl.gz'] 
+                  for file in glob(path.join(directory, 'sensor_id_*', 
+                                             '*_runs_' + pattern)))
+
+
+def read_records(files: list):
+    """This function yields the records of the files one at a time."""
+
+    import gzip
+
+    for file in files:
+        _open = gzip.open if file.endswith('.gz') else open
+        with _open(file, 'rt', encoding='utf-8') as records:
+            for line in records:
+                # Skip the line a running sensor is writing
+                try: yield loads(line)
+                except ValueError: continue
+
+
+def _percentile(values: list, percent: float) -> float:
+    # Nearest-rank percentile of sorted values
+    if not values: return None
+    _rank = int(-(-len(values) * percent // 100))
+    return values[max(0, _rank - 1)]
+
+
+def latency_percentiles(records, phase: str=None, since: float=None, 
+                        percents: tuple=(50, 95)) -> dict:
+    """
+    This function aggregates the records by miner and returns 
+    {(ip, port): {'miner': ..., 'runs': ..., 'errors': ..., 'p50': ..., 
+    'p95': ...}} where the percentiles are latencies in ms of the 
+    successful runs, None without successful run. Only the latencies 
+    are kept in memory.
+
+    Parameters:
+    records (iterable)      : The run records.
+    phase (str)             : The phase of the latencies (fetch, recv info, 
+    ...). If None, the duration of the runs.
+    since (float)           : The timestamp of the oldest records 
+    aggregated. If None, all the records.
+    percents (tuple)        : The percentiles computed.
+    """
+
+    _stats, _latencies = {}, {}
+    if since is not None: 
+        records = (record for record in records if record['time'] >= since)
+    for record in records:
+        _key = (record['ip'], record['port'])
+        _stat = _stats.setdefault(
+            _key, {'miner': record['miner'], 'runs': 0, 'errors': 0})
+        _stat['runs'] += 1
+        if record['error']: 
+            _stat['errors'] += 1
+            continue
+        _latency = record['duration_ms'] if phase is None else \
+            record['durations_ms'].get(phase)
+        if _latency is not None: 
+            _latencies.setdefault(_key, []).append(_latency)
+    for key, stat in _stats.items():
+        _values = sorted(_latencies.get(key, []))
+        for percent in percents: 
+            stat['p%s' %percent] = _percentile(_values, percent)
+    return _stats
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from json import dump, load
+from os import path, replace, remove, getpid
+# Local library imports
+from custom_sensor_lib.sensor_util import script_params
+
+
+def write_json(file: str, data: any):
+    """
+    This function saves data in a json file. The file is replaced 
+    atomically so a concurrent reader never reads a partial file.
+
+    Parameters:
+    file (str)              : The json file.
+    data (any)              : The json serializable data.
+    """
+
+    # A temporary file of the process, as the sensors of a miner write its 
+    # shared files concurrently, without loading the tempfile module
+    _temp_file = '%s.%s.tmp' %(file, getpid())
+    try:
+        with open(_temp_file, 'w') as temp_file: dump(data, temp_file)
+        replace(_temp_file, file)
+    except Exception:
+        if path.exists(_temp_file): remove(_temp_file)
+        raise
+
+
+def state_file(name: str) -> str:
+    """
+    This function returns the path of a state file in the sensor directory,
+    as sensor_id_0000_<name>.json.
+
+    Parameter:
+    name (str)              : The state name.
+    """
+
+    _sensor_dir = path.dirname(script_params['logFile'])
+    return path.join(_sensor_dir, '{}_{}.json'.format(
+        path.basename(_sensor_dir), name))
+
+
+def load_state(name: str) -> dict:
+    """
+    This function returns the state saved by a previous run of the sensor, 
+    or an empty dictionary.
+    """
+
+    try:
+        with open(state_file(name)) as file:
+            _state = load(file)
+        return _state if isinstance(_state, dict) else {}
+    except (OSError, ValueError): return {}
+
+
+def save_state(name: str, state: dict):
+    """This function saves a state for the next runs of the sensor."""
+
+    write_json(state_file(name), state)
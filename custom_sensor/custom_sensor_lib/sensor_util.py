@@ -22,15 +22,17 @@
 # SOFTWARE.
 
 import logging
-from time import sleep
-from subprocess import Popen
-from json import load, loads
+from time import sleep, monotonic
+from json import dump, load, loads
 from datetime import datetime
-from os import path, makedirs
-from re import findall, split
-from tempfile import TemporaryFile
+from hashlib import sha1
+from os import path, makedirs, stat, environ
+from re import compile, DOTALL
 # Local library imports
-from custom_sensor_lib.client_socket import ClientSocket
+from custom_sensor_lib.client_socket import ClientSocket, MinerUnreachable
+from custom_sensor_lib.log_buffer import RingBufferHandler
+from custom_sensor_lib.retry_policy import RetryPolicy
+from custom_sensor_lib.timings import LatencyStats, Timings
 
 
 script_params = {
@@ -43,17 +45,112 @@ script_params = {
     'logFile': None,
     'exeLogFile': None,
     'forceExe': False,
+    'collector': None,
+    'timings': False,
+    'logBuffer': False,
+    'logSampling': 0,
+    'logRetention': 30,
+    'logMaxSize': 10,
+    'runRecords': False,
+    'rates': False,
+    'channels': None,
+    'refreshCycles': None,
+    'history': False,
+    'historySize': 10080,
+    'timeout': 60,
+    'breakerFailures': 3,
+    'breakerInterval': 60,
+    'retryAttempts': 3,
+    'retryDelay': 0,
+    'exeTimeout': 25,
+    'cacheTtl': 0,
+    'cacheDir': None,
     'sensorid': '0000'
 }
-
-
-def _assign_script_params(params: list):
+# Type of each parameter of the PRTG sensor settings, a parameter 
+# is ignored if its value is not valid for its type. The json file also sets
+# the sensor directory
+PARAM_SCHEMA = {
+    'port': 'int',
+    'waitTime': 'int',
+    'exeFile': 'file',
+    'jsonFile': 'json',
+    'forceExe': 'bool',
+    'collector': 'str',
+    'timings': 'bool',
+    'logBuffer': 'bool',
+    'logSampling': 'int',
+    'logRetention': 'int',
+    'logMaxSize': 'int',
+    'runRecords': 'bool',
+    'rates': 'bool',
+    'channels': 'list',
+    'refreshCycles': 'positive',
+    'history': 'bool',
+    'historySize': 'positive',
+    'timeout': 'positive',
+    'breakerFailures': 'int',
+    'breakerInterval': 'int',
+    'retryAttempts': 'positive',
+    'retryDelay': 'int',
+    'exeTimeout': 'int',
+    'cacheTtl': 'int',
+    'cacheDir': 'dir'
+}
+# Log message of the parameters, with their value
+_PARAM_LOGS = {
+    'exeFile': 'Executable file set as {}',
+    'forceExe': 'Request data via executable file only',
+    'channels': 'Channel groups set as {}',
+    'collector': 'Collector socket set as {}'
+}
+# Parameters holding a Windows file path
+_PATH_PARAMS = ['exeFile', 'jsonFile', 'collector', 'cacheDir']
+# A parameter '--key value' without its '--'
+_PARAM = compile(r'(\S+)(.*)', DOTALL)
+# The \ symbol used in Windows file system is special in python, the 
+# special combinations of a file path are replaced with their string version
+_SPECIAL_CHARS = compile('[\n\t\r\b\f]')
+_ESCAPED_CHARS = {'\n': '\\n', '\t': '\\t', '\r': '\\r', '\b': '\\b', 
+                  '\f': '\\f'}
+# Environment variables of the temporary directory, in the tempfile order
+_TEMP_DIR_VARIABLES = ['TMPDIR', 'TEMP', 'TMP']
+# Durations and retries of the execution phases of the sensor
+run_timings = Timings()
+# Response latency of the miner, restored from the previous runs
+miner_latency = LatencyStats()
+# Receive buffer size of each miner model, restored from the previous runs
+buffer_sizes = {}
+# Shortest time in seconds left in the run budget to run the executable file
+_EXE_MIN_TIME = 1
+
+
+def _convert_param(key: str, value: str) -> any:
+    # Value of a parameter converted to its schema type, None if invalid
+    _type = PARAM_SCHEMA[key]
+    if _type == 'int': return int(value) if value.isdigit() else None
+    if _type == 'positive': 
+        return int(value) if value.isdigit() and int(value) else None
+    if _type == 'bool': return value.lower() == 'true'
+    if _type == 'file': 
+        return path.abspath(value) if path.exists(value) else None
+    if _type == 'dir': 
+        return path.abspath(value) if path.isdir(value) else None
+    if _type == 'list': 
+        return [item.strip().lower() for item in value.split(',') 
+                if item.strip()]
+    return value
+
+
+def _assign_script_params(params: list, cache: tuple=None):
     """
     This function assigns the parameters values to the 'script_params' 
-    dictionary.
+    dictionary, converted to their type in PARAM_SCHEMA.
 
-    Parameter:
+    Parameters:
     params (list)       : Sensor parameters as key-value pairs.
+    cache (tuple)       : The cache file and the key of the parameters. 
+    If set, the assigned parameters are saved in the cache file.
     """
 
     # The log file is not set yet, so log messages are saved
@@ -61,32 +158,22 @@ def _assign_script_params(params: list):
     _saved_log = [('Setting sensor parameters', 20)]
     try:
         for key, value in params: 
-            if key in script_params.keys():
-                if key == 'port':
-                    if value.isdigit(): script_params[key] = int(value)
-
-                elif key == 'exeFile':
-                    if path.exists(value):
-                        script_params[key] = path.abspath(value)
-                        _saved_log.append(('Executable file set as %s'
-                                           %script_params[key], 20))
-                        
-                elif key == 'forceExe':
-                    if value.lower() == 'true': 
-                        script_params[key] = True 
-                        _saved_log.append(('Request data via executable '
-                                          'file only', 20))
-                        
-                elif key == 'waitTime':
-                    if value.isdigit(): script_params[key] = int(value)
-
-                elif key == 'jsonFile':
-                    try: assign_sensor_files(value)
-                    except Exception as e: 
-                        _saved_log.append(('Error setting json file: %s' %e, 
-                                          40)) # 40 for error severity level
-                        _saved_log.append(('Using the OS temporary directory', 
-                                          30)) # 30 for warning severity level
+            if key not in PARAM_SCHEMA: continue
+            if key == 'jsonFile':
+                try: assign_sensor_files(value)
+                except Exception as e: 
+                    _saved_log.append(('Error setting json file: %s' %e, 
+                                      40)) # 40 for error severity level
+                    _saved_log.append(('Using the OS temporary directory', 
+                                      30)) # 30 for warning severity level
+                continue
+            _value = _convert_param(key, value)
+            # Invalid values keep the default value
+            if _value is None: continue
+            script_params[key] = _value
+            if key in _PARAM_LOGS and _value is not False:
+                if isinstance(_value, list): _value = ', '.join(_value)
+                _saved_log.append((_PARAM_LOGS[key].format(_value), 20))
     except:
         # If an error, do the logging of the saved log messages
         if not script_params['jsonFile']: assign_sensor_files()
@@ -108,17 +195,96 @@ def _assign_script_params(params: list):
     # Do the logging of the saved log messages
     _logger = get_logger()
     for msg, level in _saved_log: _logger.log(msg=msg, level=level)
+    if cache: _save_cached_params(*cache)
+
+
+def _params_cache_file(params: list) -> str:
+    """
+    This function returns the path of the parameters cache file in the 
+    sensor directory, without checking the directory.
+
+    Parameter:
+    params (list)       : Sensor parameters as key-value pairs.
+    """
+
+    _json_files = [value for key, value in params if key == 'jsonFile']
+    # The temporary directory of the system is read from the environment, 
+    # only tempfile checks its write permission
+    _dir = path.dirname(_json_files[-1]) if _json_files else \
+        next((path.abspath(environ[name]) for name in _TEMP_DIR_VARIABLES 
+              if environ.get(name)), None)
+    if _dir is None:
+        from tempfile import gettempdir
+        _dir = gettempdir()
+    _sensor_dir_name = 'sensor_id_' + script_params['sensorid']
+    return path.join(_dir, _sensor_dir_name, 
+                     '%s_params.json' %_sensor_dir_name)
+
+
+def _load_cached_params(cache_file: str, key: str) -> bool:
+    """
+    This function assigns the parameters saved in the cache file if they 
+    were saved with the same key. It returns True if they are assigned.
+    """
+
+    try:
+        with open(cache_file) as file: _cache = load(file)
+        if _cache['key'] != key: return False
+        script_params.update(_cache['params'])
+        return True
+    except (OSError, ValueError, KeyError, TypeError): return False
+
+
+def _save_cached_params(cache_file: str, key: str):
+    # Only the parameters of the expected sensor directory are cached, 
+    # not the ones of the fallback temporary directory
+    if path.dirname(cache_file) != path.dirname(script_params['logFile']):
+        return
+    try:
+        with open(cache_file, 'w') as file: 
+            dump({'key': key, 'params': script_params}, file)
+    except OSError: pass
+
+
+def _file_state(file: str) -> tuple:
+    # Modification time and size of a file, None if it does not exist
+    try: 
+        _stat = stat(file)
+        return (_stat.st_mtime_ns, _stat.st_size)
+    except OSError: return None
 
 
-def _run_exe_file():
+def _is_json_file(file: str) -> bool:
+    # True if the file holds a complete json document
+    try:
+        with open(file) as json_file: load(json_file)
+        return True
+    except (OSError, ValueError): return False
+
+
+def _run_exe_file(time_limit: float=None) -> bool:
     """
     This function runs a Windows executable file to fetch the data 
     saving it in json file.
+
+    It returns as soon as the program exits or the json file is freshly 
+    written with a complete json document, and kills the program after 
+    time_limit seconds. It returns True if the json file was rewritten 
+    with a complete json document, False if it still holds the data of 
+    a previous run.
+
+    Parameter:
+    time_limit (float)      : The time limit in seconds, the exeTimeout 
+    parameter if None.
     """
 
+    # The executable file is a fallback, only load subprocess if used
+    from subprocess import Popen
+
     try:
         _exe_file = script_params['exeFile']
         if path.exists(_exe_file) and _exe_file.endswith('.exe'):
+            _json_state = _file_state(script_params['jsonFile'])
             with open(script_params['exeLogFile'], 'w') as log_file:
                 # Run the executable file
                 process = Popen([
@@ -132,11 +298,25 @@ def _run_exe_file():
                                 stdout=log_file, 
                                 stderr=log_file
                     )
-                # Wait 25 seconds as the time necessary for the program
-                # logs a message in case of an error 
-                sleep(25) 
+                _end = monotonic() + (script_params['exeTimeout'] 
+                                      if time_limit is None else time_limit)
+                _written_state = _json_state
+                while process.poll() is None and monotonic() < _end:
+                    sleep(0.05)
+                    # The json file is written when its state changed, 
+                    # did not change since the previous check and it 
+                    # parses, an empty or partial file is still written
+                    _state = _file_state(script_params['jsonFile'])
+                    if _state and _state != _json_state:
+                        if _state == _written_state and _state[1] and \
+                                _is_json_file(script_params['jsonFile']): 
+                            break
+                        _written_state = _state
                 # Kill the program if it is still running
-                if not process.poll(): process.kill()
+                if process.poll() is None: process.kill()
+            _state = _file_state(script_params['jsonFile'])
+            return bool(_state) and _state != _json_state and \
+                bool(_state[1]) and _is_json_file(script_params['jsonFile'])
         else: raise Exception('Invalid Windows executable file.')
     except Exception as e:
         raise Exception(e)
@@ -156,6 +336,9 @@ def assign_sensor_files(json_file: str=None):
     write permissions. If None, system’s temporary directory is used.
     """
 
+    # Only the write permission check loads tempfile
+    from tempfile import NamedTemporaryFile
+
     # Formating the name of the sensor directory
     _sensor_dir_name = 'sensor_id_' + script_params['sensorid']
     # Formating the name of the files
@@ -167,8 +350,8 @@ def assign_sensor_files(json_file: str=None):
     if json_file: dir = path.dirname(json_file)
     # Create a temporary file to verify the write permission in the directory
     # If json_file is unset, using the temporary directory of the system as
-    # parent directory 
-    with TemporaryFile(dir=dir) as file:
+    # parent directory, a named file as TemporaryFile has no name on Unix
+    with NamedTemporaryFile(dir=dir) as file:
         _new_dir = path.join(path.dirname(file.name), _sensor_dir_name)
         makedirs(_new_dir, exist_ok=True)
 
@@ -184,19 +367,38 @@ def get_logger() -> logging:
     """
     This function does the logging system configuration and 
     return its instance.
+
+    If the logBuffer parameter is set, the records are kept in memory and 
+    only written to the log file on errors or for one successful run out 
+    of logSampling, the other runs only write their summary.
     """
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(message)s",
-        handlers=[
-        logging.FileHandler(script_params['logFile'])
-        ]
-    )
+    # The logging system is configured once per run
+    if not logging.root.handlers:
+        if script_params['logBuffer']:
+            _handler = RingBufferHandler(script_params['logFile'], 
+                                         sampling=script_params['logSampling'])
+        else: _handler = logging.FileHandler(script_params['logFile'])
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s [%(levelname)s] %(message)s",
+            handlers=[_handler]
+        )
     return logging.getLogger(__name__)
 
 
-def get_data(miner_cmds: list=None, miner_msg_format: str=None) -> list:
+def run_deadline(start: float) -> float:
+    """
+    This function returns the deadline (monotonic clock) of the budget of 
+    a run started at start: 80% of the PRTG sensor timeout, keeping a 
+    margin to answer before PRTG kills the script.
+    """
+
+    return start + script_params['timeout'] * 0.8
+
+
+def get_data(miner_cmds: list=None, miner_msg_format: str=None, 
+             miner_msg_terminator: str=None, deadline: float=None) -> list:
     """
     This function is used to fetch the monitoring data from a client socket 
     or a Windows executable file.
@@ -204,31 +406,62 @@ def get_data(miner_cmds: list=None, miner_msg_format: str=None) -> list:
     Parameters:
     miner_cmds (list)       : Miner specific commands.
     miner_msg_format (str)  : Miner specific request message format. 
+    miner_msg_terminator (str)  : Miner specific end of response delimiter.
+    deadline (float)        : The deadline (monotonic clock) of the run 
+    budget. If None, the budget starts now.
     """
 
     _logger = get_logger()
     _logger.info('Starting data request')
+    # The socket and the executable file share the run budget
+    _deadline = run_deadline(monotonic()) if deadline is None else deadline
+    _error = None
     if not script_params['forceExe']:
         _logger.info('Starting client socket')
+        # The first backoff delay is the waiting time if not set
+        _delay = (script_params['retryDelay'] or 
+                  max(script_params['waitTime'], 100)) / 1000
+        _retry_policy = RetryPolicy(script_params['retryAttempts'], 
+                                    _delay, _delay * 10)
         try:
             # Fetch the data
             client_sock = ClientSocket(script_params['ip'], 
                                        script_params['port'],
                                        miner_cmds,
                                        miner_msg_format,
-                                       script_params['waitTime'])
+                                       script_params['waitTime'],
+                                       miner_msg_terminator,
+                                       _deadline - monotonic(),
+                                       timings=run_timings,
+                                       latency=miner_latency,
+                                       retry_policy=_retry_policy,
+                                       buffer_sizes=buffer_sizes)
             data = client_sock.fetch_data()
             _logger.info('Successful reception of the data \n')
             return data 
         except Exception as e: 
-            _logger.error('An error has occurred:' + str(e))
+            _error = e
+            # A failure is logged as an error by the sensor if the 
+            # executable file does not recover it
+            _logger.warning('An error has occurred:' + str(e))
             if script_params['exeFile']:
                 _logger.info('Trying executable file execution instead')
-            else: raise Exception()
+            else: raise
+        finally: run_timings.add_retry_metrics(_retry_policy.metrics)
 
     if script_params['exeFile']:
+        _time_left = _deadline - monotonic()
+        if _time_left < _EXE_MIN_TIME:
+            raise _error or Exception('No time left to run the executable '
+                                      'file.')
         _logger.info('Executing the executable file')
-        _run_exe_file()
+        with run_timings.phase('exe'): 
+            _written = _run_exe_file(
+                min(script_params['exeTimeout'], _time_left))
+        # The json file of a previous run is not reported as current data
+        if not _written:
+            raise MinerUnreachable('The executable file did not write the '
+                                   'json file')
         _logger.info('Successful execution of the executable file')
 
         _logger.info('Reading json file \n')
@@ -241,6 +474,11 @@ def parse_sensor_params(prtg_args: list):
     This function reads the PRTG sensor parameters.
     It accepts parameters in '--key value' format.
 
+    The assigned parameters, with the files of the sensor directory, are 
+    cached in the sensor directory for the day: the next runs of the sensor 
+    with the same arguments assign them without checking the files and 
+    directories again.
+
     Parameter:
     prtg_args (list)        : PRTG sensor arguments.
     """
@@ -257,24 +495,20 @@ def parse_sensor_params(prtg_args: list):
         if _params_list[0] == '': _params_list.pop(0)
         _params_cleaned = []
         for param in _params_list:
-            _key = findall('^\S+', param)[0]
-            _value = split(r'^' + _key , param)[1].strip()
-            # The \ symbol used in Windows file system is special in python
-            # Its string version is \\  
-            symbol = [  
-                        '\n', '\\n',
-                        '\t', '\\t', 
-                        '\r', '\\r', 
-                        '\b', '\\b', 
-                        '\f', '\\f'
-            ]
+            _key, _value = _PARAM.match(param).groups()
+            _value = _value.strip()
             # For each special combination in the Windows file path  
             # replace it with its string version
-            if _key in ['exeFile', 'jsonFile']:
-                for i in range(0, len(symbol), 2):
-                    if symbol[i] in _value and symbol[i+1] not in _value:
-                        _value = _value.replace(symbol[i], symbol[i+1])
+            if _key in _PATH_PARAMS and _SPECIAL_CHARS.search(_value):
+                for char, escaped in _ESCAPED_CHARS.items():
+                    if char in _value and escaped not in _value:
+                        _value = _value.replace(char, escaped)
             _params_cleaned.append((_key, _value))
-        _assign_script_params(_params_cleaned)
+        # The cached parameters of the same arguments and day
+        _cache_file = _params_cache_file(_params_cleaned)
+        _key = sha1(('%s %s' %(datetime.now().date(), prtg_args[1]))
+                    .encode()).hexdigest()
+        if _load_cached_params(_cache_file, _key): return
+        _assign_script_params(_params_cleaned, (_cache_file, _key))
     except: raise Exception()
 
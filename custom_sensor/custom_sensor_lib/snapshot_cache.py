@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from os import path
+from time import time
+from hashlib import sha1
+from json import load, dumps
+# Local library imports
+from custom_sensor_lib.sensor_state import write_json
+
+
+def snapshot_file(cache_dir: str, server_ip: str, server_port: int, 
+                  miner_cmds: list) -> str:
+    """
+    This function returns the path of the snapshot file of a miner, 
+    shared by the sensors requesting the same commands.
+
+    Parameters:
+    cache_dir (str)         : The directory of the snapshot files.
+    server_ip (str)         : The IP address of the miner.
+    server_port (int)       : The port for the miner monitoring interface.
+    miner_cmds (list)       : Miner specific commands.
+    """
+
+    _key = sha1(dumps([server_ip, server_port, miner_cmds]).encode())
+    return path.join(cache_dir, 'miner_{}_{}_{}.json'.format(
+        server_ip.replace(':', '_'), server_port, _key.hexdigest()[:12]))
+
+
+def read_snapshot(file: str, ttl: float) -> dict:
+    """
+    This function returns the snapshot saved in the file if it is 
+    younger than ttl seconds, else None. The snapshot is a dictionary 
+    {'timestamp': ..., 'age': ..., 'data': ...} where data is the 
+    dictionary returned by to_dict.
+
+    Parameters:
+    file (str)              : The snapshot file.
+    ttl (float)             : The time to live of the snapshot in seconds.
+    """
+
+    try:
+        with open(file) as snapshot_file:
+            _snapshot = load(snapshot_file)
+        _snapshot['age'] = time() - _snapshot['timestamp']
+    except (OSError, ValueError, KeyError, TypeError): return None
+    if 0 <= _snapshot['age'] <= ttl: return _snapshot
+
+
+def write_snapshot(file: str, data: dict):
+    """
+    This function saves the data in the snapshot file. The file is 
+    replaced atomically so the sensors never read a partial snapshot.
+
+    Parameters:
+    file (str)              : The snapshot file.
+    data (dict)             : The dictionary returned by to_dict.
+    """
+
+    write_json(file, {'timestamp': time(), 'data': data})
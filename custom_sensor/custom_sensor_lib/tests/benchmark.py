@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+End-to-end benchmark of the sensor against local fake miners. 
+
+It measures the wall time, the socket calls and the memory allocations of 
+ClientSocket.fetch_data, to_dict and the channels creation for each 
+scenario. Run it from the sensor directory:
+
+    python -m custom_sensor_lib.tests.benchmark [--repeat 20] [--json]
+"""
+
+import sys
+import socket
+import tracemalloc
+from os import path
+from json import dumps
+from collections import Counter
+from statistics import median
+from time import perf_counter
+from argparse import ArgumentParser
+from unittest.mock import patch
+# Local library imports
+# Add the sensor root directory to the system path
+sys.path.append(
+    path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
+from antminer import AntminerChannels
+from iceriver import IceriverChannels
+from custom_sensor_lib.client_socket import ClientSocket
+from custom_sensor_lib.tests.fake_miner import FakeMiner
+
+
+# Name, channels class and fake miner options of each scenario
+SCENARIOS = [
+    ('antminer', AntminerChannels, {}),
+    ('iceriver', IceriverChannels, {}),
+    ('antminer_large_partial', AntminerChannels, 
+        {'payload_size': 2 ** 18, 'chunk_size': 1460, 'chunk_delay': 0}),
+    ('iceriver_latency', IceriverChannels, 
+        {'latency': 0.005, 'jitter': 0.005})
+]
+
+
+class _CountingSocket(socket.socket):
+    # Socket counting the calls to the system
+    calls = Counter()
+
+    def connect(self, *args):
+        self.calls['connect'] += 1
+        return super().connect(*args)
+
+    def send(self, *args):
+        self.calls['send'] += 1
+        return super().send(*args)
+
+    def recv(self, *args):
+        self.calls['recv'] += 1
+        return super().recv(*args)
+
+    def recv_into(self, *args):
+        self.calls['recv_into'] += 1
+        return super().recv_into(*args)
+
+    def close(self):
+        self.calls['close'] += 1
+        return super().close()
+
+
+def _stages(channels_class, address: tuple) -> list:
+    # Functions running each measured stage, in order
+    _channels = channels_class()
+    _cmds = _channels.COMMANDS
+    if _channels.BATCH_SEPARATOR: 
+        _cmds = [_channels.BATCH_SEPARATOR.join(_cmds)]
+    _state = {}
+
+    def fetch_data():
+        _state['data'] = ClientSocket(
+            *address, _cmds, _channels.MSG_FORMAT, 
+            msg_terminator=_channels.MSG_TERMINATOR, timeout=10).fetch_data()
+        if _channels.BATCH_SEPARATOR: 
+            _state['data'] = _channels.split_batch(_state['data'][0])
+
+    def to_dict():
+        _channels.data = _channels.to_dict(_state['data'])
+
+    def channels():
+        _channels.build_result()
+
+    return [fetch_data, to_dict, channels]
+
+
+def run_scenario(channels_class, repeat: int=20, **miner_options) -> dict:
+    """
+    This function benchmarks a scenario and returns for each stage the 
+    median and minimum wall time in ms, the socket calls per run and 
+    the allocated blocks and peak memory in bytes per run.
+    """
+
+    _times = {}
+    with FakeMiner(channels_class.__name__[:-8].lower(), 
+                   **miner_options) as miner:
+        _stages_funcs = _stages(channels_class, miner.address)
+        # Wall time
+        for _ in range(repeat):
+            for stage in _stages_funcs:
+                _start = perf_counter()
+                stage()
+                _times.setdefault(stage.__name__, []).append(
+                    (perf_counter() - _start) * 1000)
+        # Socket calls 
+        _CountingSocket.calls.clear()
+        with patch('socket.socket', _CountingSocket):
+            _stages_funcs[0]()
+        # Allocations
+        _allocations = {}
+        for stage in _stages_funcs:
+            tracemalloc.start()
+            _before = tracemalloc.take_snapshot()
+            stage()
+            _stats = tracemalloc.take_snapshot().compare_to(_before, 
+                                                            'filename')
+            _peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            _allocations[stage.__name__] = {
+                'blocks': sum(max(stat.count_diff, 0) for stat in _stats),
+                'peak_bytes': _peak
+            }
+    _results = {}
+    for stage, times in _times.items():
+        _results[stage] = {
+            'median_ms': round(median(times), 3),
+            'min_ms': round(min(times), 3),
+            **_allocations[stage]
+        }
+    _results['fetch_data']['socket_calls'] = dict(_CountingSocket.calls)
+    return _results
+
+
+def run_benchmarks(repeat: int=20) -> dict:
+    return {name: run_scenario(cls, repeat, **options) 
+            for name, cls, options in SCENARIOS}
+
+
+def main():
+    _parser = ArgumentParser(description=__doc__)
+    _parser.add_argument('--repeat', type=int, default=20)
+    _parser.add_argument('--json', action='store_true', 
+                         help='Print the results as json')
+    _args = _parser.parse_args()
+    _results = run_benchmarks(_args.repeat)
+    if _args.json: 
+        print(dumps(_results, indent=2))
+        return
+    print('{:<24}{:<12}{:>12}{:>10}{:>10}{:>12}  {}'.format(
+        'scenario', 'stage', 'median ms', 'min ms', 'blocks', 'peak B', 
+        'socket calls'))
+    for name, stages in _results.items():
+        for stage, result in stages.items():
+            print('{:<24}{:<12}{:>12}{:>10}{:>10}{:>12}  {}'.format(
+                name, stage, result['median_ms'], result['min_ms'], 
+                result['blocks'], result['peak_bytes'], 
+                result.get('socket_calls', '')))
+
+
+if __name__ == '__main__':
+    main()
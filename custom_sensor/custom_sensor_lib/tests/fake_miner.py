@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Local stand-in server speaking the Antminer (cgminer API, port 4028) and 
+Iceriver (port 4111) protocols, for end-to-end tests and benchmarks.
+"""
+
+import socket
+import threading
+from time import sleep
+from random import Random
+from json import loads, dumps, JSONDecodeError
+from socketserver import BaseRequestHandler, ThreadingTCPServer
+
+
+# Sample of the data returned by an Antminer miner for each command
+ANTMINER_DATA = {
+    'summary': {"STATUS": [{"STATUS": "S", "Msg": "Summary"}], 
+        "SUMMARY": [{"Elapsed": 366810, "RT HASHRATE": "21632.89GH/s", 
+        "AV HASHRATE": "20442GH/s", "THEORY HASHRATE": "20517GH/s", 
+        "Rejected": 0, "Accepted": 1000, "Hardware Errors": 5}], "id": 1},
+    'pools': {"STATUS": [{"STATUS": "S", "Msg": "3Pool(s)"}], 
+        "POOLS": [{"POOL": 0, "URL": "test.com", "Status": "Alive", 
+        "User": "user", "Accepted": 150, "Getworks": 500, "Diff": 10000, 
+        "Rejected": 0}], "id": 1},
+    'stats': {"STATUS": [{"STATUS": "S", "Msg": "CGMinerstats"}], 
+        "STATS": [{"Type": "Antminer KS5", "CompileTime": "2024"}, 
+        {"STATS": 3, "fan_num": 2, "fan1": 4430, "fan2": 4440, 
+        "Elapsed": 366810, "temp_in_chip_1": "69", "temp_in_chip_2": "70",
+        "temp_in_chip_3": "67", "temp_out_chip_1": "64", 
+        "temp_out_chip_2": "64", "temp_out_chip_3": "64",
+        "CHAIN AVG HASHRATE1": "6809.27GH/s", 
+        "CHAIN AVG HASHRATE2": "100GH/s", 
+        "CHAIN AVG HASHRATE3": "50GH/s"}], "id": 1}
+}
+# Sample of the data returned by an Iceriver miner for each command
+ICERIVER_DATA = {
+    'info': {"code": 0, "model": "KS0", "softver1": "v1.0", 
+        "softver2": "v1.0"},
+    'fan': {"code": 0, "fans": [300, 100]},
+    'board': {"code": 0, "boards": [{"no": 1, "chipnum": 18, 
+        "rtpow": "36.71G", "intmp": 34, "outtmp": 52, "state": True}]},
+    'boardpow': {"code": 0, "reject": 0, "rtpow": "155G", "avgpow": "152G",
+        "runtime": "00:09:21:23", "unit": "G"},
+    'getnet': {"code": 0, "nic": "eth0", "host": "KS0-2"},
+    'getpool': {"code": 0, "pools": [{"no": 1, "connect": True, 
+        "diff": "2199.02 G", "priority": 1, "accepted": 2418, "rejected": 0,
+        "addr": "test.com", "user": "testUser", "pass": "x", "state": 1}]}
+}
+
+
+class _MinerServer(ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _MinerHandler(BaseRequestHandler):
+    # Answer the requests of a client connection
+    def handle(self):
+        _miner = self.server.miner
+        _buffer = b''
+        while True:
+            try: _msg = self.request.recv(4096)
+            except OSError: return
+            if not _msg: return
+            _buffer += _msg
+            _request, _buffer = _miner.parse_request(_buffer)
+            if _request is None: continue
+            if not _miner.answer(self.request, _request): return
+            # The cgminer API closes the connection after each response
+            if _miner.protocol == 'antminer': return
+
+
+class FakeMiner():
+    """
+    This class is a fake miner server listening on a local address.
+
+    Parameters:
+    protocol (str)          : 'antminer' or 'iceriver'.
+    address (tuple)         : The listening address, a free port is used 
+    by default.
+    latency (float)         : The delay in seconds before each response.
+    jitter (float)          : The maximum random delay in seconds added 
+    to the latency.
+    payload_size (int)      : The number of padding bytes added to the 
+    stats (Antminer) and board (Iceriver) responses.
+    chunk_size (int)        : If set, the responses are written in chunks 
+    of this size, with chunk_delay seconds between them.
+    drop_rate (float)       : The probability to close the connection 
+    instead of answering a request.
+    seed (int)              : The seed of the random generator for 
+    repeatable jitter and dropped connections.
+    """
+
+    def __init__(self, protocol: str, address: tuple=('127.0.0.1', 0), 
+                 latency: float=0, jitter: float=0, payload_size: int=0, 
+                 chunk_size: int=None, chunk_delay: float=0.001, 
+                 drop_rate: float=0, seed: int=0):
+        self.protocol = protocol
+        self.latency = latency
+        self.jitter = jitter
+        self.payload_size = payload_size
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.drop_rate = drop_rate
+        self.requests = []
+        self._random = Random(seed)
+        self._lock = threading.Lock()
+        self._server = _MinerServer(address, _MinerHandler)
+        self._server.miner = self
+        self.address = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, 
+                                        daemon=True)
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+    def start(self):
+        self._thread.start()
+
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+    def parse_request(self, buffer: bytes) -> tuple:
+        """
+        This function returns the first complete request of the buffer 
+        and the remaining bytes, or None if it is incomplete.
+        """
+
+        if self.protocol == 'iceriver':
+            if b'\n' not in buffer: return None, buffer
+            _request, buffer = buffer.split(b'\n', 1)
+            return loads(_request)['id'], buffer
+        # The cgminer API requests are not delimited
+        try: return loads(buffer)['command'], b''
+        except (JSONDecodeError, UnicodeDecodeError): return None, buffer
+
+
+    def response(self, cmd: str) -> bytes:
+        """This function returns the miner response to a command."""
+
+        _padding = 'x' * self.payload_size
+        if self.protocol == 'iceriver':
+            _ret = dict(ICERIVER_DATA.get(cmd, {'code': 1}))
+            if cmd == 'board' and _padding: _ret['padding'] = _padding
+            return dumps({'id': cmd, 'ret': _ret}).encode() + b'\n'
+        _responses = {}
+        for _cmd in cmd.split('+'):
+            _responses[_cmd] = dict(ANTMINER_DATA.get(_cmd, 
+                {"STATUS": [{"STATUS": "E", "Msg": "Invalid command"}], 
+                 "id": 1}))
+            if _cmd == 'stats' and _padding: 
+                _stats = _responses[_cmd]['STATS']
+                _responses[_cmd]['STATS'] = [_stats[0], 
+                                             {**_stats[1], 
+                                              'padding': _padding}]
+        if len(_responses) == 1: _response = _responses[cmd]
+        else: 
+            _response = {_cmd: [_value] for _cmd, _value in _responses.items()}
+            _response['id'] = 1
+        return dumps(_response).encode() + b'\x00'
+
+
+    def answer(self, client: socket.socket, cmd: str) -> bool:
+        # Send the response to a command, False if the connection is dropped
+        with self._lock:
+            self.requests.append(cmd)
+            _drop = self._random.random() < self.drop_rate
+            _delay = self.latency + self._random.uniform(0, self.jitter)
+        if _drop: return False
+        sleep(_delay)
+        _response = self.response(cmd)
+        if not self.chunk_size: 
+            client.sendall(_response)
+            return True
+        # Partial writes
+        for index in range(0, len(_response), self.chunk_size):
+            client.sendall(_response[index:index + self.chunk_size])
+            sleep(self.chunk_delay)
+        return True
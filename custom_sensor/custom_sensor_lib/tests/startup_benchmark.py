@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+"""
+Startup benchmark of the sensor scripts, each run in a new process as PRTG 
+does. It reports the slowest imports of a script (python -X importtime, 
+cumulative time in us) and the wall time of full runs of the script 
+against a local fake miner. Run it from the sensor directory:
+
+    python -m custom_sensor_lib.tests.startup_benchmark [--repeat 10] [--json]
+"""
+
+import sys
+from os import path
+from re import compile
+from json import dumps
+from subprocess import run
+from statistics import median
+from time import perf_counter
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+# Local library imports
+# Add the sensor root directory to the system path
+SENSOR_DIR = path.dirname(path.dirname(path.dirname(path.abspath(__file__))))
+sys.path.append(SENSOR_DIR)
+from custom_sensor_lib.tests.fake_miner import FakeMiner
+
+
+# Sensor script and fake miner protocol of each scenario
+SCRIPTS = [('antminer.py', 'antminer'), ('iceriver.py', 'iceriver')]
+_IMPORT_TIME = compile(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def import_times(module: str) -> dict:
+    """
+    This function imports a module in a new process and returns the 
+    cumulative import time in us of each imported module.
+    """
+
+    _process = run([sys.executable, '-X', 'importtime', '-c', 
+                    'import %s' %module], cwd=SENSOR_DIR, 
+                   capture_output=True, text=True, check=True)
+    _times = {}
+    for line in _process.stderr.splitlines():
+        _match = _IMPORT_TIME.match(line)
+        if _match: _times[_match.group(4)] = int(_match.group(2))
+    return _times
+
+
+def run_sensor(script: str, address: tuple, json_dir: str) -> tuple:
+    """
+    This function runs a sensor script once in a new process with the 
+    PRTG arguments and returns its wall time in seconds and its output.
+    """
+
+    _args = dumps({'sensorid': '0000', 'host': address[0], 
+                   'params': '--port %s --jsonFile %s' 
+                   %(address[1], path.join(json_dir, 'file.json'))})
+    _start = perf_counter()
+    _process = run([sys.executable, script, _args], cwd=SENSOR_DIR, 
+                   capture_output=True, text=True)
+    return perf_counter() - _start, _process.stdout
+
+
+def run_scenario(script: str, protocol: str, repeat: int=10, 
+                 top: int=10) -> dict:
+    """
+    This function benchmarks the startup of a sensor script and returns 
+    the median and minimum wall time in ms of its runs and its top 
+    slowest imports.
+    """
+
+    _module = script[:-len('.py')]
+    _imports = import_times(_module)
+    _times = []
+    with FakeMiner(protocol) as miner, TemporaryDirectory() as json_dir:
+        for _ in range(repeat):
+            _times.append(run_sensor(script, miner.address, json_dir)[0])
+    return {
+        'median_ms': round(median(_times) * 1000, 3),
+        'min_ms': round(min(_times) * 1000, 3),
+        'import_ms': round(_imports.get(_module, 0) / 1000, 3),
+        'slowest_imports': sorted(
+            ((name, time) for name, time in _imports.items() 
+             if name != _module), 
+            key=lambda item: item[1], reverse=True)[:top]
+    }
+
+
+def main():
+    _parser = ArgumentParser(description=__doc__)
+    _parser.add_argument('--repeat', type=int, default=10)
+    _parser.add_argument('--top', type=int, default=10,
+                         help='Number of the slowest imports reported')
+    _parser.add_argument('--json', action='store_true', 
+                         help='Print the results as json')
+    _args = _parser.parse_args()
+    _results = {script: run_scenario(script, protocol, _args.repeat, 
+                                     _args.top) 
+                for script, protocol in SCRIPTS}
+    if _args.json: 
+        print(dumps(_results, indent=2))
+        return
+    for script, result in _results.items():
+        print('{}: run median {} ms, min {} ms, import {} ms'.format(
+            script, result['median_ms'], result['min_ms'], 
+            result['import_ms']))
+        for name, time in result['slowest_imports']:
+            print('    {:<44}{:>10} us'.format(name, time))
+
+
+if __name__ == '__main__':
+    main()
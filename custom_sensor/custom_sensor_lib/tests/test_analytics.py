@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import sys
+import unittest
+from os import path
+from json import loads
+from tempfile import TemporaryDirectory
+# Local library imports
+# Add the sensor directory of 'custom_sensor_lib' to the system path
+dir = path.dirname(path.dirname(path.dirname(__file__)))
+sys.path.append(dir) 
+from custom_sensor_lib.history import MetricHistory, history_file
+try: 
+    import numpy
+    from custom_sensor_lib import analytics
+except ImportError: analytics = None
+
+
+@unittest.skipIf(analytics is None, 'NumPy required')
+class TestAnalytics(unittest.TestCase):
+    # This function is executed before each test function
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.miners = {}
+        # 6 miners of a model reporting every minute for an hour
+        for num in range(6):
+            address = ('10.0.0.%s' %num, 4028)
+            self.miners[address] = {'model': 'KS5', 'fan_limit': 2000}
+            with MetricHistory(history_file(self.temp_dir.name, *address), 
+                               100) as history:
+                for minute in range(60):
+                    # The fan of the miner 1 slows down, the miner 5 
+                    # stopped reporting after 30 minutes
+                    fan = 4000 - 30 * minute if num == 1 else 4000
+                    if num == 5 and minute >= 30: break
+                    history.append(
+                        minute * 60, 
+                        20000 + 100 * num, 
+                        # The miner 2 is hotter than its peers
+                        90 if num == 2 else 65 + num % 2, 
+                        60, [fan, 4100, 0, 0], 
+                        100 * minute, 0)
+        self.fleet = analytics.load_fleet(self.temp_dir.name, 0, 3540)
+
+
+    def test_load_fleet(self):
+        self.assertEqual(len(self.fleet['addresses']), 6)
+        self.assertEqual(self.fleet['hashrate'].shape, (6, 60))
+        row = self.fleet['addresses'].index(('10.0.0.1', 4028))
+        # Testing the expected result, the stopped fans are ignored
+        self.assertEqual(self.fleet['fan_min'][row, -1], 4000 - 30 * 59)
+        row = self.fleet['addresses'].index(('10.0.0.5', 4028))
+        self.assertTrue(numpy.isnan(self.fleet['hashrate'][row, 30:]).all())
+
+
+    def test_rolling_mean_trend(self):
+        values = numpy.array([[1, 2, numpy.nan, 4], 
+                              [numpy.nan] * 4])
+        means = analytics.rolling_mean(values, 2)
+        self.assertListEqual(means[0].tolist(), [1, 1.5, 2, 4])
+        self.assertTrue(numpy.isnan(means[1]).all())
+        self.assertListEqual(analytics.latest(values)[:1].tolist(), [4])
+        slopes = analytics.trend(numpy.arange(4) * 60., values)
+        self.assertAlmostEqual(slopes[0], 1 / 60)
+        self.assertTrue(numpy.isnan(slopes[1]))
+
+
+    def test_fleet_summary(self):
+        summary = analytics.fleet_summary(self.fleet, self.miners)
+        # Testing the expected result
+        self.assertEqual(summary['miners'], 6)
+        self.assertEqual(summary['reporting'], 5)
+        self.assertDictEqual(summary['models']['KS5'], {
+            'miners': 6, 'hashrate_p10': 20050, 'hashrate_p50': 20250, 
+            'hashrate_p90': 20450})
+        self.assertListEqual([miner['ip'] for miner in summary['hot']], 
+                             ['10.0.0.2'])
+        self.assertListEqual(summary['low_hashrate'], [])
+        # The fan of the miner 1 reaches 2000 trs/m in about 8 minutes
+        self.assertEqual(len(summary['fans_near_limit']), 1)
+        self.assertEqual(summary['fans_near_limit'][0]['ip'], '10.0.0.1')
+        self.assertAlmostEqual(
+            summary['fans_near_limit'][0]['hours_to_limit'], 0.1)
+        result = loads(analytics.summary_result(summary))
+        self.assertIn('Hot miners', str(result))
+
+
+    # This function is executed after each test function
+    def tearDown(self): 
+        self.temp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -26,6 +26,7 @@ import unittest
 from os import path
 import unittest.mock
 from json import loads
+from time import monotonic
 from unittest.mock import patch
 from tempfile import TemporaryDirectory
 from paesslerag_prtg_sensor_api.sensor.result import CustomSensorResult
@@ -34,6 +35,10 @@ from paesslerag_prtg_sensor_api.sensor.result import CustomSensorResult
 sys.path.append(
     path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
 from antminer import AntminerChannels
+from custom_sensor_lib.client_socket import MinerUnreachable
+from custom_sensor_lib.history import MetricHistory, history_file
+from custom_sensor_lib.run_records import records_file
+from custom_sensor_lib.sensor_state import load_state
 
 
 class TestAntminer(unittest.TestCase):
@@ -65,6 +70,12 @@ class TestAntminer(unittest.TestCase):
                 '"CHAIN AVG HASHRATE3":"50GH/s"}],'
             '"id":1}\x00'
         ] 
+        # Sample of the native Antminer miner data for batched commands
+        self.batched_data = [
+            '{%s, "id":1}\x00' %', '.join(
+                '"%s":[%s]' %(cmd, msg[:-1]) for cmd, msg 
+                in zip(['summary', 'pools', 'stats'], self.fetched_data))
+        ]
         # Antminer miner data for channel creation 
         self.antminer_data = {
             "summary":[{
@@ -97,11 +108,107 @@ class TestAntminer(unittest.TestCase):
             # Testing the expected result
             data = self.antminer.to_dict(self.fetched_data)
             self.assertDictEqual(data, self.antminer_data)
+            self.antminer.save_json(data)
             with open(json) as json:
                 self.assertIn('"temp_in_chip_1": "69", "temp_in_chip_2": "70"', 
                               json.read())
 
 
+    # Tests the function that splits a batched response by command.
+    def test_split_batch(self): 
+        data = self.antminer.split_batch(self.batched_data[0])
+        # Testing the expected result
+        self.assertEqual(len(data), 3)
+        for msg, fetched_msg in zip(data, self.fetched_data):
+            self.assertTrue(msg.endswith('\x00'))
+            self.assertDictEqual(loads(msg[:-1]), loads(fetched_msg[:-1]))
+
+
+    # Tests that the commands are sent one at a time if the miner 
+    # rejects the batched request.
+    @patch('custom_sensor_lib.create_channel.get_data')
+    def test_request_data_unbatched(self, mock_get_data): 
+        mock_get_data.side_effect = [
+            ['{"STATUS":[{"STATUS":"E","Msg":"Invalid command"}]}\x00'],
+            self.fetched_data
+        ]
+        # Testing the expected result
+        self.assertListEqual(self.antminer.request_data(), self.fetched_data)
+        self.assertEqual(mock_get_data.call_args_list[0][0][0], 
+                         ['summary+pools+stats'])
+        self.assertEqual(mock_get_data.call_args_list[1][0][0], 
+                         self.antminer.COMMANDS)
+
+
+    # Tests that only the commands of the selected channels are requested.
+    @patch('custom_sensor_lib.create_channel.get_data')
+    def test_channel_groups(self, mock_get_data): 
+        mock_get_data.return_value = self.fetched_data[2:]
+        with TemporaryDirectory() as dir, \
+            patch.dict('custom_sensor_lib.create_channel.script_params', 
+                       channels=['fans', 'temps'], refreshCycles=None), \
+            patch.dict('custom_sensor_lib.sensor_state.script_params', 
+                       logFile=path.join(dir, 'file.log')):
+            self.antminer.data = self.antminer._fetch_dict()
+            self.antminer.channels()
+        # Testing the expected result, a single command is not batched
+        mock_get_data.assert_called_once_with(
+            ['stats'], self.antminer.MSG_FORMAT, self.antminer.MSG_TERMINATOR,
+            self.antminer.deadline)
+        result = str(self.antminer.result)
+        for channel in ['Fan 1', 'Temperature_In Chip 1']:
+            self.assertIn(channel, result)
+        for channel in ['Uptime', 'Real-time hashrate', 'Pool 0', 'Chain 1']:
+            self.assertNotIn(channel, result)
+        with patch.dict('custom_sensor_lib.create_channel.script_params', 
+                        channels=['fans', 'hashboards']):
+            self.assertRaises(Exception, self.antminer.required_commands)
+
+
+    # Tests that a failing miner is not requested until it is probed again.
+    @patch('custom_sensor_lib.create_channel.can_connect')
+    @patch('custom_sensor_lib.create_channel.time')
+    @patch('custom_sensor_lib.create_channel.get_data')
+    def test_circuit_breaker(self, mock_get_data, mock_time, 
+                             mock_can_connect): 
+        mock_get_data.side_effect = MinerUnreachable('No response')
+        mock_time.return_value = 1000
+        mock_can_connect.return_value = False
+        with TemporaryDirectory() as dir, \
+            patch.dict('custom_sensor_lib.create_channel.script_params', 
+                       breakerFailures=3, breakerInterval=60), \
+            patch.dict('custom_sensor_lib.sensor_state.script_params', 
+                       logFile=path.join(dir, 'file.log')):
+            for _ in range(4):
+                with self.assertRaises(MinerUnreachable): 
+                    self.antminer._fetch_dict()
+            # Testing the expected result, the open circuit is not requested
+            self.assertEqual(mock_get_data.call_count, 3)
+            mock_can_connect.assert_not_called()
+            # The miner is probed once the interval elapsed
+            mock_time.return_value = 1060
+            with self.assertRaisesRegex(MinerUnreachable, 'Connection'): 
+                self.antminer._fetch_dict()
+            self.assertEqual(mock_get_data.call_count, 3)
+            self.assertEqual(load_state('breaker')['next_probe'], 1180)
+            # The probe only uses the time left in the run budget
+            mock_time.return_value = 1180
+            self.antminer.deadline = monotonic()
+            with self.assertRaisesRegex(MinerUnreachable, 'No time left'): 
+                self.antminer._fetch_dict()
+            self.antminer.deadline = monotonic() + 1
+            # The miner is back
+            mock_can_connect.return_value = True
+            mock_get_data.side_effect = None
+            mock_get_data.return_value = self.batched_data
+            self.assertDictEqual(self.antminer._fetch_dict(), 
+                                 self.antminer_data)
+            self.assertEqual(load_state('breaker')['failures'], 0)
+            self.assertLessEqual(mock_can_connect.call_args[0][2], 1)
+            self.assertEqual(mock_get_data.call_args[0][3], 
+                             self.antminer.deadline)
+
+
     # Tests the function that creates channels related to summary
     def test_summary_channels(self):
         rt_channel = {
@@ -142,6 +249,72 @@ class TestAntminer(unittest.TestCase):
                           str(self.antminer.result))
     
 
+    # Tests the per minute rates of the counters between two runs.
+    @patch('custom_sensor_lib.create_channel.time')
+    @patch('custom_sensor_lib.create_channel.CustomSensorResult')
+    def test_rate_channels(self, mock_result, mock_time): 
+        self.antminer.data = self.antminer_data
+        rates = lambda: {
+            call.kwargs['name']: call.kwargs['value'] for call 
+            in mock_result().add_channel.call_args_list 
+            if call.kwargs['name'].endswith('per minute')}
+        with TemporaryDirectory() as dir, \
+            patch.dict('custom_sensor_lib.create_channel.script_params', 
+                       rates=True), \
+            patch.dict('custom_sensor_lib.sensor_state.script_params', 
+                       logFile=path.join(dir, 'file.log')):
+            # No rate without a previous run
+            mock_time.return_value = 1000
+            self.antminer.build_result()
+            self.assertDictEqual(rates(), {})
+            self.antminer_data['summary'][0]['Accepted'] += 60
+            self.antminer_data['stats'][1]['Elapsed'] += 120
+            mock_time.return_value = 1120
+            self.antminer.build_result()
+        # Testing the expected result
+        self.assertDictEqual(rates(), {'Accepted per minute': 30, 
+                                       'Rejected per minute': 0,
+                                       'Hardware Errors per minute': 0})
+
+
+    # Tests that the rates of a snapshot use the time of the snapshot.
+    @patch('custom_sensor_lib.create_channel.time')
+    @patch('custom_sensor_lib.create_channel.CustomSensorResult')
+    def test_rate_channels_snapshot(self, mock_result, mock_time): 
+        self.antminer.data = self.antminer_data
+        with TemporaryDirectory() as dir, \
+            patch.dict('custom_sensor_lib.create_channel.script_params', 
+                       rates=True), \
+            patch.dict('custom_sensor_lib.sensor_state.script_params', 
+                       logFile=path.join(dir, 'file.log')):
+            mock_time.return_value = 1000
+            self.antminer.build_result()
+            self.antminer_data['summary'][0]['Accepted'] += 60
+            # The snapshot was taken 30 s before the run
+            self.antminer.data_time = 1060
+            mock_time.return_value = 1090
+            self.antminer.build_result()
+        # Testing the expected result
+        self.assertIn(unittest.mock.call(name='Accepted per minute', 
+                                         value=60, unit='/min', 
+                                         is_float=True),
+                      mock_result().add_channel.call_args_list)
+
+
+    # Tests the metrics appended to the history of the miner.
+    def test_append_history(self): 
+        self.antminer.data = self.antminer_data
+        with TemporaryDirectory() as dir:
+            self.antminer.append_history(dir, '127.0.0.1', 4028, 10)
+            with MetricHistory(history_file(dir, '127.0.0.1', 4028), 
+                               10) as history:
+                self.assertEqual(len(history), 1)
+        # Testing the expected result
+        self.assertDictEqual(self.antminer.history_record(), {
+            'hashrate': 21632.8, 'temp_in': 70, 'temp_out': 64, 
+            'fans': [4430, 4440], 'accepted': 1000, 'rejected': 0})
+
+
     # Tests the main execution of the Antminer script, 
     # mocking functions to ensure the module isolation.
     @patch('custom_sensor_lib.create_channel.get_data')
@@ -150,11 +323,13 @@ class TestAntminer(unittest.TestCase):
     @patch('custom_sensor_lib.create_channel.print')
     def test_z_main(self, mock_print, mock_load_args,
                     mock_get_logger, mock_get_data): 
-        with TemporaryDirectory() as dir:
+        with TemporaryDirectory() as dir, \
+            patch.dict('custom_sensor_lib.sensor_state.script_params', 
+                       logFile=path.join(dir, 'file.log')):
             self.antminer.json_file = path.join(dir, 
                                                               'file.json')
             self.antminer.log_file = 'file.log'
-            mock_get_data.return_value = self.fetched_data
+            mock_get_data.return_value = self.batched_data
             # Testing the expected result
             self.antminer.main()
             self.assertIn('"result"', mock_print.call_args[0][0])
@@ -163,6 +338,66 @@ class TestAntminer(unittest.TestCase):
             mock_load_args.assert_called_once()
 
 
+    # Starts the mocks of the main execution in a temporary sensor 
+    # directory, all stopped at the end of the test.
+    def _patch_main(self): 
+        mocks = {}
+        for name in ['get_data', 'get_logger', 'CreateChannels.load_args', 
+                     'print']:
+            patcher = patch('custom_sensor_lib.create_channel.' + name)
+            mocks[name] = patcher.start()
+            self.addCleanup(patcher.stop)
+        mocks['get_data'].return_value = self.batched_data
+        temp_dir = TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        patcher = patch.dict('custom_sensor_lib.sensor_state.script_params', 
+                             logFile=path.join(temp_dir.name, 'file.log'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return mocks, temp_dir.name
+
+
+    # Tests the run record written by the main execution.
+    def test_z_main_run_record(self): 
+        _, dir = self._patch_main()
+        with patch.dict('custom_sensor_lib.create_channel.script_params', 
+                        runRecords=True):
+            self.antminer.main()
+        # Write a run record in the sensor directory
+        with open(records_file(dir)) as records:
+            record = loads(records.read())
+        # Testing the expected result
+        self.assertEqual(record['miner'], 'AntminerChannels')
+        self.assertIsNone(record['error'])
+        self.assertIn('fetch', record['durations_ms'])
+        self.assertEqual(record['given_up'], 0)
+
+
+    # Tests the one-line summary logged by the main execution.
+    def test_z_main_summary(self): 
+        mocks, _ = self._patch_main()
+        self.antminer.main()
+        # Testing the expected result
+        self.assertIn("'summary': True", 
+                      str(mocks['get_logger']().info.call_args))
+
+
+    # Tests the timings channels and log of the main execution.
+    def test_z_main_timings(self): 
+        mocks, _ = self._patch_main()
+        mock_print = mocks['print']
+        self.antminer.main()
+        self.assertNotIn('Fetch latency ms', mock_print.call_args[0][0])
+        # Add the timings channels
+        with patch.dict('custom_sensor_lib.create_channel.script_params', 
+                        timings=True):
+            self.antminer.main()
+        # Testing the expected result
+        for channel in ['Fetch latency ms', 'Retries']:
+            self.assertIn(channel, mock_print.call_args[0][0])
+        self.assertIn('Timings', 
+                      str(mocks['get_logger']().info.call_args_list))
+
 if __name__ == '__main__':
     unittest.main()
  
\ No newline at end of file
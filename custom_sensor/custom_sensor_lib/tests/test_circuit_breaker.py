@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import sys
+import unittest
+from os import path
+# Local library imports
+# Add the sensor directory of 'custom_sensor_lib' to the system path
+dir = path.dirname(path.dirname(path.dirname(__file__)))
+sys.path.append(dir) 
+from custom_sensor_lib.circuit_breaker import CircuitBreaker
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_open_close(self):
+        breaker = CircuitBreaker({}, 3, 60)
+        for _ in range(2): breaker.record_failure(1000)
+        self.assertFalse(breaker.is_open)
+        self.assertTrue(breaker.allow(1000))
+        breaker.record_failure(1000)
+        # Testing the expected result
+        self.assertTrue(breaker.is_open)
+        self.assertFalse(breaker.allow(1059))
+        self.assertTrue(breaker.allow(1060))
+        # A failed probe doubles the interval
+        breaker = CircuitBreaker(breaker.to_dict(), 3, 60)
+        breaker.record_failure(1060)
+        self.assertEqual(breaker.interval, 120)
+        self.assertFalse(breaker.allow(1179))
+        self.assertTrue(breaker.allow(1180))
+        breaker.record_success()
+        self.assertFalse(breaker.is_open)
+        self.assertDictEqual(breaker.to_dict(), 
+                             {'failures': 0, 'interval': 60, 'next_probe': 0})
+
+
+    def test_max_interval_disabled(self):
+        breaker = CircuitBreaker({'failures': 10, 'interval': 3000}, 3, 60)
+        breaker.record_failure(0)
+        self.assertEqual(breaker.interval, CircuitBreaker.MAX_INTERVAL)
+        # The circuit is never opened without a failures limit
+        breaker = CircuitBreaker({'failures': 10}, 0, 60)
+        self.assertFalse(breaker.is_open)
+        self.assertTrue(breaker.allow(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -26,13 +26,15 @@ import socket
 import unittest
 import threading
 from os import path
-from time import sleep
+from time import sleep, monotonic
 from json import loads
+from unittest.mock import patch
 # Local library imports
 # Add the sensor directory of 'custom_sensor_lib' to the system path
 dir = path.dirname(path.dirname(path.dirname(__file__)))
 sys.path.append(dir) 
 from custom_sensor_lib import client_socket
+from custom_sensor_lib.timings import LatencyStats
 
 
 # This class act as the iceriver miner server
@@ -68,6 +70,7 @@ class ServerSocket():
 class TestClientSocket(unittest.TestCase):
     # This function is executed before each test function
     def setUp(self):
+        client_socket.ClientSocket._buffer_sizes.clear()
         # Sample of the data returned by an iceriver miner 
         self.iceriver_miner_data = [
                 '{"id": "fan", "ret": {"code": 0, "fans": [300, 100]}}', 
@@ -85,8 +88,8 @@ class TestClientSocket(unittest.TestCase):
                     '"state": 1}]}}'
         ]
         # Server side
-        self.address = ('127.0.0.1', 41111)
-        self.server = ServerSocket(self.address)
+        self.server = ServerSocket(('127.0.0.1', 0))
+        self.address = self.server._socket.getsockname()
         self.server.commands = ['fan', 'board', 
                                 'boardpow', 'getnet','getpool']
         self.server.returned_data = self.iceriver_miner_data
@@ -107,6 +110,128 @@ class TestClientSocket(unittest.TestCase):
                           self.iceriver_miner_data)
 
 
+    # Test that framed responses are returned without waiting 
+    # for the socket timeout
+    def test_client_socket_terminator(self): 
+        client_sock = client_socket.ClientSocket(*self.address, 
+                                                 self.server.commands,
+                                                 '{"id": "%s"}\n', 
+                                                 msg_terminator='\n')
+        start = monotonic()
+        returned_data = client_sock.fetch_data()
+        # Testing the expected result
+        self.assertLess(monotonic() - start, 
+                        len(self.server.commands) * 0.3)
+        self.assertEqual(len(returned_data), 5)
+        for element in returned_data:
+            self.assertTrue(element.endswith('\n'))
+            self.assertIn(element[:-1], self.iceriver_miner_data)
+        # Durations of each phase are recorded
+        for phase in ['connect', 'send fan', 'recv fan', 'recv getpool']:
+            self.assertIn(phase, client_sock.timings.durations)
+        self.assertEqual(client_sock.timings.total_retries(), 0)
+
+
+    # Test that a multi-byte character split between two chunks is decoded
+    # and that the receive buffer grows to fit the responses
+    def test_client_socket_chunks(self): 
+        response = '{"id": "info", "ret": {"host": "Mineração %s"}}\n' \
+            %('x' * 10000)
+        self.server.commands = ['info']
+        self.server.returned_data = [response[:-1]]
+        client_sock = client_socket.ClientSocket(*self.address, ['info'],
+                                                 '{"id": "%s"}\n', 
+                                                 msg_terminator='\n',
+                                                 buffer_size=13, 
+                                                 buffer_sizes={})
+        # The server sends the response as utf-8 instead of ascii
+        with patch(__name__ + '.bytes', 
+                   lambda string, _: string.encode('utf-8')):
+            returned_data = client_sock.fetch_data()
+        # Testing the expected result
+        self.assertListEqual(returned_data, [response])
+        self.assertEqual(len(client_sock._buffer), 13 * 2 ** 10)
+        # The size is kept for the next sockets
+        self.assertDictEqual(client_sock._buffer_sizes, 
+                             {'{"id": "%s"}\n': 13 * 2 ** 10})
+        self.assertDictEqual(client_socket.ClientSocket._buffer_sizes, {})
+
+
+    # Test that the waiting time adapts to the measured latency
+    def test_client_socket_latency(self): 
+        latency = LatencyStats()
+        client_sock = client_socket.ClientSocket(*self.address, 
+                                                 self.server.commands,
+                                                 '{"id": "%s"}\n', 
+                                                 msg_terminator='\n',
+                                                 latency=latency)
+        # Without samples, the longest waiting time
+        self.assertEqual(client_sock._response_timeout(), 1)
+        client_sock.fetch_data()
+        # Testing the expected result, a local miner answers quickly
+        self.assertEqual(latency.samples, len(self.server.commands))
+        timeout = client_sock._response_timeout()
+        self.assertLess(timeout, 0.5)
+        # A late response makes the next waits longer
+        latency.add(2)
+        self.assertGreater(client_sock._response_timeout(), timeout)
+
+
+    # Test that a silent miner is given up within the time budget
+    def test_client_socket_timeout(self): 
+        silent_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        silent_server.bind(('127.0.0.1', 0))
+        silent_server.listen(1)
+        client_sock = client_socket.ClientSocket(
+            *silent_server.getsockname(), self.server.commands,
+            '{"id": "%s"}\n', msg_terminator='\n', timeout=0.5)
+        start = monotonic()
+        # Testing the expected result
+        with self.assertRaises(client_socket.MinerUnreachable):
+            client_sock.fetch_data()
+        self.assertLess(monotonic() - start, 1)
+        silent_server.close()
+
+
+    # Test that a response cut off by the miner is retried
+    def test_client_socket_partial(self): 
+        partial_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        partial_server.bind(('127.0.0.1', 0))
+        partial_server.listen(2)
+        response = self.iceriver_miner_data[0] + '\n'
+
+        def serve():
+            # Half a response on the first connection, then the response
+            for msg in [response[:25], response]:
+                client, _ = partial_server.accept()
+                client.recv(1024)
+                client.sendall(msg.encode('ascii'))
+                client.close()
+
+        threading.Thread(target=serve, daemon=True).start()
+        client_sock = client_socket.ClientSocket(
+            *partial_server.getsockname(), ['fan'], '{"id": "%s"}\n', 
+            msg_terminator='\n', timeout=2)
+        # Testing the expected result
+        self.assertListEqual(client_sock.fetch_data(), [response])
+        self.assertEqual(client_sock.timings.total_retries(), 1)
+        partial_server.close()
+
+
+    # Test that an unreachable miner raises a MinerUnreachable exception
+    def test_client_socket_unreachable(self): 
+        closed_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed_server.bind(('127.0.0.1', 0))
+        address = closed_server.getsockname()
+        closed_server.close()
+        client_sock = client_socket.ClientSocket(
+            *address, self.server.commands, '{"id": "%s"}\n', timeout=1)
+        # Testing the expected result
+        with self.assertRaisesRegex(client_socket.MinerUnreachable, 
+                                    'Connection to'):
+            client_sock.fetch_data()
+
+
     # This function is executed after each test function
     def tearDown(self): 
         self.server.stop_server = True
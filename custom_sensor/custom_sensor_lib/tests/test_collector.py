@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import sys
+import socket
+import asyncio
+import unittest
+from os import path
+from json import loads
+from tempfile import TemporaryDirectory
+# Local library imports
+# Add the sensor root directory to the system path
+sys.path.append(
+    path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
+from iceriver import IceriverChannels
+from custom_sensor_lib import collector, collector_client
+from custom_sensor_lib.tests.test_fleet_poller import (
+        iceriver_server, 
+        silent_server
+    )
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets required')
+class TestCollector(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.socket_path = path.join(self.temp_dir.name, 'collector.sock')
+        # Fake miners
+        self.servers = []
+        for handler in [iceriver_server, silent_server]:
+            server = await asyncio.start_server(handler, '127.0.0.1', 0)
+            self.servers.append(server)
+        self.ports = [server.sockets[0].getsockname()[1] 
+                      for server in self.servers]
+        self.collector = collector.Collector(
+            [(IceriverChannels, '127.0.0.1', port) for port in self.ports],
+            self.socket_path, interval=1, deadline=1)
+        self.unix_server = await asyncio.start_unix_server(
+            self.collector.handle_client, self.socket_path)
+
+
+    async def query(self, port: int, miner_type: str='IceriverChannels', 
+                    channels: list=None):
+        # Run the blocking sensor side request
+        return await asyncio.get_running_loop().run_in_executor(
+            None, collector_client.query_collector, self.socket_path, 
+            '127.0.0.1', port, miner_type, channels)
+    
+
+    async def test_query_collector(self):
+        # No snapshot before the first poll
+        self.assertIsNone(await self.query(self.ports[0]))
+        await self.collector.poll()
+        # Testing the expected result
+        result = loads(await self.query(self.ports[0]))
+        self.assertIn('Fan 1', str(result['prtg']['result']))
+        result = loads(await self.query(self.ports[1]))
+        self.assertIn('Miner unreachable', result['prtg']['text'])
+
+
+    async def test_query_channels(self):
+        await self.collector.poll()
+        # Only the channel groups of the sensor are returned
+        result = loads(await self.query(self.ports[0], channels=['fans']))
+        self.assertIn('Fan 1', str(result['prtg']['result']))
+        result = loads(await self.query(self.ports[0], channels=['pools']))
+        self.assertNotIn('Fan 1', str(result['prtg']['result']))
+        # The sensor reports the unknown groups itself
+        self.assertIsNone(await self.query(self.ports[0], channels=['gpu']))
+        # The full result is unchanged
+        result = loads(await self.query(self.ports[0]))
+        self.assertIn('Fan 1', str(result['prtg']['result']))
+
+
+    async def test_add_miner(self):
+        # An unknown miner requested by a sensor is added to the fleet 
+        self.assertIsNone(await self.query(1111))
+        self.assertIn(('127.0.0.1', 1111), self.collector.miners)
+        self.assertIsNone(await self.query(2222, 'UnknownChannels'))
+        self.assertNotIn(('127.0.0.1', 2222), self.collector.miners)
+
+
+    async def asyncTearDown(self):
+        self.unix_server.close()
+        await self.unix_server.wait_closed()
+        for server in self.servers: 
+            server.close()
+            await server.wait_closed()
+        self.temp_dir.cleanup()
+
+
+class TestQueryCollector(unittest.TestCase):
+    # The sensor falls back to polling the miner if no daemon is running
+    def test_query_collector_absent(self):
+        with TemporaryDirectory() as dir:
+            self.assertIsNone(collector_client.query_collector(
+                path.join(dir, 'collector.sock'), '127.0.0.1', 4111, 
+                'IceriverChannels'))
+
+    # The sensor reads the collector request from the raw PRTG arguments
+    def test_collector_request(self):
+        request = collector_client.collector_request
+        _args = ['iceriver.py', '{"host": "10.0.0.2", "params": '
+                 '"--collector /tmp/fleet.sock --port 4112"}']
+        self.assertEqual(request(_args, 4111),
+                         ('/tmp/fleet.sock', '10.0.0.2', 4112, None))
+        _args[1] = '{"host": "10.0.0.2", "params": "--collector /tmp/f.sock"}'
+        self.assertEqual(request(_args, 4111),
+                         ('/tmp/f.sock', '10.0.0.2', 4111, None))
+        _args[1] = ('{"host": "10.0.0.2", "params": '
+                    '"--collector /tmp/f.sock --channels Fans, temps"}')
+        self.assertEqual(request(_args, 4111),
+                         ('/tmp/f.sock', '10.0.0.2', 4111, ['fans', 'temps']))
+        # The rates and timings are computed by the sensor run
+        _args[1] = ('{"host": "10.0.0.2", "params": '
+                    '"--collector /tmp/f.sock --rates True"}')
+        self.assertIsNone(request(_args, 4111))
+        _args[1] = '{"host": "10.0.0.2", "params": "--port 4112"}'
+        self.assertIsNone(request(_args, 4111))
+        self.assertIsNone(request(['iceriver.py'], 4111))
+        self.assertIsNone(request(['-k', 'x'], 4111))
+
+
+if __name__ == '__main__':
+    unittest.main()
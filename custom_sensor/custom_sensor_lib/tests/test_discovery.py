@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import sys
+import asyncio
+import unittest
+from os import path
+from time import monotonic
+from tempfile import TemporaryDirectory
+# Local library imports
+# Add the sensor root directory to the system path
+sys.path.append(
+    path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
+from fleet import load_inventory
+from antminer import AntminerChannels
+from iceriver import IceriverChannels
+from custom_sensor_lib import discovery
+from custom_sensor_lib.tests.fake_miner import FakeMiner
+
+
+class TestDiscovery(unittest.TestCase):
+    # This function is executed before each test function
+    def setUp(self):
+        # Fake miners on loopback addresses
+        try:
+            self.miners = [FakeMiner('antminer', ('127.0.0.2', 0)),
+                           FakeMiner('iceriver', ('127.0.0.3', 0))]
+        except OSError: 
+            self.skipTest('The 127.0.0.0/8 loopback addresses are required')
+        for miner in self.miners: miner.start()
+        self.probes = [
+            ('antminer', AntminerChannels, self.miners[0].address[1]),
+            ('iceriver', IceriverChannels, self.miners[1].address[1])
+        ]
+
+
+    def test_probe(self):
+        probe = lambda *args: asyncio.run(discovery.probe(*args))
+        # Testing the expected result
+        self.assertDictEqual(probe(AntminerChannels, *self.miners[0].address), 
+                             {'model': 'Antminer KS5', 'firmware': '2024'})
+        self.assertDictEqual(probe(IceriverChannels, *self.miners[1].address), 
+                             {'model': 'KS0', 'firmware': 'v1.0'})
+        # Not a miner of this type
+        self.assertIsNone(probe(IceriverChannels, *self.miners[0].address))
+
+
+    def test_discover(self):
+        start = monotonic()
+        miners = asyncio.run(discovery.discover('127.0.0.0/29', self.probes, 
+                                                rate=20, timeout=0.5))
+        # Testing the expected result
+        # 12 connection attempts at 20 per second
+        self.assertGreaterEqual(monotonic() - start, 0.5)
+        self.assertListEqual(miners, [
+            {'ip': '127.0.0.2', 'port': self.miners[0].address[1], 
+             'type': 'antminer', 'model': 'Antminer KS5', 'firmware': '2024'},
+            {'ip': '127.0.0.3', 'port': self.miners[1].address[1], 
+             'type': 'iceriver', 'model': 'KS0', 'firmware': 'v1.0'}
+        ])
+        # The inventory is read by the collector
+        with TemporaryDirectory() as dir:
+            inventory = path.join(dir, 'inventory.json')
+            discovery.write_inventory(miners, inventory)
+            self.assertListEqual(load_inventory(inventory), [
+                (AntminerChannels, '127.0.0.2', self.miners[0].address[1]),
+                (IceriverChannels, '127.0.0.3', self.miners[1].address[1])
+            ])
+
+
+    # This function is executed after each test function
+    def tearDown(self): 
+        for miner in self.miners: miner.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import sys
+import unittest
+from os import path
+from json import loads
+from time import monotonic
+from tempfile import TemporaryDirectory
+# Local library imports
+# Add the sensor root directory to the system path
+sys.path.append(
+    path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
+from antminer import AntminerChannels
+from iceriver import IceriverChannels
+from custom_sensor_lib.client_socket import ClientSocket
+from custom_sensor_lib.tests import benchmark, startup_benchmark
+from custom_sensor_lib.tests.fake_miner import FakeMiner, ICERIVER_DATA
+
+
+# End-to-end tests of the client socket with real I/O timing
+class TestFakeMiner(unittest.TestCase):
+    def fetch(self, channels: object, miner: FakeMiner, cmds: list=None):
+        return ClientSocket(*miner.address, cmds or channels.COMMANDS, 
+                            channels.MSG_FORMAT, 
+                            msg_terminator=channels.MSG_TERMINATOR, 
+                            timeout=5).fetch_data()
+
+
+    # The responses must not wait for the socket timeout (3 * 100 ms)
+    def test_iceriver_latency(self):
+        iceriver = IceriverChannels()
+        with FakeMiner('iceriver', latency=0.01, jitter=0.01) as miner:
+            start = monotonic()
+            data = self.fetch(iceriver, miner)
+            # Testing the expected result
+            self.assertLess(monotonic() - start, 0.3)
+        self.assertListEqual(miner.requests, iceriver.COMMANDS)
+        self.assertDictEqual(iceriver.to_dict(data)['fans'], 
+                             {'id': 'fan', **ICERIVER_DATA['fan']})
+
+
+    # A large response written in many chunks is received entirely
+    def test_antminer_partial_writes(self):
+        antminer = AntminerChannels()
+        with FakeMiner('antminer', payload_size=2 ** 17, chunk_size=1000, 
+                       chunk_delay=0) as miner:
+            data = self.fetch(antminer, miner, ['summary+pools+stats'])
+        # Testing the expected result
+        data = antminer.to_dict(antminer.split_batch(data[0]))
+        self.assertEqual(len(data['stats'][1]['padding']), 2 ** 17)
+        self.assertEqual(data['pools'][0]['URL'], '---')
+
+
+    # The commands are resent when the miner drops the connection
+    def test_dropped_connections(self):
+        iceriver = IceriverChannels()
+        with FakeMiner('iceriver', drop_rate=0.3, seed=1) as miner:
+            client_sock = ClientSocket(*miner.address, iceriver.COMMANDS, 
+                                       iceriver.MSG_FORMAT, 
+                                       msg_terminator='\n', timeout=5)
+            data = client_sock.fetch_data()
+        # Testing the expected result
+        self.assertEqual([loads(msg)['id'] for msg in data], 
+                         iceriver.COMMANDS)
+        self.assertGreater(len(miner.requests), len(iceriver.COMMANDS))
+
+
+    def test_benchmark(self):
+        results = benchmark.run_scenario(IceriverChannels, repeat=2)
+        # Testing the expected result
+        for stage in ['fetch_data', 'to_dict', 'channels']:
+            for key in ['median_ms', 'min_ms', 'blocks', 'peak_bytes']:
+                self.assertIn(key, results[stage])
+        self.assertEqual(results['fetch_data']['socket_calls']['send'], 6)
+
+
+    # The modules of the rarely used paths are imported lazily
+    def test_lazy_imports(self):
+        for module in ['antminer', 'iceriver']:
+            imports = startup_benchmark.import_times(module)
+            # Testing the expected result
+            self.assertIn('custom_sensor_lib.create_channel', imports)
+            for lazy_module in ['asyncio', 'subprocess', 'tempfile', 'gzip']:
+                self.assertNotIn(lazy_module, imports)
+
+
+    def test_startup_benchmark(self):
+        results = startup_benchmark.run_scenario('antminer.py', 'antminer', 
+                                                 repeat=1, top=5)
+        # Testing the expected result
+        for key in ['median_ms', 'min_ms', 'import_ms']:
+            self.assertGreater(results[key], 0)
+        self.assertEqual(len(results['slowest_imports']), 5)
+        with FakeMiner('iceriver') as miner, TemporaryDirectory() as dir:
+            _, output = startup_benchmark.run_sensor('iceriver.py', 
+                                                     miner.address, dir)
+        self.assertIn('Real-Time hashrate', 
+                      str(loads(output)['prtg']['result']))
+
+
+if __name__ == '__main__':
+    unittest.main()
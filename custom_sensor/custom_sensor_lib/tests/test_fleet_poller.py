@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import sys
+import asyncio
+import unittest
+from os import path
+from json import loads, dumps
+# Local library imports
+# Add the sensor root directory to the system path
+sys.path.append(
+    path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
+from antminer import AntminerChannels
+from iceriver import IceriverChannels
+from custom_sensor_lib import fleet_poller
+from custom_sensor_lib.retry_policy import RetryPolicy
+
+
+# Sample of the data returned by an Antminer miner for each command
+ANTMINER_DATA = {
+    'summary': {"STATUS": [{"Msg": "Summary"}], "SUMMARY": [{
+        "RT HASHRATE": "21632.89GH/s", "AV HASHRATE": "20442GH/s",
+        "THEORY HASHRATE": "20517GH/s", "Rejected": 0,
+        "Accepted": 1000, "Hardware Errors": 5}], "id": 1},
+    'pools': {"STATUS": [{"Msg": "3Pool(s)"}], "POOLS": [{
+        "POOL": 0, "URL": "test.com", "Status": "Alive", "User": "user", 
+        "Accepted": 150, "Getworks": 500, "Diff": 10000, "Rejected": 0}], 
+        "id": 1},
+    'stats': {"STATUS": [{"Msg": "CGMinerstats"}], "STATS": [
+        {"Type": "AntminerKS5"}, {"STATS": 3, "fan_num": 1, "fan1": 4430, 
+        "Elapsed": 366810}], "id": 1}
+}
+# Sample of the data returned by an Iceriver miner for each command
+ICERIVER_DATA = {
+    'info': {"softver1": "v1.0", "softver2": "v1.0"},
+    'fan': {"code": 0, "fans": [300, 100]},
+    'board': {"code": 0, "boards": [{"no": 1, "chipnum": 18, 
+        "rtpow": "36.71G", "intmp": 34, "outtmp": 52, "state": True}]},
+    'boardpow': {"code": 0, "reject": 0, "rtpow": "155G", "avgpow": "152G",
+        "runtime": "00:09:21:23", "unit": "G"},
+    'getnet': {"code": 0, "nic": "eth0"},
+    'getpool': {"code": 0, "pools": [{"no": 1, "connect": True, 
+        "diff": "2199.02 G", "priority": 1, "accepted": 2418, "rejected": 0,
+        "addr": "test.com", "user": "testUser", "pass": "x", "state": 1}]}
+}
+
+
+# Act as an Antminer miner, closing the connection after each response
+async def antminer_server(reader, writer):
+    request = loads(await reader.read(1024))
+    cmds = request['command'].split('+')
+    if len(cmds) == 1: response = ANTMINER_DATA[cmds[0]]
+    else: response = {cmd: [ANTMINER_DATA[cmd]] for cmd in cmds}
+    writer.write(dumps(response).encode() + b'\x00')
+    await writer.drain()
+    writer.close()
+
+
+# Act as an Iceriver miner, keeping the connection open
+async def iceriver_server(reader, writer):
+    while True:
+        request = await reader.readline()
+        if not request: break
+        cmd = loads(request)['id']
+        writer.write(dumps({'id': cmd, 'ret': ICERIVER_DATA[cmd]}).encode() 
+                     + b'\n')
+        await writer.drain()
+    writer.close()
+
+
+# Act as an unresponsive miner
+async def silent_server(reader, writer):
+    await reader.read()
+
+
+class TestFleetPoller(unittest.IsolatedAsyncioTestCase):
+    async def start_server(self, handler) -> int:
+        server = await asyncio.start_server(handler, '127.0.0.1', 0)
+        self.addAsyncCleanup(self.stop_server, server)
+        return server.sockets[0].getsockname()[1]
+
+
+    async def stop_server(self, server):
+        server.close()
+        await server.wait_closed()
+
+
+    async def test_fetch_miner_antminer(self):
+        port = await self.start_server(antminer_server)
+        data = await fleet_poller.fetch_miner(AntminerChannels(), 
+                                              '127.0.0.1', port)
+        # Testing the expected result
+        self.assertEqual(len(data), 3)
+        for msg, cmd in zip(data, AntminerChannels.COMMANDS):
+            self.assertDictEqual(loads(msg[:-1]), ANTMINER_DATA[cmd])
+
+    
+    async def test_fetch_miner_unbatched(self):
+        # Antminer commands sent one at a time on closed connections
+        port = await self.start_server(antminer_server)
+        channels = AntminerChannels()
+        channels.BATCH_SEPARATOR = None
+        data = await fleet_poller.fetch_miner(channels, '127.0.0.1', port)
+        # Testing the expected result
+        for msg, cmd in zip(data, AntminerChannels.COMMANDS):
+            self.assertDictEqual(loads(msg[:-1]), ANTMINER_DATA[cmd])
+
+
+    async def test_poll_fleet(self):
+        antminer_port = await self.start_server(antminer_server)
+        iceriver_port = await self.start_server(iceriver_server)
+        silent_port = await self.start_server(silent_server)
+        miners = [
+            (AntminerChannels, '127.0.0.1', antminer_port),
+            (IceriverChannels, '127.0.0.1', iceriver_port),
+            (IceriverChannels, '127.0.0.1', silent_port)
+        ]
+        results = await fleet_poller.poll_fleet(miners, concurrency=2, 
+                                                deadline=1)
+        # Testing the expected result
+        antminer = results[('127.0.0.1', antminer_port)]
+        self.assertEqual(antminer['pools'][0]['URL'], '---')
+        self.assertEqual(antminer['stats'][1]['fan1'], 4430)
+        iceriver = results[('127.0.0.1', iceriver_port)]
+        self.assertEqual(iceriver['pool']['pools'][0]['user'], '---')
+        self.assertDictEqual(iceriver['fans'], 
+                             {'id': 'fan', **ICERIVER_DATA['fan']})
+        self.assertIsInstance(results[('127.0.0.1', silent_port)], 
+                              asyncio.TimeoutError)
+
+
+    async def test_poll_miner_retry(self):
+        silent_port = await self.start_server(silent_server)
+        policy = RetryPolicy(3, 0.01, 0.02, (OSError, asyncio.TimeoutError))
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(fleet_poller.poll_miner(
+                IceriverChannels, '127.0.0.1', silent_port, 100, policy), 10)
+        # Testing the expected result
+        self.assertEqual(policy.metrics['retries'], 2)
+        self.assertEqual(policy.metrics['given_up'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import sys
+import unittest
+from os import path
+from importlib.util import find_spec
+from tempfile import TemporaryDirectory
+# Local library imports
+# Add the sensor directory of 'custom_sensor_lib' to the system path
+dir = path.dirname(path.dirname(path.dirname(__file__)))
+sys.path.append(dir) 
+from custom_sensor_lib.history import MetricHistory, history_file
+
+
+class TestMetricHistory(unittest.TestCase):
+    # This function is executed before each test function
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.file = history_file(self.temp_dir.name, '127.0.0.1', 4028)
+        self.append = lambda history, num: history.append(
+            num, 100.5 + num, 60, 70, [4000, 4100], 1000 + num, num % 2)
+
+
+    def test_append(self):
+        with MetricHistory(self.file, 5) as history:
+            self.assertEqual(len(history), 0)
+            for num in range(3): self.append(history, num)
+            self.assertEqual(len(history), 3)
+        # The records are kept in the file
+        with MetricHistory(self.file, 5) as history:
+            self.assertEqual(len(history), 3)
+            for num in range(3, 10): self.append(history, num)
+            # The oldest records are overwritten
+            self.assertEqual(len(history), 5)
+        self.assertEqual(path.getsize(self.file), 
+                         64 + 5 * MetricHistory.RECORD.size)
+        # An existing history keeps its capacity and records
+        with MetricHistory(self.file, 8) as history:
+            self.assertEqual(history.capacity, 5)
+            self.assertEqual(len(history), 5)
+
+
+    # Tests that the sensors sharing a history append each sample once.
+    def test_append_shared(self):
+        with MetricHistory(self.file, 5) as history, \
+            MetricHistory(self.file) as other_history:
+            self.append(history, 1)
+            self.append(other_history, 2)
+            self.assertEqual(len(history), 2)
+            # The samples already in the history are skipped
+            self.assertFalse(other_history.append(
+                2, 102.5, 60, 70, [4000], 1002, 0))
+            self.assertFalse(history.append(1, 101.5, 60, 70, [4000], 1001, 1))
+            self.assertTrue(history.append(3, 103.5, 60, 70, [4000], 1003, 1))
+            self.assertEqual(len(other_history), 3)
+
+
+    @unittest.skipIf(find_spec('numpy') is None, 'NumPy required')
+    def test_query(self):
+        with MetricHistory(self.file, 5) as history:
+            for num in range(8): self.append(history, num)
+            records = history.query()
+            # Testing the expected result, ordered by time
+            self.assertListEqual(records['time'].tolist(), [3, 4, 5, 6, 7])
+            self.assertListEqual(records['fans'][0].tolist(), 
+                                 [4000, 4100, 0, 0])
+            self.assertListEqual(records['accepted'].tolist(), 
+                                 [1003, 1004, 1005, 1006, 1007])
+            records = history.query(4, 6)
+        self.assertListEqual(records['time'].tolist(), [4, 5, 6])
+        self.assertListEqual(records['hashrate'].tolist(), 
+                             [104.5, 105.5, 106.5])
+
+
+    # This function is executed after each test function
+    def tearDown(self): 
+        self.temp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,9 +23,9 @@
 
 import sys
 import unittest
-from os import path
+from os import path, listdir, replace
 import unittest.mock
-from json import loads
+from json import load, loads
 from unittest.mock import patch
 from tempfile import TemporaryDirectory
 from paesslerag_prtg_sensor_api.sensor.result import CustomSensorResult
@@ -33,7 +33,7 @@ from paesslerag_prtg_sensor_api.sensor.result import CustomSensorResult
 # Add the sensor root directory to the system path
 sys.path.append(
     path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
-from iceriver import IceriverChannels
+from iceriver import CaseInsensitiveDict, IceriverChannels
 
 
 class TestIceriver(unittest.TestCase):
@@ -87,11 +87,38 @@ class TestIceriver(unittest.TestCase):
             data = self.iceriver.to_dict(self.fetched_data)
             for cmd in ["pool", "informations"]:
                 self.assertDictEqual(data[cmd], self.iceriver_data[cmd])
+            self.iceriver.save_json(data)
             with open(json) as json:
                 self.assertIn('"connect": true, "diff": "2199.02 G"', 
                               json.read())
 
 
+    # Tests the case-insensitive lookups of the data returned by to_dict, 
+    # including the data from the preexistent Windows executable.
+    def test_case_insensitive_dict(self):
+        exe_data = {'BoardPower': {'RtPow': '155G'}, 
+                    'Fans': {'Fans': [300, 100]}}
+        for data in [self.iceriver.to_dict([exe_data]),
+                     CaseInsensitiveDict.convert(self.iceriver_data)]:
+            self.assertIsInstance(data, CaseInsensitiveDict)
+            get_value = self.iceriver.get_value
+            self.assertEqual(get_value('fans', get_value('FANS', data)), 
+                             [300, 100])
+            self.assertIsNone(get_value('unknown', data))
+        self.assertEqual(
+            get_value('rtpow', get_value('boardpower', data)), '155G')
+        self.assertDictEqual(data, self.iceriver_data)
+        # The keys added and removed after the conversion
+        data['Network'] = {'dhcp': True}
+        data.update({'POOL': {}})
+        self.assertEqual(get_value('network', data), {'dhcp': True})
+        self.assertEqual(data.pop('pool'), self.iceriver_data['pool'])
+        self.assertEqual(get_value('pool', data), {})
+        del data['POOL']
+        self.assertIsNone(get_value('pool', data))
+        self.assertIsNone(data.pop('pool', None))
+
+
     # Tests the function that creates channels related to board power,
     # ensuring they are correctly generated.
     def test_boardpower_channels(self): 
@@ -135,6 +162,110 @@ class TestIceriver(unittest.TestCase):
             self.assertIn(channel, str(self.iceriver.result))
         
 
+    # Tests the cumulative counters and the uptime used for the rates.
+    def test_counters(self): 
+        self.iceriver_data['pool']['pools'].append(
+            {"no": 2, "connect": False, "accepted": 10, "rejected": 1})
+        self.iceriver.data = self.iceriver_data
+        # Testing the expected result, only connected pools are counted
+        self.assertDictEqual(self.iceriver.counters(), 
+                             {'Pool - Accepted': 2418, 'Pool - Rejected': 0})
+        self.assertEqual(self.iceriver.uptime(), 9 * 3600 + 21 * 60 + 23)
+        self.assertDictEqual(self.iceriver.history_record(), {
+            'hashrate': 155, 'temp_in': 34, 'temp_out': 52, 
+            'fans': [300, 100], 'accepted': 2418, 'rejected': 0})
+
+
+    # Tests that a fresh snapshot is used instead of requesting the miner.
+    @patch('custom_sensor_lib.create_channel.get_data')
+    def test_load_data_snapshot(self, mock_get_data): 
+        mock_get_data.return_value = self.fetched_data
+        self.iceriver.logger = unittest.mock.MagicMock()
+        params = {'cacheTtl': 60, 'ip': '127.0.0.1', 'port': 4111}
+        with TemporaryDirectory() as dir, \
+            patch.dict('custom_sensor_lib.create_channel.script_params', 
+                       cacheDir=dir, **params), \
+            patch.dict('custom_sensor_lib.sensor_state.script_params', 
+                       logFile=path.join(dir, 'file.log')):
+            # Testing the expected result
+            first_data = self.iceriver.load_data()
+            self.assertEqual(self.iceriver.snapshot_age, 0)
+            # Another sensor requesting the same miner
+            iceriver = IceriverChannels()
+            iceriver.logger = self.iceriver.logger
+            iceriver.json_file = path.join(dir, 'file.json')
+            data = iceriver.load_data()
+            self.assertGreaterEqual(iceriver.snapshot_age, 0)
+            self.assertDictEqual(data, first_data)
+            mock_get_data.assert_called_once()
+            # The sensor served by the snapshot writes its json file
+            with open(iceriver.json_file) as json:
+                self.assertDictEqual(load(json), first_data)
+            self.iceriver.data = data
+            self.assertIn('Snapshot age', self.iceriver.build_result())
+
+
+    # Tests that a run uses its data when the snapshot is not written, as
+    # on Windows while another sensor reads the snapshot.
+    @patch('custom_sensor_lib.create_channel.get_data')
+    def test_load_data_snapshot_locked(self, mock_get_data): 
+        def locked_replace(src: str, dst: str):
+            if path.basename(dst).startswith('miner_'): 
+                raise PermissionError('Access is denied')
+            replace(src, dst)
+
+        mock_get_data.return_value = self.fetched_data
+        self.iceriver.logger = unittest.mock.MagicMock()
+        params = {'cacheTtl': 60, 'ip': '127.0.0.1', 'port': 4111}
+        with TemporaryDirectory() as dir, \
+            patch.dict('custom_sensor_lib.create_channel.script_params', 
+                       cacheDir=dir, **params), \
+            patch.dict('custom_sensor_lib.sensor_state.script_params', 
+                       logFile=path.join(dir, 'file.log')), \
+            patch('custom_sensor_lib.sensor_state.replace', 
+                  side_effect=locked_replace):
+            data = self.iceriver.load_data()
+            # Testing the expected result
+            self.assertEqual(self.iceriver.get_value('fans', data), 
+                             self.iceriver_data['fans'])
+            self.assertEqual(self.iceriver.snapshot_age, 0)
+            self.iceriver.logger.warning.assert_called_once()
+            # No temporary file is left
+            self.assertListEqual([file for file in listdir(dir) 
+                                  if file.endswith('.tmp')], [])
+
+
+    # Tests that the slow changing commands are reused between refreshes.
+    @patch('custom_sensor_lib.create_channel.get_data')
+    def test_fetch_dict_refresh(self, mock_get_data): 
+        fetched_data = self.fetched_data + \
+            ['{"id": "getnet", "ret": {"code": 0, "dhcp": true}}']
+        fast_data = [msg for msg in fetched_data 
+                     if loads(msg)['id'] not in ['info', 'getnet']]
+        mock_get_data.side_effect = [fetched_data] + [fast_data] * 2 \
+            + [fetched_data]
+        with TemporaryDirectory() as dir, \
+            patch.dict('custom_sensor_lib.create_channel.script_params', 
+                       refreshCycles=3), \
+            patch.dict('custom_sensor_lib.sensor_state.script_params', 
+                       logFile=path.join(dir, 'file.log')):
+            self.iceriver.json_file = path.join(dir, 'file.json')
+            first_data = self.iceriver._fetch_dict()
+            for _ in range(2): data = self.iceriver._fetch_dict()
+            # The json file has the reused commands
+            with open(self.iceriver.json_file) as json:
+                self.assertIn('"dhcp": true', json.read())
+            data = self.iceriver._fetch_dict()
+        # Testing the expected result
+        self.assertDictEqual(data, first_data)
+        self.assertEqual(self.iceriver.get_value('NETWORK', data), 
+                         {'id': 'getnet', 'dhcp': True, 'code': 0})
+        commands = [call[0][0] for call in mock_get_data.call_args_list]
+        self.assertListEqual(commands, [self.iceriver.COMMANDS] 
+                             + [['fan', 'board', 'boardpow', 'getpool']] * 2
+                             + [self.iceriver.COMMANDS])
+
+
     # Tests the main execution of the Iceriver script, 
     # mocking functions to ensure the module isolation.
     @patch('custom_sensor_lib.create_channel.get_data')
@@ -143,7 +274,9 @@ class TestIceriver(unittest.TestCase):
     @patch('custom_sensor_lib.create_channel.print')
     def test_z_main(self, mock_print, mock_load_args,  
                     mock_get_logger, mock_get_data): 
-        with TemporaryDirectory() as dir:
+        with TemporaryDirectory() as dir, \
+            patch.dict('custom_sensor_lib.sensor_state.script_params', 
+                       logFile=path.join(dir, 'file.log')):
             self.iceriver.json_file = path.join(dir, 'file.json')
             self.iceriver.log_file = 'file.log'
             mock_get_data.return_value = self.fetched_data
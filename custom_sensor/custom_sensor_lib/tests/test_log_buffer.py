@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import sys
+import logging
+import unittest
+from os import path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+# Local library imports
+# Add the sensor directory of 'custom_sensor_lib' to the system path
+dir = path.dirname(path.dirname(path.dirname(__file__)))
+sys.path.append(dir) 
+from custom_sensor_lib.log_buffer import RingBufferHandler
+
+
+class TestRingBufferHandler(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.log_file = path.join(self.temp_dir.name, 'file.log')
+        self.logger = logging.getLogger('test_log_buffer')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+
+
+    def tearDown(self):
+        self.logger.handlers.clear()
+        self.temp_dir.cleanup()
+
+
+    def add_handler(self, **kwargs) -> RingBufferHandler:
+        handler = RingBufferHandler(self.log_file, **kwargs)
+        handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+        self.logger.addHandler(handler)
+        return handler
+
+
+    def read_log(self) -> str:
+        if not path.exists(self.log_file): return ''
+        with open(self.log_file) as log_file: return log_file.read()
+
+
+    def test_success(self):
+        handler = self.add_handler()
+        self.logger.info('Starting data request')
+        handler.flush()
+        self.assertEqual(self.read_log(), '')
+        self.logger.info('Run ok', extra={'summary': True})
+        # Testing the expected result
+        self.assertEqual(self.read_log(), '[INFO] Run ok\n')
+        self.assertEqual(len(handler.records), 1)
+
+
+    def test_failure(self):
+        handler = self.add_handler(capacity=2)
+        for num in range(3): self.logger.info('Record %s' %num)
+        self.logger.error('An error has occurred')
+        self.logger.info('Run failed', extra={'summary': True})
+        # Testing the expected result, the oldest records are dropped
+        self.assertEqual(self.read_log(), 
+                         '[INFO] Record 2\n[ERROR] An error has occurred\n'
+                         '[INFO] Run failed\n')
+        self.assertEqual(len(handler.records), 0)
+
+
+    @patch('custom_sensor_lib.log_buffer.randrange', return_value=0)
+    def test_sampled_success(self, mock_randrange):
+        self.add_handler(sampling=10)
+        self.logger.info('Starting data request')
+        self.logger.info('Run ok', extra={'summary': True})
+        # Testing the expected result
+        self.assertEqual(self.read_log(), 
+                         '[INFO] Starting data request\n[INFO] Run ok\n')
+        mock_randrange.assert_called_once_with(10)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import sys
+import gzip
+import unittest
+from os import path, listdir, urandom
+from datetime import date, timedelta
+from tempfile import TemporaryDirectory
+# Local library imports
+# Add the sensor directory of 'custom_sensor_lib' to the system path
+dir = path.dirname(path.dirname(path.dirname(__file__)))
+sys.path.append(dir) 
+from custom_sensor_lib.log_retention import prune_logs
+
+
+class TestLogRetention(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.today = date.today()
+
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
+    def log_file(self, days: int) -> str:
+        _date = str(self.today - timedelta(days=days)).replace('-', '_')
+        return path.join(self.temp_dir.name, 
+                         'sensor_id_0000_%s.log' %_date)
+
+
+    def write_logs(self, days: list, data: bytes=b'x' * 1000):
+        for num in days:
+            with open(self.log_file(num), 'wb') as log_file: 
+                log_file.write(data)
+
+
+    def test_prune_logs(self):
+        self.write_logs([0, 1, 2, 40])
+        # Testing the expected result
+        self.assertTrue(prune_logs(self.temp_dir.name, 30))
+        self.assertTrue(path.exists(self.log_file(0)))
+        self.assertFalse(path.exists(self.log_file(40)))
+        for num in [1, 2]:
+            self.assertFalse(path.exists(self.log_file(num)))
+            with gzip.open(self.log_file(num) + '.gz', 'rt') as gz_file:
+                self.assertEqual(gz_file.read(), 'x' * 1000)
+        # A single pass per day
+        self.write_logs([3])
+        self.assertFalse(prune_logs(self.temp_dir.name, 30))
+        self.assertTrue(path.exists(self.log_file(3)))
+
+
+    def test_max_size(self):
+        # Incompressible log files of 50 KB
+        self.write_logs([0, 1, 2, 3], urandom(50000))
+        prune_logs(self.temp_dir.name, 30, 120000)
+        # Testing the expected result, the oldest files are deleted first
+        self.assertListEqual(sorted(listdir(self.temp_dir.name)), 
+                             sorted(['.log_pruned', 
+                                     path.basename(self.log_file(0)),
+                                     path.basename(self.log_file(1)) + '.gz', 
+                                     path.basename(self.log_file(2)) + '.gz']))
+
+
+    def test_invalid_date(self):
+        self.write_logs([1])
+        invalid_file = path.join(self.temp_dir.name, 
+                                 'sensor_id_0000_2024_02_30.log')
+        open(invalid_file, 'w').close()
+        # Testing the expected result, the file is ignored
+        self.assertTrue(prune_logs(self.temp_dir.name, 30))
+        self.assertTrue(path.exists(invalid_file))
+        self.assertTrue(path.exists(self.log_file(1) + '.gz'))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
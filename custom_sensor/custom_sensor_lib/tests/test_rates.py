@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import sys
+import unittest
+from os import path
+# Local library imports
+# Add the sensor directory of 'custom_sensor_lib' to the system path
+dir = path.dirname(path.dirname(path.dirname(__file__)))
+sys.path.append(dir) 
+from custom_sensor_lib.rates import compute_rates, counters_snapshot
+
+
+class TestRates(unittest.TestCase):
+    # This function is executed before each test function
+    def setUp(self):
+        self.previous = counters_snapshot(
+            1000, 3600, {'Accepted': 100, 'Rejected': 10})
+
+
+    def test_compute_rates(self):
+        current = counters_snapshot(
+            1120, 3720, {'Accepted': 160, 'Rejected': 11, 'New': 5})
+        # Testing the expected result, a new counter has no rate yet
+        self.assertDictEqual(compute_rates(self.previous, current),
+                             {'Accepted': 30, 'Rejected': 0.5})
+        # No interval between the snapshots
+        self.assertDictEqual(compute_rates(self.previous, self.previous), {})
+
+
+    def test_compute_rates_reset(self):
+        # The miner rebooted 30 seconds ago
+        current = counters_snapshot(
+            1120, 30, {'Accepted': 15, 'Rejected': 12})
+        self.assertDictEqual(compute_rates(self.previous, current),
+                             {'Accepted': 30, 'Rejected': 24})
+        # Only a counter restarted from zero
+        current = counters_snapshot(
+            1120, 3720, {'Accepted': 6, 'Rejected': 12})
+        self.assertDictEqual(compute_rates(self.previous, current),
+                             {'Accepted': 3, 'Rejected': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import sys
+import unittest
+from os import path
+from unittest.mock import patch
+# Local library imports
+# Add the sensor directory of 'custom_sensor_lib' to the system path
+dir = path.dirname(path.dirname(path.dirname(__file__)))
+sys.path.append(dir) 
+from custom_sensor_lib.retry_policy import RetryPolicy
+
+
+class TestRetryPolicy(unittest.TestCase):
+    @patch('custom_sensor_lib.retry_policy.uniform', lambda low, high: high)
+    def test_retry_delay(self):
+        policy = RetryPolicy(5, 0.5, 3)
+        # Testing the expected result
+        self.assertListEqual([policy.retry_delay(num) for num in range(5)],
+                             [0.5, 1, 2, 3, None])
+        self.assertDictEqual(policy.metrics, 
+                             {'retries': 4, 'delay': 6.5, 'given_up': 1})
+        policy.clear_metrics()
+        self.assertDictEqual(policy.metrics, 
+                             {'retries': 0, 'delay': 0.0, 'given_up': 0})
+
+
+    def test_full_jitter(self):
+        policy = RetryPolicy(3, 0.5, 3)
+        for _ in range(100): 
+            self.assertTrue(0 <= policy.retry_delay(1) <= 1)
+
+
+    def test_not_retryable(self):
+        policy = RetryPolicy(3, 0.5, 3, (OSError,))
+        # Testing the expected result
+        self.assertIsNotNone(policy.retry_delay(0, ConnectionResetError()))
+        self.assertIsNone(policy.retry_delay(0, ValueError()))
+        self.assertIsNone(RetryPolicy(1).retry_delay(0))
+        self.assertEqual(policy.metrics['given_up'], 1)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
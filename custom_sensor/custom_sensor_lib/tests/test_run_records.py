@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import sys
+import gzip
+import unittest
+from os import path, makedirs
+from json import dumps
+from datetime import date
+from tempfile import TemporaryDirectory
+# Local library imports
+# Add the sensor directory of 'custom_sensor_lib' to the system path
+dir = path.dirname(path.dirname(path.dirname(__file__)))
+sys.path.append(dir) 
+from custom_sensor_lib.run_records import (
+        latency_percentiles, 
+        read_records, 
+        records_file, 
+        records_files, 
+        write_record
+    )
+
+
+def run_record(ip: str, duration: float, error: str=None, 
+               time: float=1000) -> dict:
+    return {'time': time, 'ip': ip, 'port': 4028, 
+            'miner': 'AntminerChannels', 'duration_ms': duration, 
+            'durations_ms': {'fetch': duration / 2}, 'error': error}
+
+
+class TestRunRecords(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
+    def test_records_files(self):
+        sensor_dir = path.join(self.temp_dir.name, 'sensor_id_1234')
+        makedirs(sensor_dir)
+        file = records_file(sensor_dir, date(2024, 1, 31))
+        self.assertEqual(path.basename(file), 
+                         'sensor_id_1234_runs_2024_01_31.jsonl')
+        for num in range(3): write_record(file, run_record('10.0.0.2', num))
+        # A compressed file of a past day and a line being written
+        with gzip.open(records_file(sensor_dir, date(2024, 1, 30)) + '.gz', 
+                       'wt') as gz_file:
+            gz_file.write(dumps(run_record('10.0.0.3', 5)) + '\n{"time"')
+        # Testing the expected result, the files are in the order of the days
+        files = records_files(self.temp_dir.name)
+        self.assertEqual(len(files), 2)
+        self.assertListEqual([record['duration_ms'] 
+                              for record in read_records(files)], 
+                             [5, 0, 1, 2])
+
+
+    def test_latency_percentiles(self):
+        records = [run_record('10.0.0.2', num) for num in range(1, 101)]
+        records += [run_record('10.0.0.2', 0, 'MinerUnreachable'), 
+                    run_record('10.0.0.3', 0, 'MinerUnreachable'),
+                    run_record('10.0.0.4', 500, time=10)]
+        stats = latency_percentiles(iter(records), since=100)
+        # Testing the expected result
+        self.assertDictEqual(stats[('10.0.0.2', 4028)], 
+                             {'miner': 'AntminerChannels', 'runs': 101, 
+                              'errors': 1, 'p50': 50, 'p95': 95})
+        self.assertIsNone(stats[('10.0.0.3', 4028)]['p95'])
+        self.assertNotIn(('10.0.0.4', 4028), stats)
+        stats = latency_percentiles(records, phase='fetch')
+        self.assertEqual(stats[('10.0.0.2', 4028)]['p95'], 47.5)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
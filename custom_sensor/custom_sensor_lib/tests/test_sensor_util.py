@@ -24,8 +24,9 @@
 import sys
 import logging
 import unittest
-from os import path
-from json import dump
+from os import path, chmod, name
+from json import dump, dumps, load
+from time import monotonic
 from datetime import datetime
 from unittest.mock import patch
 from tempfile import TemporaryDirectory, TemporaryFile
@@ -105,6 +106,52 @@ class TestSensorUtil(unittest.TestCase):
         self.assertEqual(sensor_util.script_params['sensorid'], '0000')
 
 
+    # The second run with the same arguments uses the cached parameters
+    @patch(sensor_util + 'get_logger') 
+    def test_parse_sensor_params_cache(self, _):
+        # Context for the test
+        json_file = path.join(self.temp_dir.name, 'file.json')
+        prtg_args = ["test.py", dumps({
+            'sensorid': '0000', 'host': '127.0.0.1', 
+            'params': '--timeout 30 --channels Fans,temps --jsonFile %s' 
+                      %json_file})]
+        sensor_util.parse_sensor_params(prtg_args)
+        self.assertEqual(sensor_util.script_params['timeout'], 30)
+        self.assertTrue(path.exists(path.join(
+            self.temp_dir.name, 'sensor_id_0000', 
+            'sensor_id_0000_params.json')))
+        # Testing the expected result
+        sensor_util.script_params.update(self.default_script_params)
+        with patch(self.sensor_util + '_assign_script_params') \
+                as mock_assign:
+            sensor_util.parse_sensor_params(prtg_args)
+            mock_assign.assert_not_called()
+            self.assertEqual(sensor_util.script_params['timeout'], 30)
+            self.assertListEqual(sensor_util.script_params['channels'], 
+                                 ['fans', 'temps'])
+            self.assertEqual(sensor_util.script_params['jsonFile'], 
+                             json_file)
+            # Other arguments are not cached
+            prtg_args[1] = prtg_args[1].replace('30', '40')
+            sensor_util.parse_sensor_params(prtg_args)
+            mock_assign.assert_called_once()
+
+
+    def test_convert_param(self):
+        # Testing the expected result
+        for key, value, result in [('port', '4028', 4028), 
+                                   ('port', 'x', None),
+                                   ('historySize', '0', None),
+                                   ('timeout', '0', None),
+                                   ('rates', 'TRUE', True),
+                                   ('cacheDir', self.temp_dir.name, 
+                                    self.temp_dir.name),
+                                   ('cacheDir', 'missing_dir', None),
+                                   ('channels', 'Fans, ,temps', 
+                                    ['fans', 'temps'])]:
+            self.assertEqual(sensor_util._convert_param(key, value), result)
+
+
     # Mocking a functions to isolate the unit of the code tested
     @patch(sensor_util + 'get_logger') 
     @patch(sensor_util + 'assign_sensor_files') 
@@ -181,7 +228,7 @@ class TestSensorUtil(unittest.TestCase):
         logging.shutdown()
 
     
-    @patch(sensor_util + 'Popen')
+    @patch('subprocess.Popen')
     @patch(sensor_util + 'sleep')
     def test_run_exe_file(self, mock_sleep, mock_popen):
         # Context for the test
@@ -210,7 +257,56 @@ class TestSensorUtil(unittest.TestCase):
                     self.assertEqual(str(open_file),
                                      str(mock_popen.call_args[1]['stdout']))
             else: self.assertIn(value, mock_popen.call_args[0][0])
-        mock_sleep.assert_called_once()
+        # The program already exited, so there is no need to wait
+        mock_sleep.assert_not_called()
+
+
+    # Test the _run_exe_file function with fake executable files that
+    # write the json file, exit at once or keep running.
+    @unittest.skipIf(name == 'nt', 'The fake executable file needs Unix')
+    def test_run_exe_file_fake(self):
+        # Context for the test
+        file = lambda fname: path.join(self.temp_dir.name, fname)
+        params = {
+                    'exeFile': file('file.exe'),
+                    'exeLogFile': file('exe.log'),
+                    'jsonFile': file('file.json'),
+                    'ip': '127.0.0.1',
+                    'port': '11111',
+                    'waitTime': '200',
+                    'exeTimeout': 1
+        }
+        sensor_util.script_params.update(params)
+        write_json = "\n".join([
+            "file = sys.argv[sys.argv.index('--file') + 1]",
+            "json.dump({'fans': [300]}, open(file, 'w'))",
+            "time.sleep(10)"
+        ])
+        # The json file is empty or partly written before the json data
+        write_partial = "\n".join([
+            "file = sys.argv[sys.argv.index('--file') + 1]",
+            "open(file, 'w').close()",
+            "time.sleep(0.3)",
+            "open(file, 'w').write('{\"fans\": ')",
+            "time.sleep(0.3)",
+            "json.dump({'fans': [300]}, open(file, 'w'))",
+            "time.sleep(10)"
+        ])
+        # Fake executable file content, expected execution time and 
+        # whether it writes the json file
+        fake_exe = [(write_json, 0.5, True), ("sys.exit(1)", 0.5, False), 
+                    ("time.sleep(10)", 1, False), (write_partial, 0.9, True)]
+        for exe_script, max_time, written in fake_exe:
+            with open(params['exeFile'], 'w') as exe_file:
+                exe_file.write("#!%s\nimport sys, time, json\n%s\n" 
+                               %(sys.executable, exe_script))
+            chmod(params['exeFile'], 0o755)
+            # Test the expected result
+            start = monotonic()
+            self.assertEqual(sensor_util._run_exe_file(), written)
+            self.assertLess(monotonic() - start, max_time + 0.5)
+        with open(params['jsonFile']) as json_file:
+            self.assertDictEqual(load(json_file), {'fans': [300]})
 
 
     # The default order for testing the functions is alphabetical
@@ -223,8 +319,8 @@ class TestSensorUtil(unittest.TestCase):
         # Context for the test
         params = {
                     'ip': '127.0.0.1',
-                    'port': '11111',
-                    'waitTime': '200'
+                    'port': 11111,
+                    'waitTime': 200
         }
         sensor_util.script_params.update(params)
         cmds = ['info', 'fan', 'board', 'boardpow', 'getnet', 'getpool']
@@ -237,18 +333,23 @@ class TestSensorUtil(unittest.TestCase):
         self.assertListEqual(self.miner_data, returned_data)
         for arg in [*params.values(), cmds, msg_format]: 
             self.assertIn(arg, mock_init.call_args[0])
+        # The retry policy of the parameters
+        retry_policy = mock_init.call_args[1]['retry_policy']
+        self.assertEqual(retry_policy.max_attempts, 
+                         sensor_util.script_params['retryAttempts'])
+        self.assertEqual(retry_policy.base_delay, 0.2)
 
 
     @patch(sensor_util + 'get_logger') 
     @patch(sensor_util + '_run_exe_file') 
-    def test_z_get_data_exe(self, mock_run_exe, _):
+    def test_z_get_data_exe(self, mock_run_exe, mock_get_logger):
         # Test receiving the data using an executable file.
         # Context for the test
         jsonFile = path.join(self.temp_dir.name, 'file.json')
         params = {
                     'ip': '127.0.0.1',
-                    'port': '11111',
-                    'waitTime': '200',
+                    'port': 11111,
+                    'waitTime': 200,
                     'jsonFile': jsonFile,
                     'exeFile': self.temp_file.name
         }
@@ -259,6 +360,42 @@ class TestSensorUtil(unittest.TestCase):
         returned_data = sensor_util.get_data()
         self.assertDictEqual(self.miner_pool_data, returned_data[0]['pool'])
         mock_run_exe.assert_called_once()
+        # The executable file runs within the run budget
+        self.assertLessEqual(mock_run_exe.call_args[0][0], 
+                             sensor_util.script_params['exeTimeout'])
+        # The recovered socket failure does not flush the log buffer
+        mock_get_logger.return_value.warning.assert_called_once()
+        mock_get_logger.return_value.error.assert_not_called()
+        # The json file of the previous run is not returned
+        mock_run_exe.return_value = False
+        with self.assertRaisesRegex(sensor_util.MinerUnreachable, 
+                                    'did not write'):
+            sensor_util.get_data()
+
+
+    @patch(sensor_util + 'get_logger') 
+    @patch(sensor_util + '_run_exe_file') 
+    @patch(sensor_util + 'ClientSocket.fetch_data') 
+    def test_z_get_data_budget(self, mock_fetch_data, mock_run_exe, _):
+        # Test the fallback to the executable file once the socket used 
+        # the run budget.
+        params = {
+                    'ip': '127.0.0.1',
+                    'port': 11111,
+                    'waitTime': 200,
+                    'exeFile': self.temp_file.name,
+                    'timeout': 1
+        }
+        mock_fetch_data.side_effect = Exception('Miner unreachable')
+        with patch.dict(sensor_util.script_params, params):
+            # Test the expected result
+            with self.assertRaisesRegex(Exception, 'Miner unreachable'):
+                sensor_util.get_data()
+            # Test a deadline of the run that is already over
+            params['timeout'] = 60
+            with self.assertRaisesRegex(Exception, 'Miner unreachable'):
+                sensor_util.get_data(deadline=monotonic())
+        mock_run_exe.assert_not_called()
         
 
     # This function is executed after each test function
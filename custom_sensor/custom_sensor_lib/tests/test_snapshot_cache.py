@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import sys
+import unittest
+from os import path, listdir
+from json import dump
+from time import time
+from tempfile import TemporaryDirectory
+# Local library imports
+# Add the sensor directory of 'custom_sensor_lib' to the system path
+dir = path.dirname(path.dirname(path.dirname(__file__)))
+sys.path.append(dir) 
+from custom_sensor_lib import snapshot_cache
+
+
+class TestSnapshotCache(unittest.TestCase):
+    # This function is executed before each test function
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.data = {'fans': {'id': 'fan', 'code': 0, 'fans': [300, 100]}}
+        self.file = snapshot_cache.snapshot_file(
+            self.temp_dir.name, '127.0.0.1', 4111, ['fan', 'board'])
+
+
+    def test_snapshot_file(self):
+        # The same miner commands share the same snapshot file
+        file = lambda ip, port, cmds: snapshot_cache.snapshot_file(
+            self.temp_dir.name, ip, port, cmds)
+        self.assertEqual(self.file, file('127.0.0.1', 4111, ['fan', 'board']))
+        for other_file in [file('127.0.0.2', 4111, ['fan', 'board']),
+                           file('127.0.0.1', 4028, ['fan', 'board']),
+                           file('127.0.0.1', 4111, ['fan'])]:
+            self.assertNotEqual(self.file, other_file)
+        self.assertEqual(path.dirname(self.file), self.temp_dir.name)
+
+
+    def test_read_write_snapshot(self):
+        # No snapshot yet
+        self.assertIsNone(snapshot_cache.read_snapshot(self.file, 60))
+        snapshot_cache.write_snapshot(self.file, self.data)
+        # Testing the expected result
+        snapshot = snapshot_cache.read_snapshot(self.file, 60)
+        self.assertDictEqual(snapshot['data'], self.data)
+        self.assertLess(snapshot['age'], 60)
+        self.assertAlmostEqual(snapshot['timestamp'], time(), delta=60)
+        # Only the snapshot file is left in the directory
+        self.assertListEqual(listdir(self.temp_dir.name), 
+                             [path.basename(self.file)])
+
+
+    def test_read_stale_snapshot(self):
+        with open(self.file, 'w') as file:
+            dump({'timestamp': time() - 120, 'data': self.data}, file)
+        self.assertIsNone(snapshot_cache.read_snapshot(self.file, 60))
+        self.assertIsNotNone(snapshot_cache.read_snapshot(self.file, 180))
+        # Invalid snapshot file
+        with open(self.file, 'w') as file: file.write('{"data": ')
+        self.assertIsNone(snapshot_cache.read_snapshot(self.file, 180))
+
+
+    # This function is executed after each test function
+    def tearDown(self): 
+        self.temp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import sys
+import unittest
+from os import path
+from time import sleep
+# Local library imports
+# Add the sensor directory of 'custom_sensor_lib' to the system path
+dir = path.dirname(path.dirname(path.dirname(__file__)))
+sys.path.append(dir) 
+from custom_sensor_lib.timings import LatencyStats, Timings
+
+
+class TestTimings(unittest.TestCase):
+    def test_phase(self):
+        timings = Timings()
+        for _ in range(2):
+            with timings.phase('fetch'): sleep(0.01)
+        # The duration is recorded even if the phase fails
+        with self.assertRaises(ValueError):
+            with timings.phase('decode'): raise ValueError()
+        # Testing the expected result
+        self.assertGreaterEqual(timings.duration_ms('fetch'), 20)
+        self.assertIn('decode', timings.durations)
+        self.assertEqual(timings.duration_ms('unknown'), 0)
+
+
+    def test_retries(self):
+        timings, other_timings = Timings(), Timings()
+        timings.add_retry('fan')
+        other_timings.add_retry('fan')
+        other_timings.add_retry('board')
+        other_timings.add_duration('connect', 0.5)
+        other_timings.add_retry_metrics(
+            {'retries': 2, 'delay': 0.25, 'given_up': 1})
+        timings.update(other_timings)
+        # Testing the expected result
+        self.assertEqual(timings.total_retries(), 3)
+        self.assertDictEqual(timings.to_dict(), {
+            'durations_ms': {'connect': 500}, 
+            'retries': {'fan': 2, 'board': 1},
+            'retry_delay_ms': 250,
+            'given_up': 1
+        })
+        timings.clear()
+        self.assertDictEqual(timings.to_dict(), 
+                             {'durations_ms': {}, 'retries': {}, 
+                              'retry_delay_ms': 0, 'given_up': 0})
+
+
+    def test_latency_stats(self):
+        latency = LatencyStats()
+        self.assertEqual(latency.timeout(0.1, 1), 1)
+        for sample in [0.2, 0.2, 0.2, 0.6]: latency.add(sample)
+        # Testing the expected result
+        self.assertAlmostEqual(latency.mean, 0.25)
+        self.assertAlmostEqual(latency.deviation, 0.1421875)
+        self.assertAlmostEqual(latency.timeout(0.1, 1), 0.81875)
+        self.assertEqual(latency.timeout(0.1, 0.5), 0.5)
+        # The statistics are restored from their saved state
+        restored = LatencyStats()
+        restored.load(latency.to_dict())
+        self.assertDictEqual(restored.to_dict(), latency.to_dict())
+        restored.load({})
+        self.assertIsNone(restored.mean)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from time import perf_counter
+from contextlib import contextmanager
+
+
+class Timings():
+    """
+    This class records the durations (monotonic clock) and the retry 
+    counts of the execution phases of the sensor, the backoff delays and 
+    the requests given up by the retry policy, and the bytes received 
+    from the miner.
+    """
+
+    def __init__(self):
+        self.durations = {}
+        self.retries = {}
+        self.retry_delay = 0.0
+        self.given_up = 0
+        self.bytes_received = 0
+
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        This function is a context manager adding the duration of its 
+        block to the phase.
+
+        Parameter:
+        name (str)          : The phase name.
+        """
+
+        _start = perf_counter()
+        try: yield
+        finally: self.add_duration(name, perf_counter() - _start)
+
+
+    def add_duration(self, name: str, duration: float):
+        self.durations[name] = self.durations.get(name, 0) + duration
+
+
+    def add_retry(self, name: str):
+        self.retries[name] = self.retries.get(name, 0) + 1
+
+
+    def add_bytes(self, size: int):
+        self.bytes_received += size
+
+
+    def add_retry_metrics(self, metrics: dict):
+        """
+        This function adds the backoff delays and the requests given up 
+        of the metrics of a retry policy.
+        """
+
+        self.retry_delay += metrics['delay']
+        self.given_up += metrics['given_up']
+
+
+    def clear(self):
+        self.durations.clear()
+        self.retries.clear()
+        self.retry_delay = 0.0
+        self.given_up = 0
+        self.bytes_received = 0
+
+
+    def update(self, timings: 'Timings'):
+        """This function adds the durations and retries of other timings."""
+
+        for name, duration in timings.durations.items():
+            self.add_duration(name, duration)
+        for name, count in timings.retries.items():
+            self.retries[name] = self.retries.get(name, 0) + count
+        self.retry_delay += timings.retry_delay
+        self.given_up += timings.given_up
+        self.bytes_received += timings.bytes_received
+
+
+    def duration_ms(self, name: str) -> float:
+        return round(self.durations.get(name, 0) * 1000, 3)
+
+
+    def total_retries(self) -> int:
+        return sum(self.retries.values())
+
+
+    def to_dict(self) -> dict:
+        return {
+            'durations_ms': {name: self.duration_ms(name) 
+                             for name in self.durations},
+            'retries': dict(self.retries),
+            'retry_delay_ms': round(self.retry_delay * 1000, 3),
+            'given_up': self.given_up
+        }
+
+
+
+class LatencyStats():
+    """
+    This class estimates the response latency of a miner as a smoothed mean 
+    and a smoothed mean deviation (as the TCP retransmission timeout, 
+    RFC 6298), to derive the time to wait for its responses.
+    """
+
+    _ALPHA = 1 / 8
+    _BETA = 1 / 4
+
+    def __init__(self):
+        self.clear()
+
+
+    def add(self, latency: float):
+        """This function adds a latency sample in seconds."""
+
+        if self.mean is None:
+            self.mean, self.deviation = latency, latency / 2
+        else:
+            self.deviation += self._BETA * \
+                (abs(self.mean - latency) - self.deviation)
+            self.mean += self._ALPHA * (latency - self.mean)
+        self.samples += 1
+
+
+    def clear(self):
+        self.mean = None
+        self.deviation = 0
+        self.samples = 0
+
+
+    def load(self, stats: dict):
+        """This function restores the statistics saved by to_dict."""
+
+        self.clear()
+        if stats.get('mean') is not None:
+            self.mean = float(stats['mean'])
+            self.deviation = float(stats.get('deviation', 0))
+            self.samples = int(stats.get('samples', 0))
+
+
+    def timeout(self, floor: float, ceiling: float) -> float:
+        """
+        This function returns the time to wait for a response, the mean 
+        latency plus four deviations bounded by the floor and the ceiling. 
+        Without samples, the ceiling.
+        """
+
+        if self.mean is None: return ceiling
+        return min(max(self.mean + 4 * self.deviation, floor), ceiling)
+
+
+    def to_dict(self) -> dict:
+        return {'mean': self.mean, 'deviation': self.deviation, 
+                'samples': self.samples}
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+# MIT License
+
+# Copyright (c) 2024 Juari Marcolino
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# __version__ = "1.2.0"
+
+"""
+This script manages a fleet of miners from a single process. 
+
+The collect command runs a collector daemon polling the miners listed in an 
+inventory json file [{"ip": ..., "type": "antminer", "port": ...}, ...]. 
+The sensor scripts get their channels from it with the --collector 
+parameter.
+
+The discover command sweeps a network for miners and writes the inventory 
+file.
+
+The analyze command prints the health summary of the fleet computed from 
+the metric histories of the miners, as the PRTG json result of an 
+aggregate sensor.
+
+The runs command prints the latency percentiles of the miners aggregated 
+from the run records of the sensors.
+"""
+
+import asyncio
+from time import time
+from json import load, dumps
+from argparse import ArgumentParser
+# Local library imports
+from antminer import AntminerChannels
+from iceriver import IceriverChannels
+from custom_sensor_lib.collector import Collector
+from custom_sensor_lib.discovery import discover, write_inventory
+from custom_sensor_lib.fleet_poller import default_retry_policy
+from custom_sensor_lib.run_records import (
+        latency_percentiles, 
+        read_records, 
+        records_files
+    )
+
+
+MINER_TYPES = {
+    'antminer': AntminerChannels,
+    'iceriver': IceriverChannels
+}
+
+
+def load_inventory(inventory_file: str) -> list:
+    """
+    This function reads an inventory json file and returns a list of 
+    (channels_class, ip, port) tuples.
+    """
+
+    with open(inventory_file) as file:
+        return [(MINER_TYPES[miner['type'].lower()], miner['ip'], 
+                 miner.get('port')) for miner in load(file)]
+
+
+def collect(args):
+    _miners = load_inventory(args.inventory) if args.inventory else []
+    _collector = Collector(_miners, args.socket, args.interval, 
+                           args.concurrency, args.deadline, args.waitTime,
+                           list(MINER_TYPES.values()), args.historyDir, 
+                           args.historySize, 
+                           default_retry_policy(args.attempts))
+    asyncio.run(_collector.run())
+
+
+def inventory_miners(inventory_file: str) -> dict:
+    """
+    This function reads an inventory json file and returns the miners 
+    {(ip, port): {'model': ..., 'group': ..., 'fan_limit': ...}} of the 
+    fleet analytics. The peer group of a miner is its "rack" in the 
+    inventory, else its model.
+    """
+
+    _miners = {}
+    with open(inventory_file) as file:
+        for miner in load(file):
+            _class = MINER_TYPES[miner['type'].lower()]
+            _model = miner.get('model') or _class.__name__
+            _miners[(miner['ip'], miner.get('port') or _class.SERVER_PORT)] \
+                = {'model': _model, 
+                   'group': miner.get('rack') or _model,
+                   'fan_limit': _class.FAN_LIMIT_MIN_WARNING}
+    return _miners
+
+
+def analyze(args):
+    # NumPy is only required by the fleet analytics
+    from custom_sensor_lib.analytics import (
+        fleet_summary, 
+        load_fleet, 
+        summary_result
+    )
+
+    _end = time()
+    _fleet = load_fleet(args.historyDir, _end - args.hours * 3600, _end, 
+                        args.step)
+    _miners = inventory_miners(args.inventory) if args.inventory else {}
+    _summary = fleet_summary(_fleet, _miners, args.window, 
+                             args.horizon * 3600)
+    print(dumps(_summary, indent=2) if args.json else 
+          summary_result(_summary))
+
+
+def runs(args):
+    _since = time() - args.hours * 3600 if args.hours else None
+    _stats = latency_percentiles(read_records(records_files(args.dir)), 
+                                 args.phase, _since)
+    # The slowest miners first
+    _rows = sorted(_stats.items(), reverse=True,
+                   key=lambda item: item[1]['p95'] or 0)[:args.top]
+    if args.json:
+        print(dumps([{'ip': ip, 'port': port, **stat} 
+                     for (ip, port), stat in _rows], indent=2))
+        return
+    print('%-22s %-18s %6s %6s %10s %10s' 
+          %('Miner', 'Type', 'Runs', 'Errors', 'p50 ms', 'p95 ms'))
+    for (ip, port), stat in _rows:
+        print('%-22s %-18s %6s %6s %10s %10s' 
+              %('%s:%s' %(ip, port), stat['miner'], stat['runs'], 
+                stat['errors'], stat['p50'], stat['p95']))
+
+
+def discover_miners(args):
+    _probes = list(MINER_TYPES.items())
+    _miners = asyncio.run(discover(args.network, _probes, args.concurrency, 
+                                   args.rate, args.timeout))
+    write_inventory(_miners, args.output)
+    print('%s miners found, inventory saved in %s' 
+          %(len(_miners), args.output))
+
+
+def main():
+    _parser = ArgumentParser(description=__doc__)
+    _commands = _parser.add_subparsers(dest='command', required=True)
+    _collect = _commands.add_parser('collect', 
+                                    help='Run the collector daemon')
+    _collect.add_argument('--socket', required=True, 
+                          help='Path of the Unix socket for the sensors')
+    _collect.add_argument('--inventory', help='Inventory json file')
+    _collect.add_argument('--interval', type=float, default=60, 
+                          help='Polling interval in seconds')
+    _collect.add_argument('--concurrency', type=int, default=100, 
+                          help='Maximum number of miners polled at once')
+    _collect.add_argument('--deadline', type=float, default=10,
+                          help='Time limit in seconds to poll a miner')
+    _collect.add_argument('--waitTime', type=float, default=100,
+                          help='Waiting time for a response in ms')
+    _collect.add_argument('--attempts', type=int, default=2,
+                          help='Maximum number of attempts to poll a miner')
+    _collect.add_argument('--historyDir', 
+                          help='Directory of the metric histories')
+    _collect.add_argument('--historySize', type=int, default=10080,
+                          help='Number of records kept in a history')
+    _collect.set_defaults(func=collect)
+    _discover = _commands.add_parser('discover', 
+                                     help='Find the miners of a network')
+    _discover.add_argument('--network', required=True, 
+                           help='Network in CIDR notation (10.0.0.0/22)')
+    _discover.add_argument('--output', default='inventory.json',
+                           help='Inventory json file')
+    _discover.add_argument('--concurrency', type=int, default=256, 
+                           help='Maximum number of probes at once')
+    _discover.add_argument('--rate', type=float, default=1000, 
+                           help='Maximum connection attempts per second')
+    _discover.add_argument('--timeout', type=float, default=1,
+                           help='Time limit in seconds of a probe')
+    _discover.set_defaults(func=discover_miners)
+    _analyze = _commands.add_parser('analyze', 
+                                    help='Summarize the fleet health')
+    _analyze.add_argument('--historyDir', required=True,
+                          help='Directory of the metric histories')
+    _analyze.add_argument('--inventory', help='Inventory json file')
+    _analyze.add_argument('--hours', type=float, default=24,
+                          help='Analyzed time window in hours')
+    _analyze.add_argument('--step', type=float, default=60,
+                          help='Time step of the metrics in seconds')
+    _analyze.add_argument('--window', type=int, default=5,
+                          help='Time steps of the rolling means')
+    _analyze.add_argument('--horizon', type=float, default=24,
+                          help='Hours within which a fan trending to its '
+                          'limit is reported')
+    _analyze.add_argument('--json', action='store_true',
+                          help='Print the summary instead of the PRTG result')
+    _analyze.set_defaults(func=analyze)
+    _runs = _commands.add_parser('runs', 
+                                 help='Summarize the latencies of the runs')
+    _runs.add_argument('--dir', required=True,
+                       help='Parent directory of the sensor directories')
+    _runs.add_argument('--hours', type=float, default=24,
+                       help='Analyzed time window in hours, 0 for all')
+    _runs.add_argument('--phase', 
+                       help='Phase of the latencies (fetch, connect, ...), '
+                       'the run duration if not set')
+    _runs.add_argument('--top', type=int, default=50,
+                       help='Number of the slowest miners printed')
+    _runs.add_argument('--json', action='store_true',
+                       help='Print the statistics as json')
+    _runs.set_defaults(func=runs)
+    _args = _parser.parse_args()
+    _args.func(_args)
+
+
+if __name__ == "__main__":
+    main()
@@ -28,17 +28,107 @@ This script is a custom PRTG Python sensor, designed to monitor an Iceriver
 miner. 
 """
 
-from json import loads, dump
+from json import loads
 from paesslerag_prtg_sensor_api.sensor.units import ValueUnit
 # Local library imports
 from custom_sensor_lib.create_channel import CreateChannels
 
 
+class CaseInsensitiveDict(dict):
+    """
+    This class is a dictionary keeping its original keys, with an index  
+    of the lowercase keys for case-insensitive lookups in constant time.
+    """
+
+    def __init__(self, data: dict=()):
+        super().__init__(data)
+        self._lower_keys = {}
+        # The first matching key is kept as a linear search would do
+        for key in self: self._lower_keys.setdefault(key.lower(), key)
+
+
+    @classmethod
+    def convert(cls, data: any) -> any:
+        """
+        This function converts the dictionaries nested in lists and 
+        dictionaries into CaseInsensitiveDict.
+        """
+
+        if isinstance(data, dict):
+            return cls({key: cls.convert(value) 
+                        for key, value in data.items()})
+        if isinstance(data, list): 
+            return [cls.convert(value) for value in data]
+        return data
+
+
+    def get_value(self, key: str) -> any:
+        _key = self._lower_keys.get(key.lower())
+        if _key is not None: return self[_key]
+
+
+
+    def __setitem__(self, key: str, value: any):
+        super().__setitem__(key, value)
+        self._lower_keys.setdefault(key.lower(), key)
+
+
+    def __delitem__(self, key: str):
+        super().__delitem__(key)
+        self._remove_key(key)
+
+
+    def pop(self, key: str, *default) -> any:
+        _value = super().pop(key, *default)
+        self._remove_key(key)
+        return _value
+
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items(): self[key] = value
+
+
+    def _remove_key(self, key: str):
+        # Index the next matching key if the removed key was indexed
+        _lower = key.lower()
+        if self._lower_keys.get(_lower) != key: return
+        del self._lower_keys[_lower]
+        for _key in self:
+            if _key.lower() == _lower: 
+                self._lower_keys[_lower] = _key
+                break
+
+
+
 class IceriverChannels(CreateChannels):  
     SERVER_PORT = 4111
     MSG_FORMAT: str = '{"id": "%s"}\n'
+    # Each response is a newline-delimited json message
+    MSG_TERMINATOR: str = '\n'
     COMMANDS: list = \
         ['info', 'fan', 'board', 'boardpow', 'getnet', 'getpool']
+    _COMMANDS_DICT: dict = {
+        'info': "informations", 
+        'fan': "fans", 
+        'board': "boardinfo", 
+        'boardpow': "boardpower", 
+        'getnet': "network", 
+        'getpool': "pool"
+    }
+    DISCOVERY_COMMAND: str = 'info'
+    CHANNEL_GROUPS: dict = {
+        'summary': ['boardpow'],
+        'temps': ['board'],
+        'fans': ['fan'],
+        'pools': ['getpool']
+    }
+    # The informations and network settings are not used by the channels,
+    # the pools data is requested at each run for its counters
+    REFRESH_CYCLES: dict = {'info': 10, 'getnet': 10}
+    FAN_LIMIT_MIN_WARNING: int = 500
+    FAN_LIMIT_MIN_ERROR: int = 250
+    FAN_LIMIT_MAX_WARNING: int = 3000
+    FAN_LIMIT_MAX_ERROR: int = 3200
 
     def _boardpower_channels(self, data: dict):
         self.result.add_primary_channel(
@@ -66,16 +156,18 @@ class IceriverChannels(CreateChannels):
             limit_max_warning=30,
             limit_max_error=15
         )
-        _runtime = self.get_value('runtime', data).split(':')
-        _days, _hours, _min, _sec = [int(part) for part in _runtime]
-        _runtime_sec = _days * 86400 + _hours * 3600 + _min * 60 + _sec
         self.result.add_channel(name='Uptime',
-            value=_runtime_sec,
+            value=self._runtime_seconds(self.get_value('runtime', data)),
             unit=ValueUnit.TIMESECONDS,
             speed_time='Hour'
         )
 
 
+    def _runtime_seconds(self, runtime: str) -> int:
+        _days, _hours, _min, _sec = [int(part) for part in runtime.split(':')]
+        return _days * 86400 + _hours * 3600 + _min * 60 + _sec
+
+
     def _board_channels(self, data: dict):
         self.result.add_channel(
             name='Chip number',
@@ -116,10 +208,10 @@ class IceriverChannels(CreateChannels):
                     value=fan,
                     unit='trs/m',
                     is_limit_mode=True,
-                    limit_min_warning=500,
-                    limit_min_error=250,
-                    limit_max_warning=3000,
-                    limit_max_error=3200
+                    limit_min_warning=self.FAN_LIMIT_MIN_WARNING,
+                    limit_min_error=self.FAN_LIMIT_MIN_ERROR,
+                    limit_max_warning=self.FAN_LIMIT_MAX_WARNING,
+                    limit_max_error=self.FAN_LIMIT_MAX_ERROR
                 )
 
 
@@ -174,23 +266,82 @@ class IceriverChannels(CreateChannels):
 
 
     def channels(self): 
-        self._boardpower_channels(self.get_value('boardpower', self.data))
-        self._board_channels(
-            self.get_value('boards', self.get_value('boardinfo', 
-                                                    self.data))[0])
-        self._fan_channels(
-            self.get_value('fans', self.get_value('fans', self.data)))
-        self._pool_channels(
-            self.get_value('pools', self.get_value('pool', self.data)))
+        # Index the keys once for all the lookups
+        if not isinstance(self.data, CaseInsensitiveDict):
+            self.data = CaseInsensitiveDict.convert(self.data)
+        if self.selected('summary'):
+            self._boardpower_channels(
+                self.get_value('boardpower', self.data))
+        if self.selected('temps'):
+            self._board_channels(
+                self.get_value('boards', self.get_value('boardinfo', 
+                                                        self.data))[0])
+        if self.selected('fans'):
+            self._fan_channels(
+                self.get_value('fans', self.get_value('fans', self.data)))
+        if self.selected('pools'):
+            self._pool_channels(
+                self.get_value('pools', self.get_value('pool', self.data)))
     
     
+    def counters(self) -> dict:
+        """Return the counters summed over the connected pools."""
+
+        _counters = {'Pool - Accepted': 0, 'Pool - Rejected': 0}
+        for pool in self.get_value('pools', self.get_value('pool', 
+                                                           self.data)):
+            if self.get_value('connect', pool):
+                _counters['Pool - Accepted'] += \
+                    self.get_value('accepted', pool)
+                _counters['Pool - Rejected'] += \
+                    self.get_value('rejected', pool)
+        return _counters
+
+
+    def uptime(self) -> float:
+        return self._runtime_seconds(self.get_value(
+            'runtime', self.get_value('boardpower', self.data)))
+
+
+    def history_record(self) -> dict:
+        _boards = self.get_value('boards', self.get_value('boardinfo', 
+                                                          self.data))
+        _temperature = lambda board, key, key2: \
+            self.get_value(key, board) or self.get_value(key2, board) or 0
+        _counters = self.counters()
+        return {
+            'hashrate': int(self.get_value('rtpow', self.get_value(
+                'boardpower', self.data))[:-1]),
+            'temp_in': max(_temperature(board, 'intmp', 'inttemp') 
+                           for board in _boards),
+            'temp_out': max(_temperature(board, 'outtmp', 'outtemp') 
+                            for board in _boards),
+            'fans': self.get_value('fans', self.get_value('fans', self.data)),
+            'accepted': _counters['Pool - Accepted'],
+            'rejected': _counters['Pool - Rejected']
+        }
+
+
+    def command_key(self, cmd: str) -> str:
+        return self._COMMANDS_DICT[cmd]
+
+
+    def fingerprint(self, msg: str) -> dict:
+        _info = CaseInsensitiveDict.convert(loads(msg)['ret'])
+        return {'model': self.get_value('model', _info) or 'Iceriver', 
+                'firmware': self.get_value('softver1', _info)}
+
+
     def get_value(self, key: str, dict: dict) -> any:
         """
         Retrieve the value associated with a key from a dictionary, 
         regardless of the case of the key for compactability 
-        with a preexistent Windows executable data. 
+        with a preexistent Windows executable data. The lookup is done 
+        in constant time for a CaseInsensitiveDict.
         """
 
+        if isinstance(dict, CaseInsensitiveDict): 
+            return dict.get_value(key)
         for key2, value in dict.items():
             if key2.lower() == key.lower(): return value
 
@@ -203,35 +354,25 @@ class IceriverChannels(CreateChannels):
         compactability with a preexistent Windows executable data format.
         """
 
-        _COMMANDS_DICT = {
-            'info': "informations", 
-            'fan': "fans", 
-            'board': "boardinfo", 
-            'boardpow': "boardpower", 
-            'getnet': "network", 
-            'getpool': "pool"
-        }
         # Data from the preexistent Windows executable
-        if isinstance(data[0], dict): return data[0] 
+        if isinstance(data[0], dict): 
+            return CaseInsensitiveDict.convert(data[0])
         # Data from the client socket 
         _adapted_data = {}
         for response in data:
             _response_dict = loads(response)
-            cmd = _COMMANDS_DICT[_response_dict['id']]
+            cmd = self._COMMANDS_DICT[_response_dict['id']]
             _adapted_data[cmd] = {'id':_response_dict['id']}
             _adapted_data[cmd].update(_response_dict['ret'])
 
         # Remove sensitive informations
-        _adapted_data['informations']['softver1'] = "---"
-        _adapted_data['informations']['softver2'] = "---"
-        for pool in _adapted_data['pool']['pools']:
+        if 'informations' in _adapted_data:
+            _adapted_data['informations']['softver1'] = "---"
+            _adapted_data['informations']['softver2'] = "---"
+        for pool in _adapted_data.get('pool', {}).get('pools', []):
             for key in ['addr', 'user', 'pass']:
                 pool[key] = "---"
-
-        # Save the data in the json file
-        with open(self.json_file, 'w') as json_file:
-            dump(_adapted_data, json_file)
-        return _adapted_data
+        return CaseInsensitiveDict.convert(_adapted_data)
 
 
 